@@ -0,0 +1,357 @@
+"""
+Benchmark for DocumentConverter
+Generates synthetic PDF, DOCX, XLSX, PPTX, CSV and JSON fixtures of a configurable size, times
+extract_text on each (best of several runs), measures its peak Python memory with tracemalloc and
+appends the results to a history file so later runs can be compared against earlier ones
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import zipfile
+import argparse
+import platform
+import statistics
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Tuple
+from xml.sax.saxutils import escape
+
+from document_converter import DocumentConverter
+
+DEFAULT_FIXTURE_DIR = 'benchmark-fixtures'
+DEFAULT_RESULTS_FILE = 'benchmark-results.json'
+
+# Fixture sizes, in the unit each format is reported in
+DEFAULT_SIZES = {
+    'pdf': 500,       # pages
+    'docx': 20000,    # paragraphs (every 50th replaced by a 10-row table)
+    'xlsx': 200000,   # rows
+    'pptx': 500,      # slides
+    'csv': 200000,    # rows
+    'json': 50000,    # records
+}
+UNITS = {'pdf': 'pages', 'docx': 'paragraphs', 'xlsx': 'rows', 'pptx': 'slides', 'csv': 'rows', 'json': 'records'}
+
+# A run slower than the previous comparable one by more than this fraction is reported as a regression
+REGRESSION_THRESHOLD = 0.15
+
+WORDS = ('beam column footing slab rebar concrete steel W12x26 fire rating 2-hour gypsum '
+         'sheathing anchor bolt grade 60 ASTM A992 elevation section detail schedule').split()
+
+
+def _sentence(i: int, length: int = 12) -> str:
+    return ' '.join(WORDS[(i * 7 + k) % len(WORDS)] for k in range(length))
+
+
+def make_pdf(pages: int) -> bytes:
+    """PDF with one Helvetica text page per page, written without any PDF library"""
+    objects = [b'<< /Type /Catalog /Pages 2 0 R >>', None,
+               b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>']
+    page_ids = []
+    for page in range(pages):
+        lines = [f'Sheet A-{page + 1:03d} {_sentence(page + line)}' for line in range(40)]
+        text = ' T* '.join(f"({line})Tj" for line in lines)
+        stream = f'BT /F1 9 Tf 12 TL 40 760 Td {text} ET'.encode('latin-1')
+        objects.append(b'<< /Length %d >>\nstream\n%s\nendstream' % (len(stream), stream))
+        objects.append(b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] '
+                       b'/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>' % len(objects))
+        page_ids.append(len(objects))
+    objects[1] = b'<< /Type /Pages /Kids [%s] /Count %d >>' % (
+        b' '.join(b'%d 0 R' % page_id for page_id in page_ids), pages)
+
+    out = io.BytesIO()
+    out.write(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(out.tell())
+        out.write(b'%d 0 obj\n%s\nendobj\n' % (number, body))
+    xref = out.tell()
+    out.write(b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1))
+    out.write(b''.join(b'%010d 00000 n \n' % offset for offset in offsets))
+    out.write(b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref))
+    return out.getvalue()
+
+
+def _package(parts: Dict[str, str]) -> bytes:
+    out = io.BytesIO()
+    with zipfile.ZipFile(out, 'w', zipfile.ZIP_DEFLATED) as package:
+        for name, xml in parts.items():
+            package.writestr(name, xml)
+    return out.getvalue()
+
+
+CONTENT_TYPES = ('<?xml version="1.0" encoding="UTF-8"?>'
+                 '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+                 '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+                 '<Default Extension="xml" ContentType="application/xml"/>{}</Types>')
+RELS = ('<?xml version="1.0" encoding="UTF-8"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">{}</Relationships>')
+OFFICE_DOCUMENT = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument'
+
+
+def _override(part: str, content_type: str) -> str:
+    return f'<Override PartName="/{part}" ContentType="application/vnd.openxmlformats-officedocument.{content_type}"/>'
+
+
+def _relationship(rel_id: str, rel_type: str, target: str) -> str:
+    return f'<Relationship Id="{rel_id}" Type="{rel_type}" Target="{target}"/>'
+
+
+def make_docx(paragraphs: int) -> bytes:
+    """Word document of paragraphs with a 10-row, 4-column table in place of every 50th paragraph"""
+    body = []
+    for i in range(paragraphs):
+        if i % 50 == 49:
+            rows = ''.join('<w:tr>' + ''.join(f'<w:tc><w:p><w:r><w:t>{escape(_sentence(i + r + c, 3))}</w:t></w:r></w:p></w:tc>'
+                                              for c in range(4)) + '</w:tr>' for r in range(10))
+            body.append(f'<w:tbl>{rows}</w:tbl>')
+        else:
+            body.append(f'<w:p><w:r><w:t>{escape(_sentence(i))}</w:t></w:r></w:p>')
+    document = ('<?xml version="1.0" encoding="UTF-8"?>'
+                '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+                f'<w:body>{"".join(body)}<w:sectPr/></w:body></w:document>')
+    return _package({
+        '[Content_Types].xml': CONTENT_TYPES.format(
+            _override('word/document.xml', 'wordprocessingml.document.main+xml')),
+        '_rels/.rels': RELS.format(_relationship('rId1', OFFICE_DOCUMENT, 'word/document.xml')),
+        'word/document.xml': document,
+    })
+
+
+def make_xlsx(rows: int) -> bytes:
+    """Workbook with one sheet of rows x 6 columns (text and numbers, inline strings)"""
+    sheet_rows = []
+    for r in range(1, rows + 1):
+        cells = [f'<c r="A{r}" t="inlineStr"><is><t>{escape(_sentence(r, 3))}</t></is></c>',
+                 f'<c r="B{r}" t="inlineStr"><is><t>Item {r}</t></is></c>']
+        cells += [f'<c r="{column}{r}"><v>{r * (k + 1) / 7:.3f}</v></c>' for k, column in enumerate('CDEF')]
+        sheet_rows.append(f'<row r="{r}">{"".join(cells)}</row>')
+    sheet = ('<?xml version="1.0" encoding="UTF-8"?>'
+             '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+             f'<sheetData>{"".join(sheet_rows)}</sheetData></worksheet>')
+    workbook = ('<?xml version="1.0" encoding="UTF-8"?>'
+                '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+                'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+                '<sheets><sheet name="Schedule" sheetId="1" r:id="rId1"/></sheets></workbook>')
+    return _package({
+        '[Content_Types].xml': CONTENT_TYPES.format(
+            _override('xl/workbook.xml', 'spreadsheetml.sheet.main+xml')
+            + _override('xl/worksheets/sheet1.xml', 'spreadsheetml.worksheet+xml')),
+        '_rels/.rels': RELS.format(_relationship('rId1', OFFICE_DOCUMENT, 'xl/workbook.xml')),
+        'xl/workbook.xml': workbook,
+        'xl/_rels/workbook.xml.rels': RELS.format(_relationship(
+            'rId1', 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet',
+            'worksheets/sheet1.xml')),
+        'xl/worksheets/sheet1.xml': sheet,
+    })
+
+
+def make_pptx(slides: int) -> bytes:
+    """Presentation of slides with a title, a bulleted text box and, on every 5th slide, a table"""
+    namespaces = ('xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main" '
+                  'xmlns:p="http://schemas.openxmlformats.org/presentationml/2006/main" '
+                  'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"')
+    parts = {}
+    overrides = [_override('ppt/presentation.xml', 'presentationml.presentation.main+xml')]
+    relationships = []
+    slide_ids = []
+    for s in range(1, slides + 1):
+        bullets = ''.join(f'<a:p><a:r><a:t>{escape(_sentence(s + b, 8))}</a:t></a:r></a:p>' for b in range(6))
+        shapes = (f'<p:sp><p:txBody><a:p><a:r><a:t>Slide {s} title</a:t></a:r></a:p></p:txBody></p:sp>'
+                  f'<p:sp><p:txBody>{bullets}</p:txBody></p:sp>')
+        if s % 5 == 0:
+            rows = ''.join('<a:tr>' + ''.join(f'<a:tc><a:txBody><a:p><a:r><a:t>{escape(_sentence(r + c, 2))}'
+                                              f'</a:t></a:r></a:p></a:txBody></a:tc>' for c in range(4)) + '</a:tr>'
+                           for r in range(8))
+            shapes += f'<p:graphicFrame><a:graphic><a:graphicData><a:tbl>{rows}</a:tbl></a:graphicData></a:graphic></p:graphicFrame>'
+        parts[f'ppt/slides/slide{s}.xml'] = (f'<?xml version="1.0" encoding="UTF-8"?><p:sld {namespaces}>'
+                                             f'<p:cSld><p:spTree>{shapes}</p:spTree></p:cSld></p:sld>')
+        overrides.append(_override(f'ppt/slides/slide{s}.xml', 'presentationml.slide+xml'))
+        relationships.append(_relationship(
+            f'rId{s}', 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/slide',
+            f'slides/slide{s}.xml'))
+        slide_ids.append(f'<p:sldId id="{255 + s}" r:id="rId{s}"/>')
+    parts.update({
+        '[Content_Types].xml': CONTENT_TYPES.format(''.join(overrides)),
+        '_rels/.rels': RELS.format(_relationship('rId1', OFFICE_DOCUMENT, 'ppt/presentation.xml')),
+        'ppt/presentation.xml': (f'<?xml version="1.0" encoding="UTF-8"?><p:presentation {namespaces}>'
+                                 f'<p:sldIdLst>{"".join(slide_ids)}</p:sldIdLst></p:presentation>'),
+        'ppt/_rels/presentation.xml.rels': RELS.format(''.join(relationships)),
+    })
+    return _package(parts)
+
+
+def make_csv(rows: int) -> bytes:
+    lines = ['sheet,description,quantity,unit,cost']
+    lines += [f'A-{r % 400:03d},"{_sentence(r, 6)}",{r % 97},ea,{r * 1.37:.2f}' for r in range(rows)]
+    return ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+def make_json(records: int) -> bytes:
+    items = [{'id': r, 'sheet': f'A-{r % 400:03d}', 'description': _sentence(r, 6),
+              'dimensions': {'width': r % 50, 'height': r % 30}, 'tags': WORDS[r % 5:r % 5 + 3]}
+             for r in range(records)]
+    return json.dumps({'project': 'Benchmark', 'items': items}).encode('utf-8')
+
+
+GENERATORS = {
+    'pdf': make_pdf,
+    'docx': make_docx,
+    'xlsx': make_xlsx,
+    'pptx': make_pptx,
+    'csv': make_csv,
+    'json': make_json,
+}
+
+
+def fixture_path(fixture_dir: str, file_format: str, size: int) -> str:
+    """Path of a fixture, generating it on first use"""
+    path = os.path.join(fixture_dir, f'synthetic-{size}{UNITS[file_format]}.{file_format}')
+    if not os.path.exists(path):
+        os.makedirs(fixture_dir, exist_ok=True)
+        started = time.perf_counter()
+        content = GENERATORS[file_format](size)
+        with open(path, 'wb') as f:
+            f.write(content)
+        print(f"  generated {path} ({len(content) / 1e6:.1f} MB, {time.perf_counter() - started:.1f}s)")
+    return path
+
+
+def run_benchmark(converter: DocumentConverter, file_format: str, path: str, size: int,
+                  repeat: int) -> Dict[str, Any]:
+    """
+    Time extract_text on one fixture and measure its peak memory
+
+    Args:
+        converter: Converter to run (OCR disabled, so timings don't depend on tesseract)
+        file_format: Fixture format
+        path: Fixture file
+        size: Number of units (pages, rows, ...) in the fixture
+        repeat: Timed runs; the best one is reported, the median is kept alongside
+
+    Returns:
+        Result record for the history file
+    """
+    with open(path, 'rb') as f:
+        content = f.read()
+    name = os.path.basename(path)
+
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        text = converter.extract_text(content, name)
+        timings.append(time.perf_counter() - started)
+
+    # Measured separately: tracemalloc slows allocation-heavy code down
+    tracemalloc.start()
+    converter.extract_text(content, name)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    best = min(timings)
+    return {
+        'format': file_format,
+        'size': size,
+        'unit': UNITS[file_format],
+        'bytes': len(content),
+        'textChars': len(text),
+        'seconds': round(best, 6),
+        'medianSeconds': round(statistics.median(timings), 6),
+        'mbPerSecond': round(len(content) / 1e6 / best, 3),
+        'unitsPerSecond': round(size / best, 1),
+        'peakMemoryMb': round(peak / 1e6, 2),
+    }
+
+
+def load_history(path: str) -> List[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return json.load(f)
+
+
+def previous_result(history: List[Dict[str, Any]], result: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Latest earlier result for the same format and fixture size"""
+    for run in reversed(history):
+        for earlier in run['results']:
+            if earlier['format'] == result['format'] and earlier['size'] == result['size']:
+                return earlier
+    return None
+
+
+def compare(result: Dict[str, Any], earlier: Optional[Dict[str, Any]], threshold: float) -> Tuple[str, bool]:
+    """Change against the earlier result as text, and whether it is a time or memory regression"""
+    if earlier is None:
+        return 'new', False
+    time_change = result['seconds'] / earlier['seconds'] - 1 if earlier['seconds'] else 0.0
+    memory_change = result['peakMemoryMb'] / earlier['peakMemoryMb'] - 1 if earlier['peakMemoryMb'] else 0.0
+    regression = time_change > threshold or memory_change > threshold
+    return f"time {time_change:+.0%}, memory {memory_change:+.0%}{'  REGRESSION' if regression else ''}", regression
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark DocumentConverter on synthetic fixtures')
+    parser.add_argument('--formats', default=','.join(GENERATORS), help='Comma-separated formats to run')
+    for file_format, size in DEFAULT_SIZES.items():
+        parser.add_argument(f'--{file_format}-size', type=int, default=size,
+                            help=f'{UNITS[file_format].capitalize()} in the {file_format.upper()} fixture '
+                                 f'(default: {size})')
+    parser.add_argument('--scale', type=float, default=1.0, help='Multiply every fixture size (e.g. 0.1 for a quick run)')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per fixture')
+    parser.add_argument('--fixtures', default=DEFAULT_FIXTURE_DIR, help='Directory for generated fixtures')
+    parser.add_argument('--results', default=DEFAULT_RESULTS_FILE, help='History file the results are appended to')
+    parser.add_argument('--label', type=str, help='Label stored with this run (e.g. a commit or branch)')
+    parser.add_argument('--no-save', action='store_true', help="Compare against the history but don't append")
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                        help='Slowdown or memory growth reported as a regression (fraction)')
+    parser.add_argument('--fail-on-regression', action='store_true', help='Exit with status 1 on a regression')
+
+    args = parser.parse_args()
+
+    converter = DocumentConverter(enable_ocr=False)
+    formats = [file_format.strip() for file_format in args.formats.split(',') if file_format.strip()]
+    unknown = [file_format for file_format in formats if file_format not in GENERATORS]
+    if unknown:
+        print(f"Error: unknown formats: {', '.join(unknown)}")
+        sys.exit(1)
+
+    history = load_history(args.results)
+    results = []
+    regressions = 0
+    print(f"{'format':<6} {'size':>14} {'MB':>8} {'seconds':>9} {'MB/s':>8} {'units/s':>12} {'peak MB':>9}  change")
+    for file_format in formats:
+        if not converter.supported_types.get(file_format, True):
+            print(f"{file_format:<6} skipped: its library is not installed")
+            continue
+        size = max(1, int(getattr(args, f'{file_format}_size') * args.scale))
+        path = fixture_path(args.fixtures, file_format, size)
+        result = run_benchmark(converter, file_format, path, size, args.repeat)
+        change, regression = compare(result, previous_result(history, result), args.threshold)
+        regressions += regression
+        results.append(result)
+        print(f"{file_format:<6} {f'{size} {UNITS[file_format]}':>14} {result['bytes'] / 1e6:>8.1f} "
+              f"{result['seconds']:>9.3f} {result['mbPerSecond']:>8.2f} {result['unitsPerSecond']:>12.1f} "
+              f"{result['peakMemoryMb']:>9.1f}  {change}")
+
+    if results and not args.no_save:
+        history.append({
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'label': args.label,
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'results': results,
+        })
+        with open(args.results, 'w') as f:
+            json.dump(history, f, indent=2)
+        print(f"\nResults appended to {args.results} ({len(history)} runs)")
+
+    if regressions and args.fail_on_regression:
+        print(f"{regressions} regression(s) above {args.threshold:.0%}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+"""
+Blueprint Entity Extractor
+Pulls structural members, standards codes, fire ratings, dimensions, rooms, drawing scale and
+materials out of DocumentConverter text in a single pass of one compiled pattern
+"""
+
+import re
+import logging
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+# Canonical material name -> spellings found on drawings and specs
+MATERIALS = {
+    'structural steel': ['structural steel'],
+    'stainless steel': ['stainless steel', 'stainless'],
+    'galvanized steel': ['galvanized steel', 'galv. steel', 'galv steel'],
+    'steel': ['steel', 'stl'],
+    'reinforced concrete': ['reinforced concrete'],
+    'precast concrete': ['precast concrete', 'precast'],
+    'concrete': ['concrete', 'conc.', 'conc'],
+    'rebar': ['rebar', 'reinforcing bar', 'reinforcing bars', 'reinforcing steel'],
+    'concrete masonry unit': ['concrete masonry unit', 'concrete masonry units', 'cmu'],
+    'brick': ['brick', 'face brick'],
+    'masonry': ['masonry'],
+    'grout': ['grout'],
+    'mortar': ['mortar'],
+    'gypsum board': ['gypsum board', 'gypsum wallboard', 'gyp. bd.', 'gyp bd', 'gwb', 'drywall'],
+    'plywood': ['plywood'],
+    'oriented strand board': ['oriented strand board', 'osb'],
+    'glulam': ['glulam', 'glued laminated timber'],
+    'cross-laminated timber': ['cross-laminated timber', 'cross laminated timber', 'clt'],
+    'lumber': ['lumber', 'dimensional lumber'],
+    'timber': ['timber', 'heavy timber'],
+    'wood': ['wood'],
+    'aluminum': ['aluminum', 'aluminium', 'alum.'],
+    'copper': ['copper'],
+    'cast iron': ['cast iron'],
+    'ductile iron': ['ductile iron'],
+    'pvc': ['pvc', 'polyvinyl chloride'],
+    'hdpe': ['hdpe', 'high-density polyethylene'],
+    'glass': ['glass', 'glazing', 'insulated glass'],
+    'insulation': ['insulation', 'batt insulation', 'rigid insulation', 'spray foam'],
+    'mineral wool': ['mineral wool'],
+    'fiberglass': ['fiberglass', 'fibreglass'],
+    'asphalt': ['asphalt'],
+    'epdm': ['epdm'],
+    'tpo': ['tpo'],
+    'stone': ['stone', 'natural stone'],
+    'granite': ['granite'],
+    'ceramic tile': ['ceramic tile', 'porcelain tile'],
+    'acoustical ceiling tile': ['acoustical ceiling tile'],
+}
+
+# Standards bodies whose designations are recognised (ASTM A615, ACI 318, AWS D1.1, ...)
+STANDARDS_BODIES = [
+    'ASTM', 'ACI', 'AISC', 'AISI', 'ANSI', 'ASCE', 'ASHRAE', 'ASME', 'AWS', 'AWWA', 'CSA',
+    'IBC', 'IFC', 'IMC', 'IPC', 'NEC', 'NFPA', 'OSHA', 'SMACNA', 'TMS', 'UL', 'NDS',
+]
+
+NUMBER_WORDS = {'ONE': '1', 'TWO': '2', 'THREE': '3', 'FOUR': '4'}
+
+# Cap on values kept per field so a huge spec book can't blow up the index document
+MAX_VALUES_PER_FIELD = 100
+
+
+def _alternation(phrases: List[str]) -> str:
+    """Regex alternation with the longest phrases first so 'structural steel' wins over 'steel'"""
+    ordered = sorted(set(phrases), key=lambda phrase: (-len(phrase), phrase))
+    return '|'.join(re.escape(phrase).replace(r'\ ', r'\s+') for phrase in ordered)
+
+
+_MATERIAL_LOOKUP = {
+    re.sub(r'\s+', ' ', spelling.lower()): canonical
+    for canonical, spellings in MATERIALS.items()
+    for spelling in spellings
+}
+
+# One pattern, tried left to right at each position; the first alternative that matches wins,
+# so the more specific shapes come first (a scale contains a feet-inch dimension).
+_PATTERNS = [
+    ('member', r"\b(?:W|S|HP|M|C|MC|WT)\s?\d{1,2}(?:\.\d+)?\s?[x×]\s?\d{1,3}(?:\.\d+)?\b"
+               r"|\bHSS\s?\d{1,2}(?:\.\d+)?(?:\s?[x×]\s?(?:\d{1,2}(?:/\d{1,2}|\.\d+)?|\.\d+)){1,2}(?![\w/])"
+               r"|\bL\s?\d{1,2}(?:\.\d+)?\s?[x×]\s?\d{1,2}(?:\.\d+)?\s?[x×]\s?\d{1,2}(?:/\d{1,2}|\.\d+)?\b"),
+    ('standard', r"\b(?:" + '|'.join(STANDARDS_BODIES) + r")[\s-]?[A-Z]{0,2}\d{1,5}(?:[.\-]\d{1,3})*M?\b"),
+    ('fire', r"\b(?:\d(?:\.\d)?|ONE|TWO|THREE|FOUR)[\s-]?(?:HOURS?|HRS?)\b(?:\s+(?:FIRE[\s-]?)?RATED|\s+RATING)?"),
+    ('scale', r"\b\d{1,2}(?:/\d{1,3})?\"\s?=\s?\d{1,3}'\s?-?\s?\d{1,2}\""
+              r"|\bSCALE:?\s*1\s?:\s?\d{1,4}\b"),
+    ('dimension', r"(?<![\w'])\d{1,4}'\s?-?\s?\d{1,2}(?:\s\d{1,2}/\d{1,2})?\""
+                  r"|(?<![\w'])\d{1,4}'(?![\w'-])"),
+    ('room', r"\b(?:ROOM|RM\.?)\s?(?:NO\.?|#)?\s?\d{1,4}[A-Z]?\b"),
+    ('material', r"\b(?:" + _alternation(list(_MATERIAL_LOOKUP)) + r")(?!\w)"),
+]
+
+BLUEPRINT_PATTERN = re.compile(
+    '|'.join(f'(?P<{name}>{pattern})' for name, pattern in _PATTERNS),
+    re.IGNORECASE,
+)
+
+# Index field each match kind fills
+FIELD_FOR_KIND = {
+    'member': 'structuralMembers',
+    'standard': 'standardsCodes',
+    'fire': 'fireRatings',
+    'scale': 'drawingScale',
+    'dimension': 'dimensions',
+    'room': 'roomNumbers',
+    'material': 'materials',
+}
+
+
+def _normalize(kind: str, text: str) -> str:
+    """Canonical spelling, so '2 HOUR' and '2-hr' facet together"""
+    text = re.sub(r'\s+', ' ', text.strip())
+    if kind == 'member':
+        return re.sub(r'\s?[xX×]\s?', 'X', text.upper()).replace(' ', '')
+    if kind == 'standard':
+        body, rest = re.match(r'([A-Za-z]+)[\s-]?(.*)', text).groups()
+        return f'{body.upper()} {rest.upper()}'
+    if kind == 'fire':
+        amount = re.match(r'[\d.]+|[A-Za-z]+', text).group(0).upper()
+        return f'{NUMBER_WORDS.get(amount, amount)}-HR'
+    if kind == 'dimension':
+        match = re.match(r"(\d+)'\s?-?\s?(?:(\d+(?:\s\d+/\d+)?)\")?", text)
+        feet, inches = match.groups()
+        return f"{feet}'-{inches}\"" if inches is not None else f"{feet}'"
+    if kind == 'scale':
+        return re.sub(r'\s*=\s*', ' = ', re.sub(r'^SCALE:?\s*', '', text, flags=re.IGNORECASE)).replace(' : ', ':')
+    if kind == 'room':
+        return re.search(r'\d{1,4}[A-Za-z]?$', text).group(0).upper()
+    if kind == 'material':
+        return _MATERIAL_LOOKUP.get(text.lower(), text.lower())
+    return text
+
+
+class BlueprintExtractor:
+    """Single-pass extractor for the blueprint index fields"""
+
+    def __init__(self, max_values: int = MAX_VALUES_PER_FIELD):
+        self.max_values = max_values
+
+    def extract(self, text: str) -> Dict[str, object]:
+        """
+        Extract blueprint entities from document text
+
+        Args:
+            text: Text from DocumentConverter
+
+        Returns:
+            Index fields: lists of distinct values in order of first appearance, and
+            drawingScale as the first scale found (or None)
+        """
+        found: Dict[str, Dict[str, None]] = {field: {} for field in FIELD_FOR_KIND.values()}
+        for match in BLUEPRINT_PATTERN.finditer(text or ''):
+            kind = match.lastgroup
+            values = found[FIELD_FOR_KIND[kind]]
+            if len(values) < self.max_values:
+                values.setdefault(_normalize(kind, match.group(0)), None)
+
+        fields = {field: list(values) for field, values in found.items()}
+        scales = fields.pop('drawingScale')
+        fields['drawingScale'] = scales[0] if scales else None
+        return fields
+
+    def has_blueprint_data(self, fields: Dict[str, object]) -> bool:
+        return any(fields.get(name) for name in
+                   ('dimensions', 'materials', 'standardsCodes', 'structuralMembers', 'fireRatings'))
+
+
+# Main function to be used by Azure Function
+def extract_blueprint_fields(text: str) -> Dict[str, object]:
+    """
+    Main entry point for blueprint entity extraction
+
+    Args:
+        text: Extracted document text
+
+    Returns:
+        Dictionary of blueprint index fields
+    """
+    return BlueprintExtractor().extract(text)
+
+
+def extract_document_fields(content: bytes, file_name: str, mime_type: Optional[str] = None) -> Dict[str, object]:
+    """Convert a document with DocumentConverter and extract its blueprint fields, plus the OCR fields"""
+    try:
+        from .document_converter import extract_document_with_metadata
+    except ImportError:
+        from document_converter import extract_document_with_metadata
+
+    converted = extract_document_with_metadata(content, file_name, mime_type)
+    fields = extract_blueprint_fields(converted['text'])
+    if converted['ocrPages']:
+        fields['ocrConfidence'] = converted['ocrConfidence']
+        fields['hasHandwrittenText'] = converted['hasHandwrittenText']
+    return fields
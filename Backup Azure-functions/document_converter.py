@@ -4,9 +4,14 @@ Supports: PDF, Word, Excel, PowerPoint, Text, CSV, and more
 """
 
 import io
+import os
 import base64
 import logging
+import posixpath
+import zipfile
 import chardet
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
 from typing import Optional, Dict, Any, List
 import json
 
@@ -16,12 +21,6 @@ try:
 except ImportError:
     PdfReader = None
 
-# Word document handling
-try:
-    from docx import Document
-except ImportError:
-    Document = None
-
 # Excel handling
 try:
     import openpyxl
@@ -29,40 +28,369 @@ try:
 except ImportError:
     openpyxl = None
 
-# PowerPoint handling
+# OCR for scanned PDF pages (also needs the tesseract binary)
+try:
+    import pytesseract
+    from PIL import Image
+except ImportError:
+    pytesseract = None
+
+# Page rendering for OCR: PyMuPDF, or pdf2image with poppler
+try:
+    import fitz
+except ImportError:
+    fitz = None
+
 try:
-    from pptx import Presentation
+    from pdf2image import convert_from_bytes
 except ImportError:
-    Presentation = None
+    convert_from_bytes = None
 
 # CSV handling
 import csv
 
 logger = logging.getLogger(__name__)
 
+# Pages with less extracted text than this have no usable text layer and are OCR'd
+MIN_PAGE_TEXT_CHARS = 20
+OCR_DPI = int(os.environ.get('OCR_DPI', '300'))
+OCR_LANGUAGE = os.environ.get('OCR_LANGUAGE', 'eng')
+OCR_WORKERS = int(os.environ.get('OCR_WORKERS', '0')) or os.cpu_count() or 1
+# A page is flagged as handwritten when this share of its words has a confidence below the threshold;
+# Tesseract reads handwriting poorly, so low word confidence is the signal
+HANDWRITING_MIN_WORDS = 5
+HANDWRITING_LOW_CONFIDENCE = 50
+HANDWRITING_WORD_SHARE = 0.4
+
+# Word and PowerPoint files are read straight from their OOXML parts, so no Office library is needed
+_W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+_A = '{http://schemas.openxmlformats.org/drawingml/2006/main}'
+_P = '{http://schemas.openxmlformats.org/presentationml/2006/main}'
+_R = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+_REL = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+_MC_FALLBACK = '{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback'
+
+# Leading bytes of the binary containers; a file is routed on these before its extension or MIME type
+PDF_MAGIC = b'%PDF-'
+ZIP_MAGIC = b'PK\x03\x04'
+OLE2_MAGIC = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
+# Bytes inspected for a PDF header (readers accept leading junk) and for NUL bytes in text files
+SNIFF_BYTES = 1024
+
+# Main part of each OOXML package type
+OOXML_PARTS = {
+    'word/document.xml': 'docx',
+    'xl/workbook.xml': 'xlsx',
+    'ppt/presentation.xml': 'pptx',
+}
+
+TEXT_FORMATS = {'txt', 'md', 'csv', 'json', 'xml', 'html', 'htm'}
+
+MIME_FORMATS = {
+    'application/pdf': 'pdf',
+    'application/vnd.openxmlformats-officedocument.wordprocessingml.document': 'docx',
+    'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet': 'xlsx',
+    'application/vnd.openxmlformats-officedocument.presentationml.presentation': 'pptx',
+    'application/msword': 'doc',
+    'application/vnd.ms-excel': 'xls',
+    'application/vnd.ms-powerpoint': 'ppt',
+    'text/plain': 'txt',
+    'text/markdown': 'md',
+    'text/csv': 'csv',
+    'application/json': 'json',
+    'application/xml': 'xml',
+    'text/xml': 'xml',
+    'text/html': 'html',
+}
+
+# Pre-2007 Office files (OLE2 compound documents) have no extractor
+LEGACY_OFFICE = {
+    'doc': ('Word 97-2003 document', 'docx'),
+    'xls': ('Excel 97-2003 workbook', 'xlsx'),
+    'ppt': ('PowerPoint 97-2003 presentation', 'pptx'),
+}
+
+_ocr_ready = None
+
+# Per-process state of an OCR worker: the PDF being processed and its open PyMuPDF document
+_ocr_state = {'content': None, 'document': None}
+
+
+def ocr_available() -> bool:
+    """True when pytesseract, the tesseract binary and a page renderer are all present"""
+    global _ocr_ready
+    if _ocr_ready is None:
+        _ocr_ready = False
+        if pytesseract is not None and (fitz is not None or convert_from_bytes is not None):
+            try:
+                pytesseract.get_tesseract_version()
+                _ocr_ready = True
+            except Exception as e:
+                logger.warning(f"Tesseract not available, OCR disabled: {str(e)}")
+    return _ocr_ready
+
+
+def _init_ocr_worker(content: Optional[bytes]) -> None:
+    if _ocr_state['document'] is not None:
+        _ocr_state['document'].close()
+    _ocr_state['content'] = content
+    _ocr_state['document'] = None
+
+
+def _render_page(page_index: int):
+    """Render one PDF page to a grayscale image at OCR_DPI"""
+    if fitz is not None:
+        if _ocr_state['document'] is None:
+            _ocr_state['document'] = fitz.open(stream=_ocr_state['content'], filetype='pdf')
+        pixmap = _ocr_state['document'].load_page(page_index).get_pixmap(dpi=OCR_DPI, colorspace=fitz.csGRAY)
+        return Image.frombytes('L', (pixmap.width, pixmap.height), pixmap.samples)
+    return convert_from_bytes(_ocr_state['content'], dpi=OCR_DPI, first_page=page_index + 1,
+                              last_page=page_index + 1, grayscale=True)[0]
+
+
+def _ocr_page(page_index: int) -> Dict[str, Any]:
+    """
+    OCR one page of the worker's PDF
+
+    Returns:
+        page, text (words joined per line), confidence (0-1 mean word confidence, None without words),
+        words and handwritten
+    """
+    result = {'page': page_index, 'text': '', 'confidence': None, 'words': 0, 'handwritten': False}
+    try:
+        data = pytesseract.image_to_data(_render_page(page_index), lang=OCR_LANGUAGE,
+                                         output_type=pytesseract.Output.DICT)
+    except Exception as e:
+        logger.warning(f"OCR failed for page {page_index + 1}: {str(e)}")
+        return result
+
+    lines = {}
+    confidences = []
+    for i, word in enumerate(data['text']):
+        confidence = float(data['conf'][i])
+        if confidence < 0 or not word.strip():
+            continue
+        lines.setdefault((data['block_num'][i], data['par_num'][i], data['line_num'][i]), []).append(word)
+        confidences.append(confidence)
+
+    if confidences:
+        low = sum(1 for confidence in confidences if confidence < HANDWRITING_LOW_CONFIDENCE)
+        result.update({
+            'text': '\n'.join(' '.join(words) for words in lines.values()),
+            'confidence': sum(confidences) / len(confidences) / 100,
+            'words': len(confidences),
+            'handwritten': len(confidences) >= HANDWRITING_MIN_WORDS
+                           and low / len(confidences) >= HANDWRITING_WORD_SHARE,
+        })
+    return result
+
+def sniff_format(content: bytes, file_name: str = '', mime_type: str = None) -> str:
+    """
+    Identify a file from its leading bytes, using the extension and MIME type only to tell text formats
+    (and legacy Office types) apart
+    
+    Args:
+        content: File content as bytes
+        file_name: Name of the file
+        mime_type: MIME type of the file (optional)
+    
+    Returns:
+        pdf, docx, xlsx, pptx, a text format (txt, md, csv, json, xml, html, htm), doc/xls/ppt or ole
+        for OLE2 compound documents, zip for other archives and binary for anything else that is not text
+    """
+    file_ext = file_name.lower().rsplit('.', 1)[-1] if '.' in file_name else ''
+    declared = MIME_FORMATS.get((mime_type or '').split(';')[0].strip().lower())
+    head = content[:SNIFF_BYTES]
+    
+    if PDF_MAGIC in head:
+        return 'pdf'
+    if content.startswith(ZIP_MAGIC):
+        try:
+            with zipfile.ZipFile(io.BytesIO(content)) as package:
+                names = set(package.namelist())
+        except zipfile.BadZipFile:
+            return 'binary'
+        if '[Content_Types].xml' in names:
+            for part, file_format in OOXML_PARTS.items():
+                if part in names:
+                    return file_format
+        return 'zip'
+    if content.startswith(OLE2_MAGIC):
+        for candidate in (file_ext, declared):
+            if candidate in LEGACY_OFFICE:
+                return candidate
+        return 'ole'
+    if b'\x00' in head and not head.startswith((b'\xff\xfe', b'\xfe\xff')):
+        # NUL bytes never occur in 8-bit or UTF-8 text; UTF-16 text carries a byte order mark
+        return 'binary'
+    
+    for candidate in (file_ext, declared):
+        if candidate in TEXT_FORMATS:
+            return candidate
+    return 'txt'
+
+
+def _cell_is_merged(cell: ET.Element, ns: str) -> bool:
+    """True for a table cell covered by a merge that starts in another cell"""
+    if ns == _A:
+        return cell.get('hMerge') in ('1', 'true') or cell.get('vMerge') in ('1', 'true')
+    properties = cell.find(_W + 'tcPr')
+    vmerge = properties.find(_W + 'vMerge') if properties is not None else None
+    return vmerge is not None and vmerge.get(_W + 'val', 'continue') == 'continue'
+
+
+def _cell_span(cell: ET.Element, ns: str) -> int:
+    """Grid columns a WordprocessingML cell covers (DrawingML writes explicit hMerge cells instead)"""
+    if ns == _A:
+        return 1
+    span = cell.find(f'{_W}tcPr/{_W}gridSpan')
+    return int(span.get(_W + 'val', '1')) if span is not None else 1
+
+
+def _table_lines(rows: List[List[str]]) -> List[str]:
+    """Rows as "a | b" lines, skipping empty cells and rows"""
+    lines = [' | '.join(cell for cell in row if cell) for row in rows]
+    return [line for line in lines if line]
+
+
+def _iter_ooxml_blocks(stream, ns: str, container: str, text_body: Optional[str] = None):
+    """
+    Stream the paragraphs and tables of an OOXML part in document order with iterparse
+    
+    Args:
+        stream: File object of the XML part (e.g. word/document.xml or a slide)
+        ns: Namespace of the paragraph, run text and table elements (_W or _A)
+        container: Element holding the blocks; it is cleared after each block to keep memory flat
+        text_body: Element whose paragraphs form one block (a:txBody of a shape), None for per-paragraph blocks
+    
+    Yields:
+        ('text', str) for each paragraph or text body and ('table', rows) for each top-level table,
+        rows being lists of cell strings with '' for cells covered by a merge
+    """
+    p, t, tab, br, cr = ns + 'p', ns + 't', ns + 'tab', ns + 'br', ns + 'cr'
+    tbl, tr, tc = ns + 'tbl', ns + 'tr', ns + 'tc'
+    root = None
+    paragraphs = []
+    tables = []
+    body = None
+    fallback = 0
+
+    for event, elem in ET.iterparse(stream, events=('start', 'end')):
+        tag = elem.tag
+        if tag == _MC_FALLBACK:
+            fallback += 1 if event == 'start' else -1
+            continue
+        if fallback:
+            # Alternate content fallbacks repeat the text of the choice they stand in for
+            continue
+
+        if event == 'start':
+            if tag == p:
+                paragraphs.append([])
+            elif tag == tbl:
+                tables.append({'rows': [], 'row': None, 'cell': None})
+            elif tag == tr and tables:
+                tables[-1]['row'] = []
+            elif tag == tc and tables:
+                tables[-1]['cell'] = []
+            elif tag == text_body and not tables:
+                body = []
+            elif tag == container and root is None:
+                root = elem
+            continue
+
+        block = None
+        if tag == t and paragraphs:
+            paragraphs[-1].append(elem.text or '')
+        elif tag == tab and paragraphs:
+            paragraphs[-1].append('\t')
+        elif (tag == br or tag == cr) and paragraphs:
+            paragraphs[-1].append('\n')
+        elif tag == p and paragraphs:
+            text = ''.join(paragraphs.pop())
+            if paragraphs:
+                # Paragraph of a text box anchored inside another paragraph
+                if text:
+                    paragraphs[-1].append(f'\n{text}\n')
+            elif tables and tables[-1]['cell'] is not None:
+                tables[-1]['cell'].append(text)
+            elif body is not None:
+                body.append(text)
+            else:
+                block = ('text', text)
+        elif tag == tc and tables and tables[-1]['row'] is not None:
+            table = tables[-1]
+            merged = _cell_is_merged(elem, ns)
+            text = '' if merged else '\n'.join(part.strip() for part in table['cell'] if part.strip())
+            table['row'].extend([text] + [''] * (_cell_span(elem, ns) - 1))
+            table['cell'] = None
+        elif tag == tr and tables and tables[-1]['row'] is not None:
+            tables[-1]['rows'].append(tables[-1]['row'])
+            tables[-1]['row'] = None
+        elif tag == tbl and tables:
+            rows = tables.pop()['rows']
+            if tables and tables[-1]['cell'] is not None:
+                # Nested table: its rows become lines of the enclosing cell
+                tables[-1]['cell'].extend(_table_lines(rows))
+            elif paragraphs:
+                paragraphs[-1].append('\n' + '\n'.join(_table_lines(rows)))
+            else:
+                block = ('table', rows)
+        elif tag == text_body and body is not None and not tables:
+            block = ('text', '\n'.join(body))
+            body = None
+
+        if block is not None:
+            yield block
+            if root is not None:
+                root.clear()
+
+
+def _slide_part_names(package: zipfile.ZipFile) -> List[str]:
+    """Slide part names of a presentation in slide order"""
+    with package.open('ppt/_rels/presentation.xml.rels') as f:
+        targets = {rel.get('Id'): rel.get('Target')
+                   for rel in ET.parse(f).getroot().iter(_REL + 'Relationship')}
+    with package.open('ppt/presentation.xml') as f:
+        slide_ids = list(ET.parse(f).getroot().iter(_P + 'sldId'))
+    
+    names = []
+    for slide_id in slide_ids:
+        target = targets.get(slide_id.get(_R + 'id'))
+        if target:
+            names.append(target.lstrip('/') if target.startswith('/')
+                         else posixpath.normpath(posixpath.join('ppt', target)))
+    return names
+
 
 class DocumentConverter:
     """Universal document converter for multiple file types"""
     
-    def __init__(self):
+    def __init__(self, enable_ocr: bool = True):
+        self.ocr_enabled = enable_ocr and ocr_available()
         self.supported_types = self._get_supported_types()
+        self.metadata = self._empty_metadata()
+    
+    def _empty_metadata(self) -> Dict[str, Any]:
+        return {'ocrConfidence': None, 'hasHandwrittenText': False, 'ocrPages': 0, 'tables': []}
     
     def _get_supported_types(self) -> Dict[str, bool]:
         """Check which file types are supported based on available libraries"""
         return {
             'pdf': PdfReader is not None,
-            'docx': Document is not None,
+            'docx': True,
             'xlsx': openpyxl is not None,
-            'pptx': Presentation is not None,
+            'pptx': True,
             'txt': True,
             'csv': True,
             'md': True,
             'json': True,
+            'ocr': self.ocr_enabled,
         }
     
     def extract_text(self, content: bytes, file_name: str, mime_type: str = None) -> str:
         """
-        Extract text from document based on file type
+        Extract text from document based on its content (see sniff_format)
         
         Args:
             content: File content as bytes
@@ -72,92 +400,127 @@ class DocumentConverter:
         Returns:
             Extracted text as string
         """
-        # Determine file type from extension
-        file_ext = file_name.lower().split('.')[-1] if '.' in file_name else ''
+        self.metadata = self._empty_metadata()
+        
+        file_format = sniff_format(content, file_name, mime_type)
+        
+        if file_format in LEGACY_OFFICE:
+            description, replacement = LEGACY_OFFICE[file_format]
+            logger.warning(f"Rejected {file_name}: {description}")
+            return f"Unsupported file format: {description}; save it as .{replacement} to extract its text"
+        if file_format in ('ole', 'zip', 'binary'):
+            logger.warning(f"Rejected {file_name}: no extractor for {file_format} content")
+            return "Unsupported file format: binary content that is not a PDF or Office document"
         
         # Route to appropriate extractor
         extractors = {
             'pdf': self._extract_pdf_text,
             'docx': self._extract_docx_text,
-            'doc': self._extract_docx_text,  # Try docx extractor for .doc
             'xlsx': self._extract_xlsx_text,
-            'xls': self._extract_xlsx_text,  # Try xlsx extractor for .xls
             'pptx': self._extract_pptx_text,
-            'ppt': self._extract_pptx_text,  # Try pptx extractor for .ppt
-            'txt': self._extract_plain_text,
-            'md': self._extract_plain_text,
             'csv': self._extract_csv_text,
             'json': self._extract_json_text,
-            'xml': self._extract_plain_text,
-            'html': self._extract_plain_text,
-            'htm': self._extract_plain_text,
         }
         
-        extractor = extractors.get(file_ext, self._extract_plain_text)
+        extractor = extractors.get(file_format, self._extract_plain_text)
         
         try:
             text = extractor(content, file_name)
-            logger.info(f"Successfully extracted text from {file_name} ({file_ext})")
+            logger.info(f"Successfully extracted text from {file_name} ({file_format})")
             return text
         except Exception as e:
             logger.error(f"Failed to extract text from {file_name}: {str(e)}")
-            # Fallback to plain text extraction
-            return self._extract_plain_text(content, file_name)
+            if file_format in TEXT_FORMATS:
+                return self._extract_plain_text(content, file_name)
+            # Decoding a damaged PDF or Office file as text only yields junk
+            return f"Unable to extract text from {file_format} file: {str(e)}"
     
     def _extract_pdf_text(self, content: bytes, file_name: str) -> str:
         """Extract text from PDF files"""
         if not PdfReader:
-            logger.warning("PyPDF2 not installed, falling back to plain text")
-            return self._extract_plain_text(content, file_name)
+            logger.warning("PyPDF2 not installed, cannot extract PDF text")
+            return "Unable to extract text from pdf file: PyPDF2 is not installed"
         
         try:
             pdf_file = io.BytesIO(content)
             pdf_reader = PdfReader(pdf_file)
             
-            text_parts = []
+            pages = []
             for page_num, page in enumerate(pdf_reader.pages, 1):
                 try:
-                    page_text = page.extract_text()
-                    if page_text:
-                        text_parts.append(f"--- Page {page_num} ---\n{page_text}")
+                    pages.append(page.extract_text() or '')
                 except Exception as e:
                     logger.warning(f"Failed to extract page {page_num}: {str(e)}")
+                    pages.append('')
+            
+            # Only pages without a usable text layer are rendered and OCR'd
+            scanned = [i for i, page_text in enumerate(pages) if len(page_text.strip()) < MIN_PAGE_TEXT_CHARS]
+            if scanned and self.ocr_enabled:
+                results = self._ocr_pages(content, scanned)
+                for result in results:
+                    if len(result['text'].strip()) > len(pages[result['page']].strip()):
+                        pages[result['page']] = result['text']
+                self._record_ocr(results)
             
+            text_parts = [f"--- Page {page_num} ---\n{page_text}"
+                          for page_num, page_text in enumerate(pages, 1) if page_text]
             return "\n\n".join(text_parts) if text_parts else "No text content found in PDF"
         except Exception as e:
             logger.error(f"PDF extraction failed: {str(e)}")
             raise
     
-    def _extract_docx_text(self, content: bytes, file_name: str) -> str:
-        """Extract text from Word documents"""
-        if not Document:
-            logger.warning("python-docx not installed, falling back to plain text")
-            return self._extract_plain_text(content, file_name)
+    def _ocr_pages(self, content: bytes, page_indexes: List[int]) -> List[Dict[str, Any]]:
+        """OCR the given pages, one process per core, each process rendering its own pages"""
+        workers = min(OCR_WORKERS, len(page_indexes))
+        logger.info(f"OCR of {len(page_indexes)} page(s) without a text layer on {workers} worker(s)")
+        if workers > 1:
+            try:
+                with ProcessPoolExecutor(max_workers=workers, initializer=_init_ocr_worker,
+                                         initargs=(content,)) as pool:
+                    return list(pool.map(_ocr_page, page_indexes))
+            except Exception as e:
+                logger.warning(f"OCR process pool failed, continuing in-process: {str(e)}")
         
+        _init_ocr_worker(content)
+        try:
+            return [_ocr_page(page_index) for page_index in page_indexes]
+        finally:
+            _init_ocr_worker(None)
+    
+    def _record_ocr(self, results: List[Dict[str, Any]]) -> None:
+        """Fill ocrConfidence (word-weighted mean) and hasHandwrittenText from page OCR results"""
+        words = sum(result['words'] for result in results)
+        if words:
+            self.metadata['ocrConfidence'] = round(
+                sum(result['confidence'] * result['words'] for result in results if result['words']) / words, 4)
+        self.metadata['hasHandwrittenText'] = any(result['handwritten'] for result in results)
+        self.metadata['ocrPages'] = len(results)
+    
+    def extract_text_with_metadata(self, content: bytes, file_name: str, mime_type: str = None) -> Dict[str, Any]:
+        """
+        Extract text along with the OCR fields of the index
+        
+        Returns:
+            Dictionary with text, ocrConfidence (None when nothing was OCR'd), hasHandwrittenText, ocrPages
+            and tables (structured rows of Word and PowerPoint tables)
+        """
+        text = self.extract_text(content, file_name, mime_type)
+        return dict(self.metadata, text=text)
+    
+    def _extract_docx_text(self, content: bytes, file_name: str) -> str:
+        """Extract text from Word documents, streaming word/document.xml in document order"""
         try:
-            doc_file = io.BytesIO(content)
-            doc = Document(doc_file)
-            
             text_parts = []
-            
-            # Extract paragraphs
-            for para in doc.paragraphs:
-                if para.text.strip():
-                    text_parts.append(para.text)
-            
-            # Extract text from tables
-            for table in doc.tables:
-                table_text = []
-                for row in table.rows:
-                    row_text = []
-                    for cell in row.cells:
-                        cell_text = cell.text.strip()
-                        if cell_text:
-                            row_text.append(cell_text)
-                    if row_text:
-                        table_text.append(" | ".join(row_text))
-                if table_text:
-                    text_parts.append("\n".join(table_text))
+            with zipfile.ZipFile(io.BytesIO(content)) as package:
+                with package.open('word/document.xml') as document:
+                    for kind, value in _iter_ooxml_blocks(document, _W, _W + 'body'):
+                        if kind == 'table':
+                            self.metadata['tables'].append({'rows': value})
+                            table_text = '\n'.join(_table_lines(value))
+                            if table_text:
+                                text_parts.append(table_text)
+                        elif value.strip():
+                            text_parts.append(value)
             
             return "\n\n".join(text_parts) if text_parts else "No text content found in document"
         except Exception as e:
@@ -167,8 +530,8 @@ class DocumentConverter:
     def _extract_xlsx_text(self, content: bytes, file_name: str) -> str:
         """Extract text from Excel files"""
         if not openpyxl:
-            logger.warning("openpyxl not installed, falling back to plain text")
-            return self._extract_plain_text(content, file_name)
+            logger.warning("openpyxl not installed, cannot extract spreadsheet text")
+            return "Unable to extract text from xlsx file: openpyxl is not installed"
         
         try:
             excel_file = io.BytesIO(content)
@@ -203,38 +566,24 @@ class DocumentConverter:
             raise
     
     def _extract_pptx_text(self, content: bytes, file_name: str) -> str:
-        """Extract text from PowerPoint presentations"""
-        if not Presentation:
-            logger.warning("python-pptx not installed, falling back to plain text")
-            return self._extract_plain_text(content, file_name)
-        
+        """Extract text from PowerPoint presentations, streaming each slide's XML in shape order"""
         try:
-            pptx_file = io.BytesIO(content)
-            presentation = Presentation(pptx_file)
-            
             text_parts = []
-            
-            for slide_num, slide in enumerate(presentation.slides, 1):
-                slide_text = []
-                
-                # Extract text from shapes
-                for shape in slide.shapes:
-                    if hasattr(shape, "text") and shape.text:
-                        slide_text.append(shape.text.strip())
+            with zipfile.ZipFile(io.BytesIO(content)) as package:
+                for slide_num, part_name in enumerate(_slide_part_names(package), 1):
+                    slide_text = []
+                    with package.open(part_name) as slide:
+                        for kind, value in _iter_ooxml_blocks(slide, _A, _P + 'spTree', _P + 'txBody'):
+                            if kind == 'table':
+                                self.metadata['tables'].append({'slide': slide_num, 'rows': value})
+                                slide_text.extend(_table_lines(value))
+                            else:
+                                value = value.strip()
+                                if value:
+                                    slide_text.append(value)
                     
-                    # Extract text from tables
-                    if shape.has_table:
-                        table = shape.table
-                        for row in table.rows:
-                            row_text = []
-                            for cell in row.cells:
-                                if cell.text.strip():
-                                    row_text.append(cell.text.strip())
-                            if row_text:
-                                slide_text.append(" | ".join(row_text))
-                
-                if slide_text:
-                    text_parts.append(f"--- Slide {slide_num} ---\n" + "\n".join(slide_text))
+                    if slide_text:
+                        text_parts.append(f"--- Slide {slide_num} ---\n" + "\n".join(slide_text))
             
             return "\n\n".join(text_parts) if text_parts else "No text content found in presentation"
         except Exception as e:
@@ -341,6 +690,22 @@ def extract_document_text(content: bytes, file_name: str, mime_type: str = None)
     return converter.extract_text(content, file_name, mime_type)
 
 
+def extract_document_with_metadata(content: bytes, file_name: str, mime_type: str = None) -> Dict[str, Any]:
+    """
+    Entry point that also returns the OCR fields (ocrConfidence, hasHandwrittenText)
+    
+    Args:
+        content: File content as bytes
+        file_name: Name of the file
+        mime_type: MIME type of the file (optional)
+    
+    Returns:
+        Dictionary with text, ocrConfidence, hasHandwrittenText, ocrPages and tables
+    """
+    converter = DocumentConverter()
+    return converter.extract_text_with_metadata(content, file_name, mime_type)
+
+
 # Compatibility function for existing code
 def extract_pdf_text(content: bytes) -> str:
     """Legacy function for PDF extraction"""
@@ -1,6 +1,43 @@
 // API endpoint to provide configuration to frontend
 // This runs on the Static Web App's managed functions
 
+const SEARCH_ENDPOINT = 'https://fcssearchservice.search.windows.net';
+// Documents are queried on whichever index this alias points to (moved by scripts/rebuild_index.py)
+const SEARCH_ALIAS_NAME = process.env.AZURE_SEARCH_ALIAS_NAME || 'fcs-construction-docs';
+// The index in service before the alias existed
+const INITIAL_INDEX_NAME = 'fcs-construction-docs-index-v2';
+const ALIAS_TTL_MS = 60 * 1000;
+
+let resolvedIndex = { name: null, expires: 0 };
+
+/**
+ * The index behind the alias; the GA query API doesn't accept alias names.
+ * AZURE_SEARCH_INDEX_NAME pins one index instead.
+ */
+async function searchIndexName(context) {
+    if (process.env.AZURE_SEARCH_INDEX_NAME) {
+        return process.env.AZURE_SEARCH_INDEX_NAME;
+    }
+    if (resolvedIndex.name && Date.now() < resolvedIndex.expires) {
+        return resolvedIndex.name;
+    }
+    let name = resolvedIndex.name || INITIAL_INDEX_NAME;
+    try {
+        const response = await fetch(`${SEARCH_ENDPOINT}/aliases/${SEARCH_ALIAS_NAME}?api-version=2024-03-01-Preview`, {
+            headers: { 'api-key': process.env.AZURE_SEARCH_API_KEY || '' }
+        });
+        if (response.ok) {
+            name = (await response.json()).indexes[0];
+        } else if (response.status === 404) {
+            name = INITIAL_INDEX_NAME;
+        }
+    } catch (error) {
+        context.log.warn(`Could not resolve search alias ${SEARCH_ALIAS_NAME}: ${error.message}`);
+    }
+    resolvedIndex = { name, expires: Date.now() + ALIAS_TTL_MS };
+    return name;
+}
+
 module.exports = async function (context, req) {
     context.log('Config endpoint called');
 
@@ -12,8 +49,8 @@ module.exports = async function (context, req) {
         functionKey: process.env.AZURE_FUNCTION_KEY || '',
         docProcessorKey: process.env.DOC_PROCESSOR_KEY || process.env.AZURE_FUNCTION_KEY || '',
         searchApiKey: process.env.AZURE_SEARCH_API_KEY || '',
-        searchEndpoint: 'https://fcssearchservice.search.windows.net',
-        searchIndexName: 'fcs-construction-docs-index-v2',
+        searchEndpoint: SEARCH_ENDPOINT,
+        searchIndexName: await searchIndexName(context),
         endpoints: {
             analyzeImage: '/analyze-image',
             pdfChunker: '/pdf-chunker',
@@ -9,6 +9,7 @@
     // Configuration
     const SEARCH_CONFIG = {
         endpoint: 'https://fcssearchservice.search.windows.net',
+        // Replaced by the index behind the search alias once /api/config answers
         indexName: 'fcs-construction-docs-index-v2',
         apiVersion: '2023-11-01',
         semanticConfig: 'construction-semantic-config'
@@ -27,6 +28,7 @@
             if (configResponse.ok) {
                 const config = await configResponse.json();
                 searchApiKey = config.searchApiKey || config.functionKey;
+                SEARCH_CONFIG.indexName = config.searchIndexName || SEARCH_CONFIG.indexName;
                 console.log('✅ Direct search initialized');
                 return true;
             }
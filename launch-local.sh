@@ -23,4 +23,4 @@ echo ""
 (sleep 2 && open http://localhost:8080/estimator.html) &
 
 # Start the server
-python3 -m http.server 8080
+python3 test-server.py --port 8080
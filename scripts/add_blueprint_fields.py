@@ -2,6 +2,7 @@
 """
 Add blueprint-specific fields to the search index for enhanced OCR extraction data.
 This includes dimensions, materials, specifications, and other construction-specific data.
+index_schema.py applies this together with the other schema scripts in one update.
 """
 
 import os
@@ -11,19 +12,61 @@ import requests
 import time
 from typing import List, Dict, Any
 
+import search_config
+
 # Configuration
 SEARCH_ENDPOINT = os.environ.get("SEARCH_ENDPOINT", "https://fcssearchservice.search.windows.net")
 SEARCH_API_KEY = os.environ.get("SEARCH_API_KEY", "")
-SEARCH_INDEX_NAME = "fcs-construction-docs-index-v2"
+SEARCH_INDEX_NAME = search_config.SEARCH_INDEX_NAME
 
 # Azure OpenAI configuration for embeddings
 AZURE_OPENAI_ENDPOINT = os.environ.get("AZURE_OPENAI_ENDPOINT", "")
 AZURE_OPENAI_KEY = os.environ.get("AZURE_OPENAI_KEY", "")
 EMBEDDING_MODEL = "text-embedding-ada-002"
 
+# Representative blueprint queries; also the default workload for search_benchmark.py
+BLUEPRINT_TEST_QUERIES = [
+    {
+        "search": "W12x26 steel beam",
+        "searchFields": "materials,specifications,structuralMembers",
+        "top": 5,
+        "select": "id,fileName,materials,specifications"
+    },
+    {
+        "search": "*",
+        "filter": "materials/any(m: m eq 'steel')",
+        "top": 5,
+        "select": "id,fileName,materials"
+    },
+    {
+        "search": "2-hr fire rating",
+        "searchFields": "fireRatings,specifications",
+        "top": 5,
+        "select": "id,fileName,fireRatings,specifications"
+    },
+    {
+        "search": "*",
+        "filter": "hasHandwrittenText eq true",
+        "top": 5,
+        "select": "id,fileName,ocrConfidence"
+    },
+    {
+        "search": "ASTM A615",
+        "searchFields": "standardsCodes,specifications",
+        "top": 5,
+        "select": "id,fileName,standardsCodes"
+    },
+    {
+        "search": "room 101",
+        "searchFields": "roomNumbers,content",
+        "top": 5,
+        "select": "id,fileName,roomNumbers"
+    }
+]
+
 def get_current_index() -> Dict[str, Any]:
     """Get the current index definition."""
-    url = f"{SEARCH_ENDPOINT}/indexes/{SEARCH_INDEX_NAME}?api-version=2023-11-01"
+    url = f"{SEARCH_ENDPOINT}/indexes/{search_config.index_name()}?api-version=2023-11-01"
     headers = {
         "api-key": SEARCH_API_KEY,
         "Content-Type": "application/json"
@@ -381,7 +424,8 @@ def create_suggesters(index_def: Dict[str, Any]) -> Dict[str, Any]:
 
 def apply_index_update(index_def: Dict[str, Any]) -> bool:
     """Apply the updated index definition."""
-    url = f"{SEARCH_ENDPOINT}/indexes/{SEARCH_INDEX_NAME}?api-version=2023-11-01&allowIndexDowntime=false"
+    url = (f"{SEARCH_ENDPOINT}/indexes/{search_config.index_name()}"
+           "?api-version=2023-11-01&allowIndexDowntime=false")
     headers = {
         "api-key": SEARCH_API_KEY,
         "Content-Type": "application/json",
@@ -400,53 +444,14 @@ def apply_index_update(index_def: Dict[str, Any]) -> bool:
 
 def test_blueprint_search():
     """Test search with blueprint-specific queries."""
-    url = f"{SEARCH_ENDPOINT}/indexes/{SEARCH_INDEX_NAME}/docs/search?api-version=2023-11-01"
+    url = f"{SEARCH_ENDPOINT}/indexes/{search_config.index_name()}/docs/search?api-version=2023-11-01"
     headers = {
         "api-key": SEARCH_API_KEY,
         "Content-Type": "application/json"
     }
     
-    test_queries = [
-        {
-            "search": "W12x26 steel beam",
-            "searchFields": "materials,specifications,structuralMembers",
-            "top": 5,
-            "select": "id,fileName,materials,specifications"
-        },
-        {
-            "search": "*",
-            "filter": "materials/any(m: m eq 'steel')",
-            "top": 5,
-            "select": "id,fileName,materials"
-        },
-        {
-            "search": "2-hr fire rating",
-            "searchFields": "fireRatings,specifications",
-            "top": 5,
-            "select": "id,fileName,fireRatings,specifications"
-        },
-        {
-            "search": "*",
-            "filter": "hasHandwrittenText eq true",
-            "top": 5,
-            "select": "id,fileName,ocrConfidence"
-        },
-        {
-            "search": "ASTM A615",
-            "searchFields": "standardsCodes,specifications",
-            "top": 5,
-            "select": "id,fileName,standardsCodes"
-        },
-        {
-            "search": "room 101",
-            "searchFields": "roomNumbers,content",
-            "top": 5,
-            "select": "id,fileName,roomNumbers"
-        }
-    ]
-    
     print("\nTesting blueprint-specific searches:")
-    for i, query in enumerate(test_queries, 1):
+    for i, query in enumerate(BLUEPRINT_TEST_QUERIES, 1):
         print(f"\nTest {i}: {query.get('search', 'Filter query')}")
         start = time.time()
         response = requests.post(url, headers=headers, json=query)
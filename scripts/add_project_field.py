@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 """
 Add project field to the search index and optimize for performance.
+index_schema.py applies this together with the other schema scripts in one update.
 """
 
 import os
@@ -9,14 +10,23 @@ import json
 import requests
 import time
 
+import search_config
+
 # Configuration
 SEARCH_ENDPOINT = "https://fcssearchservice.search.windows.net"
 SEARCH_API_KEY = os.environ.get("SEARCH_API_KEY", "")
-SEARCH_INDEX_NAME = "fcs-construction-docs-index-v2"
+SEARCH_INDEX_NAME = search_config.SEARCH_INDEX_NAME
+
+# Keyword, filter and semantic probes; also part of the default workload for search_benchmark.py
+PERFORMANCE_TEST_QUERIES = [
+    {"search": "steel", "top": 5, "select": "id,fileName,projectName"},
+    {"search": "*", "filter": "client eq 'Milo'", "top": 5, "select": "id,fileName,projectName"},
+    {"search": "construction", "queryType": "semantic", "semanticConfiguration": "construction-semantic-config", "top": 5}
+]
 
 def get_current_index():
     """Get the current index definition."""
-    url = f"{SEARCH_ENDPOINT}/indexes/{SEARCH_INDEX_NAME}?api-version=2023-11-01"
+    url = f"{SEARCH_ENDPOINT}/indexes/{search_config.index_name()}?api-version=2023-11-01"
     headers = {
         "api-key": SEARCH_API_KEY,
         "Content-Type": "application/json"
@@ -161,7 +171,8 @@ def optimize_index_settings(index_def):
 
 def apply_index_update(index_def):
     """Apply the updated index definition."""
-    url = f"{SEARCH_ENDPOINT}/indexes/{SEARCH_INDEX_NAME}?api-version=2023-11-01&allowIndexDowntime=false"
+    url = (f"{SEARCH_ENDPOINT}/indexes/{search_config.index_name()}"
+           "?api-version=2023-11-01&allowIndexDowntime=false")
     headers = {
         "api-key": SEARCH_API_KEY,
         "Content-Type": "application/json",
@@ -180,20 +191,14 @@ def apply_index_update(index_def):
 
 def test_search_performance():
     """Test search performance after updates."""
-    url = f"{SEARCH_ENDPOINT}/indexes/{SEARCH_INDEX_NAME}/docs/search?api-version=2023-11-01"
+    url = f"{SEARCH_ENDPOINT}/indexes/{search_config.index_name()}/docs/search?api-version=2023-11-01"
     headers = {
         "api-key": SEARCH_API_KEY,
         "Content-Type": "application/json"
     }
     
-    test_queries = [
-        {"search": "steel", "top": 5, "select": "id,fileName,projectName"},
-        {"search": "*", "filter": "client eq 'Milo'", "top": 5, "select": "id,fileName,projectName"},
-        {"search": "construction", "queryType": "semantic", "semanticConfiguration": "construction-semantic-config", "top": 5}
-    ]
-    
-    print("\nTesting search performance:")
-    for i, query in enumerate(test_queries, 1):
+    print("\nTesting search performance (single pass; use search_benchmark.py for percentiles):")
+    for i, query in enumerate(PERFORMANCE_TEST_QUERIES, 1):
         start = time.time()
         response = requests.post(url, headers=headers, json=query)
         elapsed = time.time() - start
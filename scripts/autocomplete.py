@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""
+Local autocomplete for the blueprint-suggester fields.
+Values of the suggester's source fields come from the local facet cache, weighted by how many
+documents carry them. A radix trie over every word-suffix of each value answers prefix suggestions
+the way analyzingInfixMatching does, and a trigram index finds substrings inside words. The index
+is updated value by value when the facet cache changes, so it never needs a full rebuild.
+"""
+
+import re
+import sys
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Dict, Any, Optional, Set
+from urllib.parse import urlparse, parse_qs
+
+import index_schema
+from facet_cache import FacetCache, DEFAULT_DB_PATH
+from search_benchmark import percentile
+
+SOURCE_FIELDS = next(s["sourceFields"] for s in index_schema.SUGGESTERS if s["name"] == "blueprint-suggester")
+
+# Best entries kept on every trie node, so common prefixes never walk their subtree
+TOP_K = 20
+
+def normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+def _word_suffixes(normalized: str) -> Set[str]:
+    """The value from each word onwards: 'gypsum board' -> {'gypsum board', 'board'}."""
+    return {normalized[match.start():] for match in re.finditer(r"\w+", normalized)} | {normalized}
+
+def _trigrams(normalized: str) -> Set[str]:
+    return {normalized[i:i + 3] for i in range(len(normalized) - 2)}
+
+class _Node:
+    __slots__ = ("edges", "ids", "top")
+
+    def __init__(self):
+        self.edges = {}   # first character -> [label, child]
+        self.ids = set()  # entries whose key ends here
+        self.top = []     # best entries in this subtree, None when it has to be recomputed
+
+class RadixTrie:
+    """Compressed trie mapping keys to entry ids, with a cached top list per node."""
+
+    def __init__(self, rank):
+        self.root = _Node()
+        self.rank = rank
+
+    def _path(self, key: str, create: bool = False) -> Optional[List[_Node]]:
+        """Nodes from the root to the node for key (split edges as needed when creating)."""
+        node, rest, path = self.root, key, [self.root]
+        while rest:
+            edge = node.edges.get(rest[0])
+            if edge is None:
+                if not create:
+                    return None
+                child = _Node()
+                node.edges[rest[0]] = [rest, child]
+                path.append(child)
+                return path
+            label, child = edge
+            common = 0
+            while common < min(len(label), len(rest)) and label[common] == rest[common]:
+                common += 1
+            if common < len(label):
+                if not create:
+                    # A prefix that ends inside an edge belongs to the child below it
+                    return path + [child] if common == len(rest) else None
+                middle = _Node()
+                middle.top = list(child.top) if child.top is not None else None
+                middle.edges[label[common]] = [label[common:], child]
+                edge[0], edge[1] = label[:common], middle
+                child = middle
+            node, rest = child, rest[common:]
+            path.append(node)
+        return path
+
+    def _offer(self, node: _Node, entry_id: int) -> None:
+        if node.top is None:
+            return
+        if entry_id not in node.top:
+            node.top.append(entry_id)
+        node.top.sort(key=self.rank)
+        del node.top[TOP_K:]
+
+    def insert(self, key: str, entry_id: int) -> None:
+        path = self._path(key, create=True)
+        path[-1].ids.add(entry_id)
+        for node in path:
+            self._offer(node, entry_id)
+
+    def remove(self, key: str, entry_id: int) -> None:
+        path = self._path(key) or []
+        if path:
+            path[-1].ids.discard(entry_id)
+        for node in path:
+            if node.top is not None and entry_id in node.top:
+                node.top = None
+
+    def reweigh(self, key: str, entry_id: int, decreased: bool) -> None:
+        for node in self._path(key) or []:
+            if decreased and node.top is not None and entry_id in node.top:
+                # Something outside the cached list may now rank higher
+                node.top = None
+            elif not decreased:
+                self._offer(node, entry_id)
+
+    def find(self, prefix: str) -> Optional[_Node]:
+        path = self._path(prefix)
+        return path[-1] if path else None
+
+    def collect(self, node: _Node) -> Set[int]:
+        ids, stack = set(), [node]
+        while stack:
+            current = stack.pop()
+            ids |= current.ids
+            stack.extend(child for _, child in current.edges.values())
+        return ids
+
+    def best(self, node: _Node) -> List[int]:
+        if node.top is None:
+            node.top = sorted(self.collect(node), key=self.rank)[:TOP_K]
+        return node.top
+
+class AutocompleteIndex:
+    """Prefix and infix suggestions over weighted field values."""
+
+    def __init__(self, fields: List[str] = None):
+        self.fields = fields or SOURCE_FIELDS
+        self._entries: List[Optional[list]] = []   # [field, value, weight]
+        self._ids: Dict[tuple, int] = {}
+        self._trie = RadixTrie(self._rank)
+        self._grams: Dict[str, Set[int]] = {}
+        self._lock = threading.Lock()
+
+    def _rank(self, entry_id: int) -> tuple:
+        field, value, weight = self._entries[entry_id]
+        return (-weight, value)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def weights(self) -> Dict[tuple, int]:
+        with self._lock:
+            return {key: self._entries[entry_id][2] for key, entry_id in self._ids.items()}
+
+    def set(self, field: str, value: str, weight: int) -> None:
+        """Add a value, change its weight, or remove it with a weight of 0."""
+        with self._lock:
+            key = (field, value)
+            normalized = normalize(value)
+            entry_id = self._ids.get(key)
+            if entry_id is None:
+                if weight <= 0 or not normalized:
+                    return
+                entry_id = len(self._entries)
+                self._entries.append([field, value, weight])
+                self._ids[key] = entry_id
+                for suffix in _word_suffixes(normalized):
+                    self._trie.insert(suffix, entry_id)
+                for gram in _trigrams(normalized):
+                    self._grams.setdefault(gram, set()).add(entry_id)
+                return
+
+            previous = self._entries[entry_id][2]
+            if weight <= 0:
+                for suffix in _word_suffixes(normalized):
+                    self._trie.remove(suffix, entry_id)
+                for gram in _trigrams(normalized):
+                    self._grams[gram].discard(entry_id)
+                del self._ids[key]
+                self._entries[entry_id] = None
+            elif weight != previous:
+                self._entries[entry_id][2] = weight
+                for suffix in _word_suffixes(normalized):
+                    self._trie.reweigh(suffix, entry_id, decreased=weight < previous)
+
+    def suggest(self, text: str, top: int = 5, fields: List[str] = None, infix: bool = True,
+                pre_tag: str = None, post_tag: str = None) -> List[Dict[str, Any]]:
+        """
+        Values starting with text at a word boundary, best first, then (with infix) values
+        containing it anywhere. Tags, when given, wrap the matched text like highlightPreTag/PostTag.
+        """
+        query = normalize(text)
+        if not query:
+            return []
+        wanted = set(fields) if fields else None
+        with self._lock:
+            matches: List[int] = []
+            node = self._trie.find(query)
+            if node is not None:
+                if wanted is None and top <= TOP_K:
+                    candidates = self._trie.best(node)
+                else:
+                    candidates = sorted(self._trie.collect(node), key=self._rank)
+                matches = [entry_id for entry_id in candidates
+                           if wanted is None or self._entries[entry_id][0] in wanted][:top]
+
+            if infix and len(matches) < top and len(query) >= 3:
+                postings = sorted((self._grams.get(gram, set()) for gram in _trigrams(query)), key=len)
+                found = set.intersection(*postings) - set(matches)
+                extra = [entry_id for entry_id in found
+                         if (wanted is None or self._entries[entry_id][0] in wanted)
+                         and query in normalize(self._entries[entry_id][1])]
+                matches += sorted(extra, key=self._rank)[:top - len(matches)]
+
+            results = [tuple(self._entries[entry_id]) for entry_id in matches]
+
+        return [{"@search.text": _highlight(value, query, pre_tag, post_tag), "value": value,
+                 "field": field, "count": weight} for field, value, weight in results]
+
+def _highlight(value: str, query: str, pre_tag: str, post_tag: str) -> str:
+    if pre_tag is None and post_tag is None:
+        return value
+    pattern = r"\s+".join(re.escape(word) for word in query.split())
+    match = re.search(r"(?<!\w)" + pattern, value, re.IGNORECASE) or re.search(pattern, value, re.IGNORECASE)
+    if not match:
+        return value
+    return value[:match.start()] + (pre_tag or "") + match.group(0) + (post_tag or "") + value[match.end():]
+
+def sync_from_facets(index: AutocompleteIndex, cache: FacetCache, client: str = None,
+                     project: str = None) -> int:
+    """Apply facet cache changes for a scope to the index; returns how many values changed."""
+    current = index.weights()
+    latest = {(field, value): count for field, value, count in cache.values(index.fields, client, project)}
+    changed = 0
+    for key, weight in latest.items():
+        if current.get(key) != weight:
+            index.set(key[0], key[1], weight)
+            changed += 1
+    for key in current.keys() - latest.keys():
+        index.set(key[0], key[1], 0)
+        changed += 1
+    return changed
+
+class AutocompleteService:
+    """One index per client/project scope, built on first use and kept in sync with the facet cache."""
+
+    def __init__(self, cache: FacetCache, fields: List[str] = None):
+        self.cache = cache
+        self.fields = fields or SOURCE_FIELDS
+        self._indexes: Dict[tuple, AutocompleteIndex] = {}
+        self._lock = threading.Lock()
+
+    def index(self, client: str = None, project: str = None) -> AutocompleteIndex:
+        scope = (client, project)
+        with self._lock:
+            index = self._indexes.get(scope)
+            if index is None:
+                index = AutocompleteIndex(self.fields)
+                sync_from_facets(index, self.cache, client, project)
+                self._indexes[scope] = index
+        return index
+
+    def sync(self) -> int:
+        with self._lock:
+            scopes = list(self._indexes.items())
+        return sum(sync_from_facets(index, self.cache, *scope) for scope, index in scopes)
+
+    def suggest(self, text: str, client: str = None, project: str = None, **options) -> List[Dict[str, Any]]:
+        return self.index(client, project).suggest(text, **options)
+
+def make_suggest_handler(service: AutocompleteService):
+    """GET /suggest?search=stee&top=5&searchFields=materials&client=X&project=Y&highlightPreTag=<b>..."""
+
+    class SuggestHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path.rstrip("/") != "/suggest":
+                self.send_error(404)
+                return
+            query = {key: values[0] for key, values in parse_qs(url.query).items()}
+            fields = query["searchFields"].split(",") if query.get("searchFields") else None
+            try:
+                suggestions = service.suggest(query.get("search", ""), client=query.get("client"),
+                                              project=query.get("project"), top=int(query.get("top", 5)),
+                                              fields=fields, pre_tag=query.get("highlightPreTag"),
+                                              post_tag=query.get("highlightPostTag"))
+            except ValueError as e:
+                self.send_error(400, str(e))
+                return
+            body = json.dumps({"value": suggestions}).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Access-Control-Allow-Origin", "*")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return SuggestHandler
+
+def benchmark(index: AutocompleteIndex, max_prefix: int = 4) -> Dict[str, Any]:
+    """Time every 1..max_prefix character prefix of every value."""
+    prefixes = sorted({normalize(value)[:length] for field, value in index.weights()
+                       for length in range(1, max_prefix + 1)})
+    latencies = []
+    for prefix in prefixes:
+        start = time.perf_counter()
+        index.suggest(prefix)
+        latencies.append((time.perf_counter() - start) * 1_000_000)
+    latencies.sort()
+    return {"queries": len(latencies), "p50_us": percentile(latencies, 0.50),
+            "p99_us": percentile(latencies, 0.99), "max_us": latencies[-1] if latencies else None}
+
+def main():
+    parser = argparse.ArgumentParser(description='Local autocomplete over the blueprint-suggester fields')
+    parser.add_argument('--facet-db', default=DEFAULT_DB_PATH, help='facet_cache.py database to build from')
+    parser.add_argument('--suggest', type=str, help='Print suggestions for this text')
+    parser.add_argument('--client', type=str, help='Client scope')
+    parser.add_argument('--project', type=str, help='Project scope (needs --client)')
+    parser.add_argument('--top', type=int, default=5, help='Number of suggestions')
+    parser.add_argument('--benchmark', action='store_true', help='Time short prefixes of every value')
+    parser.add_argument('--serve', type=int, metavar='PORT', help='Serve GET /suggest on this local port')
+    parser.add_argument('--sync-interval', type=float, default=30, help='Seconds between facet cache syncs')
+
+    args = parser.parse_args()
+
+    cache = FacetCache(args.facet_db)
+    service = AutocompleteService(cache)
+    try:
+        index = service.index(args.client, args.project)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    print(f"✓ {len(index)} values from {', '.join(index.fields)}")
+
+    if args.suggest:
+        print(json.dumps(index.suggest(args.suggest, top=args.top), indent=2))
+    if args.benchmark:
+        print(json.dumps(benchmark(index), indent=2))
+    if args.serve:
+        stop = threading.Event()
+
+        def keep_in_sync():
+            while not stop.wait(args.sync_interval):
+                changed = service.sync()
+                if changed:
+                    print(f"  synced {changed} changed values")
+
+        threading.Thread(target=keep_in_sync, daemon=True).start()
+        server = ThreadingHTTPServer(("127.0.0.1", args.serve), make_suggest_handler(service))
+        print(f"Serving suggestions on http://127.0.0.1:{args.serve}/suggest")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            stop.set()
+            server.shutdown()
+    cache.close()
+
+if __name__ == "__main__":
+    main()
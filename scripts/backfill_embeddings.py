@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Sharded embedding backfill across worker processes.
+Splits the corpus by client (or by a hash of the document id) into shards tracked in a
+SQLite lease table, so a large client only ties up one worker instead of the whole run.
+Workers on other machines can --join the same database, but only through a local disk or a
+filesystem with working byte-range locks: the queue runs in WAL mode, which needs shared memory
+between all processes using it and corrupts or deadlocks on NFS/SMB shares.
+"""
+
+import os
+import sys
+import time
+import zlib
+import socket
+import sqlite3
+import argparse
+import multiprocessing
+from typing import List, Dict, Any, Optional
+
+import generate_embeddings_for_new_docs as embeddings
+
+DEFAULT_DB_PATH = "embedding-backfill.db"
+
+# A shard whose lease is not renewed within this window is handed to another worker
+LEASE_SECONDS = 300
+
+# Global embedding request budget shared by all workers (requests per second)
+DEFAULT_GLOBAL_RATE = 2.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS shards (
+    shard_key TEXT PRIMARY KEY,
+    status TEXT NOT NULL DEFAULT 'pending',
+    owner TEXT,
+    lease_expires REAL,
+    total INTEGER NOT NULL DEFAULT 0,
+    succeeded INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL
+)
+"""
+
+def connect(db_path: str) -> sqlite3.Connection:
+    """Open the work-queue database, creating the lease table if needed."""
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(SCHEMA)
+    return conn
+
+def plan_shards(shard_by: str, num_shards: int, clients: List[str] = None) -> List[str]:
+    """Build the shard keys for a backfill run."""
+    if shard_by == "client":
+        return [f"client:{client}" for client in (clients or embeddings.list_clients())]
+    return [f"hash:{i}/{num_shards}" for i in range(num_shards)]
+
+def enqueue_shards(conn: sqlite3.Connection, shard_keys: List[str], reset: bool = False) -> int:
+    """Add shards to the work queue; existing shards keep their progress unless reset."""
+    if reset:
+        conn.execute("DELETE FROM shards")
+    else:
+        conn.execute("UPDATE shards SET status = 'pending' WHERE status = 'failed'")
+    before = conn.total_changes
+    conn.executemany("INSERT OR IGNORE INTO shards (shard_key, updated_at) VALUES (?, ?)",
+                     [(key, time.time()) for key in shard_keys])
+    return conn.total_changes - before
+
+def claim_shard(conn: sqlite3.Connection, owner: str, lease_seconds: int = LEASE_SECONDS) -> Optional[str]:
+    """Lease the next pending shard, or one whose previous owner stopped renewing."""
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute(
+            "SELECT shard_key FROM shards "
+            "WHERE status = 'pending' OR (status = 'running' AND lease_expires < ?) "
+            "ORDER BY status, shard_key LIMIT 1",
+            (now,)
+        ).fetchone()
+        if row is None:
+            conn.execute("COMMIT")
+            return None
+        conn.execute(
+            "UPDATE shards SET status = 'running', owner = ?, lease_expires = ?, "
+            "succeeded = 0, failed = 0, updated_at = ? WHERE shard_key = ?",
+            (owner, now + lease_seconds, now, row["shard_key"])
+        )
+        conn.execute("COMMIT")
+        return row["shard_key"]
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+def report_progress(conn: sqlite3.Connection, shard_key: str, owner: str, total: int,
+                    succeeded: int, failed: int, lease_seconds: int = LEASE_SECONDS) -> None:
+    """Record shard progress and renew its lease."""
+    now = time.time()
+    conn.execute(
+        "UPDATE shards SET total = ?, succeeded = ?, failed = ?, lease_expires = ?, updated_at = ? "
+        "WHERE shard_key = ? AND owner = ?",
+        (total, succeeded, failed, now + lease_seconds, now, shard_key, owner)
+    )
+
+def finish_shard(conn: sqlite3.Connection, shard_key: str, owner: str, status: str = "done") -> None:
+    """Mark a shard as done (or failed) and release its lease."""
+    conn.execute(
+        "UPDATE shards SET status = ?, lease_expires = NULL, updated_at = ? "
+        "WHERE shard_key = ? AND owner = ?",
+        (status, time.time(), shard_key, owner)
+    )
+
+def shard_documents(shard_key: str) -> List[Dict[str, Any]]:
+    """List the documents belonging to a shard."""
+    kind, _, value = shard_key.partition(":")
+    if kind == "client":
+        return list(embeddings.iter_documents("client eq '{}'".format(value.replace("'", "''"))))
+
+    # Hash shards can't be filtered server-side, but the metadata listing is cheap
+    index, num_shards = (int(part) for part in value.split("/"))
+    return [
+        doc for doc in embeddings.iter_documents()
+        if zlib.crc32(doc["id"].encode("utf-8")) % num_shards == index
+    ]
+
+def run_worker(db_path: str, owner: str, delay: float, log_path: str = None) -> None:
+    """Claim and process shards until the queue is drained."""
+    if log_path:
+        log_file = open(log_path, "a", buffering=1)
+        sys.stdout = sys.stderr = log_file
+
+    conn = connect(db_path)
+    while True:
+        shard_key = claim_shard(conn, owner)
+        if shard_key is None:
+            break
+
+        print(f"\n=== {owner}: shard {shard_key} ===")
+        try:
+            documents = shard_documents(shard_key)
+            total = len(documents)
+            report_progress(conn, shard_key, owner, total, 0, 0)
+
+            embeddings.embed_documents(
+                documents,
+                delay=delay,
+                progress=lambda succeeded, failed: report_progress(
+                    conn, shard_key, owner, total, succeeded, failed)
+            )
+            finish_shard(conn, shard_key, owner)
+        except Exception as e:
+            print(f"Shard {shard_key} failed: {e}")
+            finish_shard(conn, shard_key, owner, status="failed")
+
+    conn.close()
+
+def summarize(conn: sqlite3.Connection) -> Dict[str, int]:
+    """Merge progress across all shards."""
+    row = conn.execute(
+        "SELECT COUNT(*) AS shards, "
+        "SUM(status = 'done') AS done, SUM(status = 'running') AS running, "
+        "SUM(status = 'failed') AS failed_shards, "
+        "COALESCE(SUM(total), 0) AS total, COALESCE(SUM(succeeded), 0) AS succeeded, "
+        "COALESCE(SUM(failed), 0) AS failed FROM shards"
+    ).fetchone()
+    return {key: row[key] or 0 for key in row.keys()}
+
+def print_progress(summary: Dict[str, int]) -> None:
+    """Print one line of merged progress."""
+    processed = summary["succeeded"] + summary["failed"]
+    print(f"  Shards {summary['done']}/{summary['shards']} done ({summary['running']} running, "
+          f"{summary['failed_shards']} failed) | Documents {processed}/{summary['total']} "
+          f"({summary['succeeded']} ok, {summary['failed']} failed)")
+
+def coordinate(db_path: str, workers: int, global_rate: float, log_dir: str = None,
+               poll_interval: float = 5.0) -> Dict[str, int]:
+    """Start worker processes on this machine and report merged progress until they finish."""
+    # Each worker gets an equal share of the global embedding quota
+    delay = workers / global_rate
+    host = socket.gethostname()
+
+    processes = []
+    for i in range(workers):
+        owner = f"{host}:{os.getpid()}:{i}"
+        log_path = os.path.join(log_dir, f"backfill-worker-{i}.log") if log_dir else None
+        process = multiprocessing.Process(target=run_worker, args=(db_path, owner, delay, log_path))
+        process.start()
+        processes.append(process)
+
+    conn = connect(db_path)
+    while any(p.is_alive() for p in processes):
+        print_progress(summarize(conn))
+        time.sleep(poll_interval)
+
+    for process in processes:
+        process.join()
+
+    summary = summarize(conn)
+    conn.close()
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description='Backfill embeddings with sharded worker processes')
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help='SQLite work-queue/lease database')
+    parser.add_argument('--shard-by', choices=['client', 'hash'], default='client',
+                        help='Shard by client, or by a hash of the document id')
+    parser.add_argument('--shards', type=int, default=8, help='Number of hash shards (with --shard-by hash)')
+    parser.add_argument('--client', action='append', dest='clients',
+                        help='Restrict client shards to these clients (repeatable)')
+    parser.add_argument('--workers', type=int, default=4, help='Worker processes on this machine')
+    parser.add_argument('--rate', type=float, default=DEFAULT_GLOBAL_RATE,
+                        help='Global embedding requests per second, split across workers')
+    parser.add_argument('--log-dir', default='.', help='Directory for per-worker logs')
+    parser.add_argument('--reset', action='store_true', help='Discard existing shard progress')
+    parser.add_argument('--join', action='store_true',
+                        help='Only run workers against an already planned queue (the database must be on a '
+                             'local disk; WAL mode does not work over network filesystems)')
+    parser.add_argument('--status', action='store_true', help='Print merged progress and exit')
+
+    args = parser.parse_args()
+
+    if not embeddings.SEARCH_API_KEY or not embeddings.AZURE_OPENAI_KEY:
+        print("Error: SEARCH_API_KEY and AZURE_OPENAI_KEY environment variables must be set")
+        sys.exit(1)
+
+    conn = connect(args.db)
+    if args.status:
+        print_progress(summarize(conn))
+        return
+
+    if not args.join:
+        shard_keys = plan_shards(args.shard_by, args.shards, args.clients)
+        added = enqueue_shards(conn, shard_keys, reset=args.reset)
+        print(f"Planned {len(shard_keys)} shards ({added} new) in {args.db}")
+    conn.close()
+
+    print(f"Starting {args.workers} workers at {args.rate / args.workers:.2f} requests/s each...")
+    start_time = time.time()
+    summary = coordinate(args.db, args.workers, args.rate, log_dir=args.log_dir)
+
+    print(f"\n=== Summary ===")
+    print_progress(summary)
+    print(f"Time: {time.time() - start_time:.1f} seconds")
+
+if __name__ == "__main__":
+    main()
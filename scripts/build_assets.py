@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Bundle the site's local scripts per page.
+Reads the <script src> tags of each HTML page, concatenates every run of adjacent local classic
+scripts into one minified bundle named after its content hash, and writes a copy of the page that
+loads the bundles instead. Output goes to dist/ (pages at dist/<page>.html, bundles in dist/js/)
+with a manifest of which page uses which scripts; test-server.py --dist serves it.
+"""
+
+import os
+import re
+import sys
+import json
+import hashlib
+import argparse
+from typing import List, Dict, Any, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DIST_DIR = "dist"
+BUNDLE_DIR = "js"
+MANIFEST_FILE = "asset-manifest.json"
+HASH_LENGTH = 10
+
+SCRIPT_TAG = re.compile(r"<script\b([^>]*)>\s*</script>", re.IGNORECASE)
+SRC_ATTRIBUTE = re.compile(r"""\bsrc\s*=\s*["']([^"']+)["']""", re.IGNORECASE)
+# Only whitespace and HTML comments may sit between scripts that share a bundle
+BETWEEN_SCRIPTS = re.compile(r"^(?:\s|<!--.*?-->)*$", re.DOTALL)
+STRICT_DIRECTIVE = re.compile(r"""^\s*(?:/\*.*?\*/\s*|//[^\n]*\n\s*)*["']use strict["']""", re.DOTALL)
+
+# Tokens after which a "/" starts a regular expression rather than a division
+REGEX_PRECEDERS = set("(,=:[!&|?{};+-*%<>~^")
+REGEX_KEYWORDS = {"return", "typeof", "case", "do", "else", "in", "of", "new", "delete", "void",
+                  "throw", "instanceof", "yield", "await"}
+
+def _is_identifier(char: str) -> bool:
+    return char.isalnum() or char in "_$"
+
+def _skip_string(source: str, i: int) -> int:
+    """Index just past the string or template literal starting at i."""
+    quote = source[i]
+    i += 1
+    while i < len(source):
+        char = source[i]
+        if char == "\\":
+            i += 2
+            continue
+        if char == quote:
+            return i + 1
+        if quote == "`" and source.startswith("${", i):
+            i = _skip_braced(source, i + 2)
+            continue
+        if quote != "`" and char == "\n":
+            return i
+        i += 1
+    return i
+
+def _skip_braced(source: str, i: int) -> int:
+    """Index just past the "}" closing a ${...} substitution that starts at i."""
+    depth = 1
+    while i < len(source) and depth:
+        char = source[i]
+        if char in "'\"`":
+            i = _skip_string(source, i)
+            continue
+        if char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+        i += 1
+    return i
+
+def _skip_regex(source: str, i: int) -> Optional[int]:
+    """Index just past the regex literal starting at i, or None when it isn't one."""
+    i += 1
+    in_class = False
+    while i < len(source):
+        char = source[i]
+        if char == "\n":
+            return None
+        if char == "\\":
+            i += 2
+            continue
+        if char == "[":
+            in_class = True
+        elif char == "]":
+            in_class = False
+        elif char == "/" and not in_class:
+            i += 1
+            while i < len(source) and _is_identifier(source[i]):
+                i += 1
+            return i
+        i += 1
+    return None
+
+def minify_js(source: str) -> str:
+    """
+    Conservative minification: drops comments (except /*! ... */) and collapses whitespace.
+    Line breaks are kept, so automatic semicolon insertion behaves exactly as before.
+    """
+    out: List[str] = []
+    last, word = "", ""
+    i, n = 0, len(source)
+    while i < n:
+        char = source[i]
+        if char.isspace():
+            j = i
+            while j < n and source[j].isspace():
+                j += 1
+            if out:
+                out.append("\n" if "\n" in source[i:j] else " ")
+            i = j
+            continue
+        if char in "'\"`":
+            j = _skip_string(source, i)
+            out.append(source[i:j])
+            last, word, i = char, "", j
+            continue
+        if char == "/" and i + 1 < n:
+            following = source[i + 1]
+            if following == "/":
+                j = source.find("\n", i)
+                i = n if j < 0 else j
+                continue
+            if following == "*":
+                j = source.find("*/", i + 2)
+                j = n if j < 0 else j + 2
+                if source.startswith("/*!", i):
+                    out.append(source[i:j])
+                elif "\n" in source[i:j]:
+                    out.append("\n")
+                else:
+                    out.append(" ")
+                i = j
+                continue
+            if not last or last in REGEX_PRECEDERS or last == "}" or word in REGEX_KEYWORDS:
+                j = _skip_regex(source, i)
+                if j is not None:
+                    out.append(source[i:j])
+                    last, word, i = "/", "", j
+                    continue
+        out.append(char)
+        word = word + char if _is_identifier(char) and _is_identifier(last) else (char if _is_identifier(char) else "")
+        last = char
+        i += 1
+
+    # Whitespace runs became one separator each; drop separators at line edges and blank lines
+    lines = "".join(out).split("\n")
+    return "\n".join(line.strip(" ") for line in lines if line.strip(" ")) + "\n"
+
+def local_script(src: str, page_dir: str) -> Optional[str]:
+    """Repository-relative path of a local script, or None for remote/missing ones."""
+    if re.match(r"^(?:[a-z]+:)?//", src, re.IGNORECASE):
+        return None
+    path = os.path.normpath(os.path.join(page_dir, src.split("?")[0].split("#")[0]))
+    return path if os.path.isfile(os.path.join(ROOT, path)) else None
+
+def bundleable(attributes: str, path: Optional[str]) -> bool:
+    """Classic, synchronous local scripts without a file-level "use strict" can share a bundle."""
+    if path is None or re.search(r"\b(?:async|defer|nomodule|integrity)\b|type\s*=\s*[\"']module", attributes,
+                                 re.IGNORECASE):
+        return False
+    with open(os.path.join(ROOT, path), encoding="utf-8") as f:
+        return not STRICT_DIRECTIVE.match(f.read())
+
+def script_runs(html: str, page_dir: str) -> List[List[Dict[str, Any]]]:
+    """Groups of adjacent bundleable script tags, in page order."""
+    runs, current, previous_end = [], [], None
+    for match in SCRIPT_TAG.finditer(html):
+        src = SRC_ATTRIBUTE.search(match.group(1))
+        path = local_script(src.group(1), page_dir) if src else None
+        if not src or not bundleable(match.group(1), path):
+            if current:
+                runs.append(current)
+            current, previous_end = [], None
+            continue
+        if current and not BETWEEN_SCRIPTS.match(html[previous_end:match.start()]):
+            runs.append(current)
+            current = []
+        current.append({"path": path, "start": match.start(), "end": match.end()})
+        previous_end = match.end()
+    if current:
+        runs.append(current)
+    return runs
+
+def build_bundle(paths: List[str]) -> bytes:
+    parts = []
+    for path in paths:
+        with open(os.path.join(ROOT, path), encoding="utf-8") as f:
+            parts.append(f"/* {path} */\n" + minify_js(f.read()))
+    # The separator keeps a file without a trailing semicolon from running into the next one
+    return "\n;\n".join(parts).encode("utf-8")
+
+def build(pages: List[str], output_dir: str) -> Dict[str, Any]:
+    bundle_dir = os.path.join(output_dir, BUNDLE_DIR)
+    os.makedirs(bundle_dir, exist_ok=True)
+    manifest = {"pages": {}, "bundles": {}, "unreferenced": []}
+    referenced = set()
+
+    for page in pages:
+        with open(os.path.join(ROOT, page), encoding="utf-8") as f:
+            html = f.read()
+        runs = script_runs(html, os.path.dirname(page))
+        if not runs:
+            continue
+
+        rewritten, cursor, bundles = [], 0, []
+        for number, run in enumerate(runs, 1):
+            paths = [script["path"] for script in run]
+            referenced.update(paths)
+            body = build_bundle(paths)
+            digest = hashlib.sha256(body).hexdigest()[:HASH_LENGTH]
+            existing = next((name for name, info in manifest["bundles"].items() if info["hash"] == digest), None)
+            name = existing or f"{os.path.splitext(os.path.basename(page))[0]}-{number}.{digest}.js"
+            if existing is None:
+                with open(os.path.join(bundle_dir, name), "wb") as f:
+                    f.write(body)
+                source_bytes = sum(os.path.getsize(os.path.join(ROOT, path)) for path in paths)
+                manifest["bundles"][name] = {"hash": digest, "sources": paths, "sourceBytes": source_bytes,
+                                             "bytes": len(body)}
+            bundles.append(name)
+            src = f"{DIST_DIR}/{BUNDLE_DIR}/{name}"
+            rewritten.append(html[cursor:run[0]["start"]])
+            rewritten.append(f'<script src="{src}"></script>')
+            cursor = run[-1]["end"]
+        rewritten.append(html[cursor:])
+
+        target = os.path.join(output_dir, page)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, "w", encoding="utf-8") as f:
+            f.write("".join(rewritten))
+        manifest["pages"][page] = {"bundles": bundles,
+                                   "scriptsBefore": sum(len(run) for run in runs), "scriptsAfter": len(runs)}
+
+    for directory, _, files in os.walk(os.path.join(ROOT, "js")):
+        for name in files:
+            path = os.path.relpath(os.path.join(directory, name), ROOT)
+            if name.endswith(".js") and path not in referenced:
+                manifest["unreferenced"].append(path)
+    manifest["unreferenced"].sort()
+
+    with open(os.path.join(output_dir, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+def clean_stale_bundles(output_dir: str, manifest: Dict[str, Any]) -> int:
+    bundle_dir = os.path.join(output_dir, BUNDLE_DIR)
+    stale = [name for name in os.listdir(bundle_dir) if name not in manifest["bundles"]]
+    for name in stale:
+        os.remove(os.path.join(bundle_dir, name))
+    return len(stale)
+
+def main():
+    parser = argparse.ArgumentParser(description='Bundle and fingerprint the scripts each HTML page loads')
+    parser.add_argument('pages', nargs='*', help='HTML pages relative to the site root (default: all top-level pages)')
+    parser.add_argument('--output', default=os.path.join(ROOT, DIST_DIR), help='Output directory')
+    parser.add_argument('--keep-stale', action='store_true', help='Keep bundles no page references any more')
+
+    args = parser.parse_args()
+
+    pages = args.pages or sorted(name for name in os.listdir(ROOT) if name.endswith(".html"))
+    missing = [page for page in pages if not os.path.isfile(os.path.join(ROOT, page))]
+    if missing:
+        print(f"Error: pages not found: {', '.join(missing)}")
+        sys.exit(1)
+
+    manifest = build(pages, args.output)
+    if not args.keep_stale:
+        clean_stale_bundles(args.output, manifest)
+
+    for page, info in manifest["pages"].items():
+        print(f"  {page}: {info['scriptsBefore']} scripts -> {info['scriptsAfter']} bundles")
+    source_bytes = sum(info["sourceBytes"] for info in manifest["bundles"].values())
+    bundle_bytes = sum(info["bytes"] for info in manifest["bundles"].values())
+    print(f"\n✓ {len(manifest['bundles'])} bundles, {source_bytes / 1024:.0f}KB of scripts -> "
+          f"{bundle_bytes / 1024:.0f}KB in {args.output}")
+    if manifest["unreferenced"]:
+        print(f"  {len(manifest['unreferenced'])} scripts in js/ aren't loaded by any page (see {MANIFEST_FILE})")
+
+if __name__ == "__main__":
+    main()
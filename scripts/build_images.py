@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Responsive variants of the site's large images.
+Each source image is resized to several widths and encoded as AVIF (when the installed Pillow can),
+WebP and a fallback (progressive JPEG for opaque images, optimized PNG otherwise). Variants are
+written to dist/img/ under content-hashed names and listed in dist/image-manifest.json, which
+test-server.py --dist uses to pick a format from the Accept header and a width from ?w= or Width.
+"""
+
+import os
+import io
+import sys
+import json
+import hashlib
+import argparse
+from typing import List, Dict, Any
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+try:
+    import pillow_avif  # noqa: F401  (registers the AVIF plugin on older Pillow)
+except ImportError:
+    pass
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DIST_DIR = "dist"
+IMAGE_DIR = "img"
+MANIFEST_FILE = "image-manifest.json"
+HASH_LENGTH = 10
+
+WIDTHS = [160, 320, 640, 1024]
+# Sources smaller than this are served as they are
+MIN_SOURCE_BYTES = 200 * 1024
+
+ENCODERS = {
+    "image/avif": ("avif", {"quality": 55, "speed": 6}),
+    "image/webp": ("webp", {"quality": 80, "method": 6}),
+    "image/jpeg": ("jpg", {"quality": 82, "optimize": True, "progressive": True}),
+    "image/png": ("png", {"optimize": True}),
+}
+
+def avif_supported() -> bool:
+    Image.init()
+    return "AVIF" in Image.SAVE
+
+def has_alpha(image) -> bool:
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        alpha = image.convert("RGBA").getchannel("A")
+        return alpha.getextrema()[0] < 255
+    return False
+
+def output_formats(image) -> List[str]:
+    formats = ["image/avif"] if avif_supported() else []
+    return formats + ["image/webp", "image/png" if has_alpha(image) else "image/jpeg"]
+
+def encode(image, content_type: str) -> bytes:
+    extension, options = ENCODERS[content_type]
+    if content_type == "image/jpeg" and image.mode != "RGB":
+        image = image.convert("RGB")
+    buffer = io.BytesIO()
+    image.save(buffer, format=Image.registered_extensions()["." + extension], **options)
+    return buffer.getvalue()
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def build_variants(source: str, output_dir: str, widths: List[int]) -> Dict[str, Any]:
+    """Encode every width/format of one image; returns its manifest entry."""
+    stem = os.path.splitext(os.path.basename(source))[0]
+    with Image.open(os.path.join(ROOT, source)) as original:
+        original.load()
+        entry = {"sourceHash": file_hash(os.path.join(ROOT, source)), "width": original.width,
+                 "height": original.height, "sourceBytes": os.path.getsize(os.path.join(ROOT, source)),
+                 "variants": []}
+        targets = sorted({w for w in widths if w < original.width} | {original.width})
+        formats = output_formats(original)
+        for width in targets:
+            height = round(original.height * width / original.width)
+            resized = original if width == original.width else original.resize((width, height), Image.LANCZOS)
+            for content_type in formats:
+                body = encode(resized, content_type)
+                digest = hashlib.sha256(body).hexdigest()[:HASH_LENGTH]
+                name = f"{stem}-{width}.{digest}.{ENCODERS[content_type][0]}"
+                with open(os.path.join(output_dir, IMAGE_DIR, name), "wb") as f:
+                    f.write(body)
+                entry["variants"].append({"type": content_type, "width": width, "height": height,
+                                          "path": f"{DIST_DIR}/{IMAGE_DIR}/{name}", "bytes": len(body)})
+    return entry
+
+def load_manifest(output_dir: str) -> Dict[str, Any]:
+    path = os.path.join(output_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {"images": {}}
+    with open(path) as f:
+        return json.load(f)
+
+def build(sources: List[str], output_dir: str, widths: List[int], force: bool = False) -> Dict[str, Any]:
+    os.makedirs(os.path.join(output_dir, IMAGE_DIR), exist_ok=True)
+    manifest = load_manifest(output_dir)
+    for source in sources:
+        current = manifest["images"].get(source)
+        if not force and current and current["sourceHash"] == file_hash(os.path.join(ROOT, source)) \
+                and all(os.path.exists(os.path.join(output_dir, IMAGE_DIR, os.path.basename(v["path"])))
+                        for v in current["variants"]):
+            print(f"  {source}: unchanged")
+            continue
+        manifest["images"][source] = entry = build_variants(source, output_dir, widths)
+        smallest = min(v["bytes"] for v in entry["variants"] if v["width"] == entry["width"])
+        print(f"  ✓ {source}: {len(entry['variants'])} variants, full size {entry['sourceBytes'] / 1024:.0f}KB "
+              f"-> {smallest / 1024:.0f}KB")
+
+    with open(os.path.join(output_dir, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+def clean_stale_variants(output_dir: str, manifest: Dict[str, Any]) -> int:
+    live = {os.path.basename(v["path"]) for entry in manifest["images"].values() for v in entry["variants"]}
+    image_dir = os.path.join(output_dir, IMAGE_DIR)
+    stale = [name for name in os.listdir(image_dir) if name not in live]
+    for name in stale:
+        os.remove(os.path.join(image_dir, name))
+    return len(stale)
+
+def picture_markup(source: str, entry: Dict[str, Any], sizes: str) -> str:
+    """<picture> element with a srcset per format, for pages served without negotiation."""
+    lines = ["<picture>"]
+    fallback = entry["variants"][-1]["type"]
+    for content_type in dict.fromkeys(v["type"] for v in entry["variants"]):
+        srcset = ", ".join(f"{v['path']} {v['width']}w" for v in entry["variants"] if v["type"] == content_type)
+        if content_type != fallback:
+            lines.append(f'  <source type="{content_type}" srcset="{srcset}" sizes="{sizes}">')
+        else:
+            lines.append(f'  <img src="{source}" srcset="{srcset}" sizes="{sizes}" '
+                         f'width="{entry["width"]}" height="{entry["height"]}" loading="lazy" decoding="async" alt="">')
+    lines.append("</picture>")
+    return "\n".join(lines)
+
+def default_sources() -> List[str]:
+    return sorted(name for name in os.listdir(ROOT)
+                  if name.lower().endswith((".png", ".jpg", ".jpeg"))
+                  and os.path.getsize(os.path.join(ROOT, name)) >= MIN_SOURCE_BYTES)
+
+def main():
+    parser = argparse.ArgumentParser(description='Build resized WebP/AVIF/fallback variants of large images')
+    parser.add_argument('images', nargs='*', help=f'Images relative to the site root (default: top-level images '
+                                                 f'over {MIN_SOURCE_BYTES // 1024}KB)')
+    parser.add_argument('--output', default=os.path.join(ROOT, DIST_DIR), help='Output directory')
+    parser.add_argument('--widths', type=str, default=",".join(map(str, WIDTHS)), help='Comma-separated widths')
+    parser.add_argument('--force', action='store_true', help='Re-encode images that have not changed')
+    parser.add_argument('--picture', type=str, metavar='SIZES',
+                        help='Print <picture> markup for each image with this sizes attribute')
+
+    args = parser.parse_args()
+
+    if Image is None:
+        print("Error: Pillow is not installed (pip install Pillow; pillow-avif-plugin adds AVIF on older versions)")
+        sys.exit(1)
+
+    sources = args.images or default_sources()
+    missing = [source for source in sources if not os.path.isfile(os.path.join(ROOT, source))]
+    if missing:
+        print(f"Error: images not found: {', '.join(missing)}")
+        sys.exit(1)
+
+    print(f"Building variants for {len(sources)} images ({'AVIF, ' if avif_supported() else ''}WebP, fallback)...")
+    manifest = build(sources, args.output, [int(w) for w in args.widths.split(",")], force=args.force)
+    clean_stale_variants(args.output, manifest)
+
+    if args.picture:
+        for source in sources:
+            print(f"\n{picture_markup(source, manifest['images'][source], args.picture)}")
+
+if __name__ == "__main__":
+    main()
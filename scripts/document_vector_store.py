@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Local copy of the document vectors written to the index.
+The vector fields aren't retrievable from the service, so every embedding the pipeline writes
+is also kept here with a hash of the text it was computed from; an index rebuild can then
+reuse a vector whenever the document text hasn't changed instead of embedding it again.
+"""
+
+import os
+import time
+import array
+import sqlite3
+import hashlib
+import argparse
+import threading
+from typing import List, Dict, Optional
+
+DEFAULT_DB_PATH = os.environ.get("DOCUMENT_VECTOR_DB", "document-vectors.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS document_vectors (
+    doc_id TEXT NOT NULL,
+    field TEXT NOT NULL,
+    text_hash TEXT NOT NULL,
+    vector BLOB NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (doc_id, field)
+);
+"""
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+class DocumentVectorStore:
+    """SQLite table of (doc_id, vector field) -> vector and the hash of its source text."""
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH):
+        self.conn = sqlite3.connect(db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def put(self, doc_id: str, field: str, text: str, vector: List[float]) -> None:
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO document_vectors (doc_id, field, text_hash, vector, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (doc_id, field, text_hash(text), array.array("f", vector).tobytes(), time.time()))
+
+    def get(self, doc_id: str, field: str, text: str = None) -> Optional[List[float]]:
+        """The stored vector, or None if missing or (when text is given) computed from other text."""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT text_hash, vector FROM document_vectors WHERE doc_id = ? AND field = ?",
+                (doc_id, field)).fetchone()
+        if row is None or (text is not None and row[0] != text_hash(text)):
+            return None
+        return array.array("f", row[1]).tolist()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {field: count for field, count in self.conn.execute(
+                "SELECT field, COUNT(*) FROM document_vectors GROUP BY field")}
+
+_store = None
+_store_pid = None
+
+def get_vector_store() -> DocumentVectorStore:
+    """Process-wide store, opened on first use (one connection per process)."""
+    global _store, _store_pid
+    if _store is None or _store_pid != os.getpid():
+        _store = DocumentVectorStore()
+        _store_pid = os.getpid()
+    return _store
+
+def main():
+    parser = argparse.ArgumentParser(description='Show what the local document vector store holds')
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help='SQLite file (or set DOCUMENT_VECTOR_DB)')
+
+    args = parser.parse_args()
+
+    store = DocumentVectorStore(args.db)
+    stats = store.stats()
+    if not stats:
+        print("No vectors stored yet")
+    for field, count in sorted(stats.items()):
+        print(f"  {field:<20} {count:>8} documents")
+    store.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Long-running embedding service.
+Keeps connections warm, polls the index for uploads past an uploadedAt high-water mark,
+optionally accepts upload notifications over local HTTP, and embeds only the new arrivals.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Dict, Any, Optional
+
+import generate_embeddings_for_new_docs as embeddings
+from pipeline_metrics import METRICS
+from facet_cache import FacetCache, refresh_documents
+from embedding_job_queue import EmbeddingJobQueue, DEFAULT_DB_PATH, INTERACTIVE, BACKFILL, process_jobs
+
+DEFAULT_STATE_PATH = "embedding-daemon-state.json"
+
+def _parse_timestamp(value: str) -> datetime:
+    # Compare as datetimes: the service returns varying fractional-second precision
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+class HighWaterMark:
+    """Persistent uploadedAt cursor, plus the ids already seen at that exact timestamp."""
+
+    def __init__(self, path: str = DEFAULT_STATE_PATH, since: str = None):
+        self.path = path
+        self.timestamp = since
+        self.ids_at_timestamp = set()
+        if since is None and os.path.exists(path):
+            with open(path) as f:
+                state = json.load(f)
+            self.timestamp = state.get("uploadedAt")
+            self.ids_at_timestamp = set(state.get("idsAtTimestamp", []))
+        if self.timestamp is None:
+            # First start: only embed what arrives from now on
+            self.timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    def is_seen(self, doc: Dict[str, Any]) -> bool:
+        uploaded_at = doc.get("uploadedAt")
+        return (uploaded_at is not None and _parse_timestamp(uploaded_at) == _parse_timestamp(self.timestamp)
+                and doc["id"] in self.ids_at_timestamp)
+
+    def advance(self, documents: List[Dict[str, Any]]) -> None:
+        for doc in documents:
+            if not doc.get("uploadedAt"):
+                continue
+            uploaded_at = _parse_timestamp(doc["uploadedAt"])
+            current = _parse_timestamp(self.timestamp)
+            if uploaded_at > current:
+                self.timestamp = doc["uploadedAt"]
+                self.ids_at_timestamp = {doc["id"]}
+            elif uploaded_at == current:
+                self.ids_at_timestamp.add(doc["id"])
+
+    def save(self) -> None:
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"uploadedAt": self.timestamp, "idsAtTimestamp": sorted(self.ids_at_timestamp)}, f)
+        os.replace(tmp_path, self.path)
+
+def poll_new_documents(mark: HighWaterMark) -> List[str]:
+    """Return ids of documents uploaded at or after the high-water mark that haven't been seen."""
+    # ge rather than gt: uploads sharing the mark's timestamp may land after the last poll
+    documents = list(embeddings.iter_documents(f"uploadedAt ge {mark.timestamp}", select="id,uploadedAt"))
+    new_ids = [doc["id"] for doc in documents if not mark.is_seen(doc)]
+    mark.advance(documents)
+    return new_ids
+
+def make_notification_handler(db_path: str, wake: threading.Event):
+    """Build a request handler that queues pushed document ids and wakes the main loop."""
+
+    class NotificationHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if self.path.rstrip("/") != "/enqueue":
+                self.send_error(404)
+                return
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                doc_ids = body.get("ids") or ([body["id"]] if body.get("id") else [])
+                lane = body.get("lane", INTERACTIVE)
+                if not doc_ids or lane not in (INTERACTIVE, BACKFILL):
+                    raise ValueError("expected {\"ids\": [...]} and an optional lane")
+            except (ValueError, KeyError) as e:
+                self.send_error(400, str(e))
+                return
+
+            queue = EmbeddingJobQueue(db_path)
+            queue.enqueue(doc_ids, lane=lane)
+            queue.close()
+            wake.set()
+            self._send_json(202, {"queued": len(doc_ids), "lane": lane})
+
+        def do_GET(self):
+            if self.path.rstrip("/") != "/health":
+                self.send_error(404)
+                return
+            queue = EmbeddingJobQueue(db_path)
+            stats = queue.stats()
+            queue.close()
+            self._send_json(200, {"status": "ok", "queue": stats})
+
+        def _send_json(self, status: int, payload: Dict[str, Any]) -> None:
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            print(f"  [notify] {format % args}")
+
+    return NotificationHandler
+
+def run_daemon(poll_interval: float = 30.0, listen_port: Optional[int] = None,
+               db_path: str = DEFAULT_DB_PATH, state_path: str = DEFAULT_STATE_PATH,
+               since: str = None, batch_size: int = 10, delay: float = embeddings.REQUEST_DELAY,
+               metrics_path: str = None, facet_db: str = None) -> None:
+    """
+    Run until interrupted, refreshing metrics_path (Prometheus text) after every poll.
+    With facet_db, new uploads are also added to that facet cache.
+    """
+    if not embeddings.SEARCH_API_KEY or not embeddings.AZURE_OPENAI_KEY:
+        print("Error: SEARCH_API_KEY and AZURE_OPENAI_KEY environment variables must be set")
+        sys.exit(1)
+
+    queue = EmbeddingJobQueue(db_path)
+    mark = HighWaterMark(state_path, since=since)
+    facets = FacetCache(facet_db) if facet_db else None
+    wake = threading.Event()
+    owner = f"daemon:{os.getpid()}"
+
+    server = None
+    if listen_port:
+        server = ThreadingHTTPServer(("127.0.0.1", listen_port), make_notification_handler(db_path, wake))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        print(f"Listening for upload notifications on http://127.0.0.1:{listen_port}/enqueue")
+
+    print(f"Polling {embeddings.SEARCH_INDEX_NAME} every {poll_interval:.0f}s for uploads after {mark.timestamp}")
+
+    next_poll = 0.0
+    try:
+        while True:
+            now = time.monotonic()
+            if now >= next_poll:
+                try:
+                    new_ids = poll_new_documents(mark)
+                    if new_ids:
+                        print(f"Found {len(new_ids)} new documents")
+                        queue.enqueue(new_ids, lane=INTERACTIVE)
+                        if facets:
+                            refresh_documents(facets, new_ids)
+                except RuntimeError as e:
+                    # The mark only advances on a complete listing, so the next poll retries
+                    print(f"  ✗ Poll failed: {e}")
+                mark.save()
+                if metrics_path:
+                    METRICS.write_prometheus(metrics_path)
+                next_poll = now + poll_interval
+
+            # One claim per pass so polling keeps its schedule while a backlog drains
+            jobs = queue.claim(owner, limits={INTERACTIVE: 1, BACKFILL: batch_size})
+            if jobs:
+                process_jobs(queue, jobs, delay=delay)
+                continue
+
+            wake.wait(timeout=max(0.0, next_poll - time.monotonic()))
+            wake.clear()
+    except KeyboardInterrupt:
+        print("\nDaemon stopped")
+    finally:
+        if server:
+            server.shutdown()
+        mark.save()
+        queue.close()
+        if facets:
+            facets.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Embed new uploads continuously')
+    parser.add_argument('--poll-interval', type=float, default=30.0, help='Seconds between index polls')
+    parser.add_argument('--listen-port', type=int, default=None,
+                        help='Accept POST /enqueue {"ids": [...]} notifications on this local port')
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help='SQLite job database shared with embedding_job_queue.py')
+    parser.add_argument('--state', default=DEFAULT_STATE_PATH, help='High-water mark state file')
+    parser.add_argument('--since', type=str, help='Start from this uploadedAt timestamp (ISO 8601, UTC)')
+    parser.add_argument('--batch-size', type=int, default=10, help='Backfill jobs per claim')
+    parser.add_argument('--metrics-file', type=str, help='Refresh Prometheus text metrics in this file after every poll')
+    parser.add_argument('--trace-file', type=str, help='Append a JSON span per pipeline stage call to this file')
+    parser.add_argument('--facet-db', type=str, help='Keep this facet_cache.py database up to date with new uploads')
+
+    args = parser.parse_args()
+
+    if args.trace_file:
+        METRICS.enable_tracing(args.trace_file)
+
+    run_daemon(poll_interval=args.poll_interval, listen_port=args.listen_port, db_path=args.db,
+               state_path=args.state, since=args.since, batch_size=args.batch_size,
+               metrics_path=args.metrics_file, facet_db=args.facet_db)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Persistent priority queue of embedding jobs.
+Fresh uploads go in the interactive lane and are served ahead of bulk backfill using
+weighted fair scheduling; backfill jobs that wait too long are promoted so they never starve.
+"""
+
+import os
+import sys
+import time
+import socket
+import sqlite3
+import argparse
+from typing import List, Dict, Any, Optional
+
+import generate_embeddings_for_new_docs as embeddings
+from pipeline_metrics import METRICS
+
+DEFAULT_DB_PATH = "embedding-jobs.db"
+
+INTERACTIVE = "interactive"
+BACKFILL = "backfill"
+
+# Share of claims each lane gets while both have work
+LANE_WEIGHTS = {
+    INTERACTIVE: 8,
+    BACKFILL: 1,
+}
+
+# Backfill jobs older than this are scheduled in the interactive lane, behind its own jobs
+PROMOTE_AFTER_SECONDS = 15 * 60
+
+LEASE_SECONDS = 120
+MAX_ATTEMPTS = 5
+RETRY_BACKOFF_SECONDS = 30
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    doc_id TEXT NOT NULL UNIQUE,
+    lane TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    enqueued_at REAL NOT NULL,
+    available_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    owner TEXT,
+    lease_expires REAL,
+    last_error TEXT,
+    generation INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS jobs_by_lane ON jobs (status, lane, enqueued_at);
+"""
+
+class EmbeddingJobQueue:
+    """SQLite-backed job queue with an interactive and a backfill lane."""
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, weights: Dict[str, int] = None,
+                 promote_after: float = PROMOTE_AFTER_SECONDS):
+        self.conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        if "generation" not in {row["name"] for row in self.conn.execute("PRAGMA table_info(jobs)")}:
+            # Databases created before re-enqueues of leased jobs were tracked
+            self.conn.execute("ALTER TABLE jobs ADD COLUMN generation INTEGER NOT NULL DEFAULT 0")
+        self.weights = weights or LANE_WEIGHTS
+        self.promote_after = promote_after
+        # Claims served per lane by this worker, for weighted fair scheduling
+        self.served = {lane: 0 for lane in self.weights}
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def enqueue(self, doc_ids: List[str], lane: str = INTERACTIVE) -> int:
+        """
+        Add jobs for the given documents.
+
+        A document already queued keeps its place but is upgraded to the interactive
+        lane if needed; a finished or failed one is queued again. Every enqueue bumps the
+        job's generation, so a job re-enqueued while leased is not completed by the worker
+        holding the stale lease but goes back to pending (see complete()).
+        """
+        now = time.time()
+        before = self.conn.total_changes
+        self.conn.execute("BEGIN IMMEDIATE")
+        self.conn.executemany(
+            "INSERT INTO jobs (doc_id, lane, enqueued_at, available_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(doc_id) DO UPDATE SET "
+            "  lane = CASE WHEN excluded.lane = 'interactive' OR jobs.status != 'pending' "
+            "              THEN excluded.lane ELSE jobs.lane END, "
+            "  enqueued_at = CASE WHEN jobs.status = 'pending' THEN jobs.enqueued_at ELSE excluded.enqueued_at END, "
+            "  available_at = CASE WHEN excluded.lane = 'interactive' OR jobs.status != 'pending' "
+            "                      THEN excluded.available_at ELSE jobs.available_at END, "
+            "  status = CASE WHEN jobs.status = 'leased' THEN jobs.status ELSE 'pending' END, "
+            "  attempts = CASE WHEN jobs.status = 'pending' THEN jobs.attempts ELSE 0 END, "
+            "  generation = jobs.generation + 1",
+            [(doc_id, lane, now, now) for doc_id in doc_ids]
+        )
+        self.conn.execute("COMMIT")
+        return self.conn.total_changes - before
+
+    def _lane_has_work(self, lane: str, now: float) -> bool:
+        return self.conn.execute(
+            self._lane_query(lane, "1") + " LIMIT 1", self._lane_params(lane, now)
+        ).fetchone() is not None
+
+    def _lane_query(self, lane: str, columns: str) -> str:
+        # Runnable pending jobs, plus jobs whose lease was abandoned
+        runnable = ("((status = 'pending' AND available_at <= ?) "
+                    "OR (status = 'leased' AND lease_expires < ?))")
+        if lane == INTERACTIVE:
+            lane_filter = "(lane = 'interactive' OR (lane = 'backfill' AND enqueued_at < ?))"
+        else:
+            lane_filter = "lane = 'backfill'"
+        return f"SELECT {columns} FROM jobs WHERE {runnable} AND {lane_filter}"
+
+    def _lane_params(self, lane: str, now: float) -> tuple:
+        if lane == INTERACTIVE:
+            return (now, now, now - self.promote_after)
+        return (now, now)
+
+    def _pick_lane(self, now: float) -> Optional[str]:
+        """Pick the lane with work that is furthest behind its weighted share."""
+        candidates = [lane for lane in self.weights if self._lane_has_work(lane, now)]
+        if len(candidates) <= 1:
+            # Shares only matter while lanes compete; an idle lane must not bank credit
+            self.served = {lane: 0 for lane in self.weights}
+        if not candidates:
+            return None
+        return min(candidates, key=lambda lane: (self.served[lane] / self.weights[lane],
+                                                 lane != INTERACTIVE))
+
+    def claim(self, owner: str, limits: Dict[str, int] = None) -> List[Dict[str, Any]]:
+        """Lease jobs from the next lane due for service, up to that lane's limit (default 1)."""
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            lane = self._pick_lane(now)
+            if lane is None:
+                self.conn.execute("COMMIT")
+                return []
+
+            rows = self.conn.execute(
+                self._lane_query(lane, "id, doc_id, lane, enqueued_at, attempts, generation")
+                # Promoted backfill jobs are older by definition; real uploads still go first
+                + " ORDER BY lane = 'backfill', enqueued_at LIMIT ?",
+                self._lane_params(lane, now) + ((limits or {}).get(lane, 1),)
+            ).fetchall()
+            self.conn.executemany(
+                "UPDATE jobs SET status = 'leased', owner = ?, lease_expires = ? WHERE id = ?",
+                [(owner, now + LEASE_SECONDS, row["id"]) for row in rows]
+            )
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+        self.served[lane] += len(rows)
+        return [dict(row, owner=owner) for row in rows]
+
+    def complete(self, job: Dict[str, Any]) -> None:
+        """
+        Finish a claimed job, unless its lease has since gone to another worker.
+
+        A job re-enqueued since it was claimed goes back to pending so the new version is embedded.
+        """
+        self.conn.execute(
+            "UPDATE jobs SET owner = NULL, lease_expires = NULL, last_error = NULL, "
+            "  status = CASE WHEN generation = ? THEN 'done' ELSE 'pending' END "
+            "WHERE id = ? AND owner = ? AND status = 'leased'",
+            (job["generation"], job["id"], job["owner"])
+        )
+
+    def fail(self, job: Dict[str, Any], error: str) -> None:
+        """Retry a failed job with backoff, giving up after MAX_ATTEMPTS; a re-enqueued job is retried at once."""
+        now = time.time()
+        METRICS.count_retry("job")
+        self.conn.execute(
+            "UPDATE jobs SET last_error = ?, owner = NULL, lease_expires = NULL, "
+            "  attempts = CASE WHEN generation = ? THEN attempts + 1 ELSE 0 END, "
+            "  status = CASE WHEN generation = ? AND attempts + 1 >= ? THEN 'failed' ELSE 'pending' END, "
+            "  available_at = CASE WHEN generation = ? THEN ? + ? * (attempts + 1) ELSE ? END "
+            "WHERE id = ? AND owner = ? AND status = 'leased'",
+            (error, job["generation"], job["generation"], MAX_ATTEMPTS, job["generation"], now,
+             RETRY_BACKOFF_SECONDS, now, job["id"], job["owner"])
+        )
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Job counts per lane and status."""
+        counts = {}
+        for row in self.conn.execute("SELECT lane, status, COUNT(*) AS n FROM jobs GROUP BY lane, status"):
+            counts.setdefault(row["lane"], {})[row["status"]] = row["n"]
+        return counts
+
+def process_jobs(queue: EmbeddingJobQueue, jobs: List[Dict[str, Any]], delay: float = 0.0) -> int:
+    """Embed the documents behind a set of claimed jobs; returns the number that succeeded."""
+    fetched = {doc["id"]: doc for doc in embeddings.fetch_document_content([job["doc_id"] for job in jobs],
+                                                                          select="id,content,client")}
+
+    succeeded = 0
+    for job in jobs:
+        doc = fetched.get(job["doc_id"])
+        waited = time.time() - job["enqueued_at"]
+        if doc is None or embeddings.FETCH_ERROR in doc:
+            # Retried with backoff: the request failed, or a fresh upload isn't visible yet
+            error = doc[embeddings.FETCH_ERROR] if doc else "document not found in the index"
+            print(f"  ✗ [{job['lane']}] {job['doc_id']} not fetched (attempt {job['attempts'] + 1}): {error}")
+            queue.fail(job, f"fetch failed: {error}")
+            continue
+        content = doc.get("content")
+        if not content:
+            print(f"  ⚠ {job['doc_id']}: no content found, skipping")
+            queue.complete(job)
+            continue
+
+        vector = embeddings.generate_embeddings(content)
+        if vector and embeddings.update_document_with_embeddings(job["doc_id"], vector, client=doc.get("client"),
+                                                                 text=content):
+            print(f"  ✓ [{job['lane']}] {job['doc_id']} searchable {waited:.1f}s after enqueue")
+            queue.complete(job)
+            succeeded += 1
+        else:
+            print(f"  ✗ [{job['lane']}] {job['doc_id']} failed (attempt {job['attempts'] + 1})")
+            queue.fail(job, "embedding or index update failed")
+
+        if delay:
+            time.sleep(delay)
+
+    return succeeded
+
+def run_worker(queue: EmbeddingJobQueue, batch_size: int = 10, delay: float = embeddings.REQUEST_DELAY,
+               idle_sleep: float = 0.5, exit_when_idle: bool = False) -> None:
+    """Serve jobs until interrupted (or until the queue is empty with exit_when_idle)."""
+    owner = f"{socket.gethostname()}:{os.getpid()}"
+    while True:
+        # Interactive work is claimed one job at a time so a new upload never waits behind a batch
+        jobs = queue.claim(owner, limits={INTERACTIVE: 1, BACKFILL: batch_size})
+
+        if not jobs:
+            if exit_when_idle:
+                return
+            time.sleep(idle_sleep)
+            continue
+
+        process_jobs(queue, jobs, delay=delay)
+
+def main():
+    parser = argparse.ArgumentParser(description='Priority queue for embedding jobs')
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help='SQLite job database')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    enqueue_parser = subparsers.add_parser('enqueue', help='Queue documents for embedding')
+    enqueue_parser.add_argument('doc_ids', nargs='+', help='Document ids')
+    enqueue_parser.add_argument('--lane', choices=list(LANE_WEIGHTS), default=INTERACTIVE)
+
+    backfill_parser = subparsers.add_parser('backfill', help='Queue every document in the backfill lane')
+    backfill_parser.add_argument('--client', type=str, help='Only queue documents for this client')
+
+    work_parser = subparsers.add_parser('work', help='Process queued jobs')
+    work_parser.add_argument('--batch-size', type=int, default=10, help='Backfill jobs per claim')
+    work_parser.add_argument('--exit-when-idle', action='store_true', help='Stop once the queue is empty')
+
+    subparsers.add_parser('status', help='Show queue depth per lane')
+
+    args = parser.parse_args()
+    queue = EmbeddingJobQueue(args.db)
+
+    if args.command == 'enqueue':
+        queue.enqueue(args.doc_ids, lane=args.lane)
+        print(f"Queued {len(args.doc_ids)} documents in the {args.lane} lane")
+    elif args.command == 'backfill':
+        filter_query = "client eq '{}'".format(args.client.replace("'", "''")) if args.client else None
+        doc_ids = [doc["id"] for doc in embeddings.iter_documents(filter_query, select="id")]
+        queue.enqueue(doc_ids, lane=BACKFILL)
+        print(f"Queued {len(doc_ids)} documents in the backfill lane")
+    elif args.command == 'work':
+        if not embeddings.SEARCH_API_KEY or not embeddings.AZURE_OPENAI_KEY:
+            print("Error: SEARCH_API_KEY and AZURE_OPENAI_KEY environment variables must be set")
+            sys.exit(1)
+        try:
+            run_worker(queue, batch_size=args.batch_size, exit_when_idle=args.exit_when_idle)
+        except KeyboardInterrupt:
+            print("\nWorker stopped")
+    else:
+        for lane, counts in sorted(queue.stats().items()):
+            print(f"  {lane}: " + ", ".join(f"{status}={n}" for status, n in sorted(counts.items())))
+
+    queue.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Local facet counts for the blueprint fields.
+Keeps each document's facet values in SQLite together with precomputed counts for the whole
+index, each client and each client/project, updates them as documents are written, and answers
+facet requests in the same shape as the service's @search.facets without querying it.
+"""
+
+import sys
+import json
+import sqlite3
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Dict, Any, Iterable
+from urllib.parse import urlparse, parse_qs
+
+import generate_embeddings_for_new_docs as embeddings
+
+DEFAULT_DB_PATH = "facet-cache.db"
+
+FACET_FIELDS = [
+    "category", "materials", "dimensions", "specifications", "standardsCodes", "fireRatings",
+    "structuralMembers", "roomNumbers", "drawingType", "drawingScale", "sheetNumber",
+]
+PROJECT_FIELD = "projectName"
+
+# Scope value meaning "all clients" / "all projects"
+ALL = "*"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS doc_facets (
+    doc_id TEXT NOT NULL,
+    client TEXT NOT NULL,
+    project TEXT NOT NULL,
+    field TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (doc_id, field, value)
+);
+CREATE TABLE IF NOT EXISTS facet_counts (
+    client TEXT NOT NULL,
+    project TEXT NOT NULL,
+    field TEXT NOT NULL,
+    value TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (client, project, field, value)
+);
+CREATE INDEX IF NOT EXISTS facet_counts_by_scope ON facet_counts (client, project, field, count DESC);
+"""
+
+def _scopes(client: str, project: str) -> List[tuple]:
+    """Every (client, project) rollup a document counts towards."""
+    return [(ALL, ALL), (client, ALL), (client, project)]
+
+def _facet_values(doc: Dict[str, Any], fields: List[str]) -> List[tuple]:
+    """Distinct (field, value) pairs of a document; facets count documents, not occurrences."""
+    pairs = set()
+    for field in fields:
+        value = doc.get(field)
+        for item in value if isinstance(value, list) else [value]:
+            if item is not None and item != "":
+                pairs.add((field, str(item)))
+    return sorted(pairs)
+
+def parse_facet_spec(spec: str) -> Dict[str, Any]:
+    """Parse a facet expression like "materials,count:10,sort:-value"."""
+    name, *options = [part.strip() for part in spec.split(",")]
+    parsed = {"field": name, "count": 10, "sort": "count"}
+    for option in options:
+        key, _, value = option.partition(":")
+        if key == "count":
+            parsed["count"] = int(value)
+        elif key == "sort":
+            parsed["sort"] = value
+    return parsed
+
+class FacetCache:
+    """SQLite-backed facet counts, maintained incrementally per document."""
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, fields: List[str] = None):
+        self.fields = fields or FACET_FIELDS
+        self.conn = sqlite3.connect(db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def _apply(self, rows: Iterable[tuple], delta: int) -> None:
+        self.conn.executemany(
+            "INSERT INTO facet_counts (client, project, field, value, count) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (client, project, field, value) DO UPDATE SET count = count + excluded.count",
+            [(scope_client, scope_project, field, value, delta)
+             for client, project, field, value in rows
+             for scope_client, scope_project in _scopes(client, project)])
+
+    def update_documents(self, documents: List[Dict[str, Any]]) -> int:
+        """Record the current facet values of these documents; returns how many were updated."""
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                for doc in documents:
+                    self._remove(doc["id"])
+                    client, project = doc.get("client") or "", doc.get(PROJECT_FIELD) or ""
+                    rows = [(client, project, field, value) for field, value in _facet_values(doc, self.fields)]
+                    self.conn.executemany(
+                        "INSERT INTO doc_facets (doc_id, client, project, field, value) VALUES (?, ?, ?, ?, ?)",
+                        [(doc["id"],) + row for row in rows])
+                    self._apply(rows, 1)
+                self.conn.execute("DELETE FROM facet_counts WHERE count <= 0")
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return len(documents)
+
+    def remove_documents(self, doc_ids: List[str]) -> None:
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                for doc_id in doc_ids:
+                    self._remove(doc_id)
+                self.conn.execute("DELETE FROM facet_counts WHERE count <= 0")
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def _remove(self, doc_id: str) -> None:
+        rows = self.conn.execute("SELECT client, project, field, value FROM doc_facets WHERE doc_id = ?",
+                                 (doc_id,)).fetchall()
+        if rows:
+            self._apply(rows, -1)
+            self.conn.execute("DELETE FROM doc_facets WHERE doc_id = ?", (doc_id,))
+
+    def facets(self, specs: List[str], client: str = None, project: str = None) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Facet counts for a client/project scope (None = all), shaped like @search.facets.
+        specs use the service's syntax, e.g. ["materials,count:20", "fireRatings,sort:value"].
+        """
+        scope = (client if client is not None else ALL,
+                 project if project is not None else ALL)
+        if scope[0] == ALL and scope[1] != ALL:
+            raise ValueError("a project scope needs a client")
+        order = {"count": "count DESC, value", "-count": "count, value",
+                 "value": "value", "-value": "value DESC"}
+        result = {}
+        with self._lock:
+            for spec in specs:
+                parsed = parse_facet_spec(spec)
+                rows = self.conn.execute(
+                    f"SELECT value, count FROM facet_counts WHERE client = ? AND project = ? AND field = ? "
+                    f"ORDER BY {order.get(parsed['sort'], order['count'])} LIMIT ?",
+                    scope + (parsed["field"], parsed["count"])).fetchall()
+                result[parsed["field"]] = [{"value": value, "count": count} for value, count in rows]
+        return result
+
+    def values(self, fields: List[str], client: str = None, project: str = None) -> List[tuple]:
+        """Every (field, value, count) row of these fields in a client/project scope (None = all)."""
+        scope = (client if client is not None else ALL, project if project is not None else ALL)
+        with self._lock:
+            return self.conn.execute(
+                "SELECT field, value, count FROM facet_counts WHERE client = ? AND project = ? "
+                f"AND field IN ({','.join('?' * len(fields))})", scope + tuple(fields)).fetchall()
+
+    def document_count(self) -> int:
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(DISTINCT doc_id) FROM doc_facets").fetchone()[0]
+
+    def document_ids(self) -> set:
+        with self._lock:
+            return {row[0] for row in self.conn.execute("SELECT DISTINCT doc_id FROM doc_facets")}
+
+def select_fields(fields: List[str]) -> str:
+    return ",".join(["id", "client", PROJECT_FIELD] + fields)
+
+def refresh_documents(cache: FacetCache, doc_ids: List[str], batch_size: int = 100) -> int:
+    """
+    Re-read the facet fields of these documents from the index and update the cache.
+    Batches the index can't be read for keep their cached values; returns how many documents were re-read.
+    """
+    updated = 0
+    for start in range(0, len(doc_ids), batch_size):
+        batch = doc_ids[start:start + batch_size]
+        try:
+            documents = list(embeddings.iter_documents(embeddings.id_filter(batch),
+                                                       select=select_fields(cache.fields)))
+        except RuntimeError as e:
+            print(f"  ⚠ facet refresh skipped for {len(batch)} documents: {e}")
+            continue
+        # Only a complete answer shows which documents are gone
+        found = {doc["id"] for doc in documents}
+        cache.update_documents(documents)
+        cache.remove_documents([doc_id for doc_id in batch if doc_id not in found])
+        updated += len(documents)
+    return updated
+
+def load_all(cache: FacetCache, page_size: int = 1000) -> int:
+    """
+    Full load from the index, one page per transaction. Once every page has been read,
+    cached documents the index no longer has are removed.
+    """
+    total = 0
+    page = []
+    seen = set()
+    for doc in embeddings.iter_documents(select=select_fields(cache.fields), page_size=page_size):
+        page.append(doc)
+        seen.add(doc["id"])
+        if len(page) >= page_size:
+            total += cache.update_documents(page)
+            page = []
+            print(f"  {total} documents loaded")
+    total += cache.update_documents(page)
+    stale = sorted(cache.document_ids() - seen)
+    if stale:
+        cache.remove_documents(stale)
+        print(f"  {len(stale)} deleted documents removed")
+    return total
+
+def make_facet_handler(cache: FacetCache):
+    """GET /facets?facet=materials,count:10&facet=fireRatings&client=X&project=Y."""
+
+    class FacetHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path.rstrip("/") != "/facets":
+                self.send_error(404)
+                return
+            query = parse_qs(url.query)
+            specs = query.get("facet") or cache.fields
+            try:
+                facets = cache.facets(specs, client=query.get("client", [None])[0],
+                                      project=query.get("project", [None])[0])
+            except ValueError as e:
+                self.send_error(400, str(e))
+                return
+            body = json.dumps({"@search.facets": facets}).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Access-Control-Allow-Origin", "*")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return FacetHandler
+
+def main():
+    parser = argparse.ArgumentParser(description='Precomputed facet counts for the blueprint fields')
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help='SQLite facet database')
+    parser.add_argument('--load', action='store_true', help='(Re)load every document from the index')
+    parser.add_argument('--refresh', nargs='+', metavar='DOC_ID', help='Re-read these documents from the index')
+    parser.add_argument('--facet', action='append', help='Print counts for this facet spec (repeatable)')
+    parser.add_argument('--client', type=str, help='Client scope for --facet')
+    parser.add_argument('--project', type=str, help='Project scope for --facet (needs --client)')
+    parser.add_argument('--serve', type=int, metavar='PORT', help='Serve GET /facets on this local port')
+
+    args = parser.parse_args()
+
+    cache = FacetCache(args.db)
+    if (args.load or args.refresh) and not embeddings.SEARCH_API_KEY:
+        print("Error: SEARCH_API_KEY environment variable not set")
+        sys.exit(1)
+
+    if args.load:
+        print(f"Loading facet values from {embeddings.SEARCH_INDEX_NAME}...")
+        print(f"✓ {load_all(cache)} documents")
+    if args.refresh:
+        print(f"✓ Refreshed {refresh_documents(cache, args.refresh)} documents")
+    if args.facet:
+        print(json.dumps({"@search.facets": cache.facets(args.facet, client=args.client, project=args.project)},
+                         indent=2))
+    if args.serve:
+        server = ThreadingHTTPServer(("127.0.0.1", args.serve), make_facet_handler(cache))
+        print(f"Serving facets for {cache.document_count()} documents on http://127.0.0.1:{args.serve}/facets")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            server.shutdown()
+    cache.close()
+
+if __name__ == "__main__":
+    main()
@@ -9,20 +9,46 @@ import sys
 import json
 import requests
 import time
+import argparse
+import threading
 import openai
-from typing import List, Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Iterator
 from datetime import datetime
 
+import search_config
+from pipeline_metrics import METRICS
+from search_cache import SEARCH_CACHE
+from document_vector_store import get_vector_store
+
 # Configuration
 SEARCH_ENDPOINT = os.environ.get("SEARCH_ENDPOINT", "https://fcssearchservice.search.windows.net")
 SEARCH_API_KEY = os.environ.get("SEARCH_API_KEY", "")
-SEARCH_INDEX_NAME = "fcs-construction-docs-index-v2"
+SEARCH_INDEX_NAME = search_config.SEARCH_INDEX_NAME
 
 # Azure OpenAI configuration
 AZURE_OPENAI_ENDPOINT = os.environ.get("AZURE_OPENAI_ENDPOINT", "")
 AZURE_OPENAI_KEY = os.environ.get("AZURE_OPENAI_KEY", "")
 EMBEDDING_MODEL = "text-embedding-ada-002"
 
+# Fields read by create_blueprint_text() and process_batch(); everything else is dead payload
+BLUEPRINT_SELECT_FIELDS = (
+    "id,fileName,client,sheetNumber,drawingType,drawingScale,dimensions,materials,specifications,"
+    "standardsCodes,structuralMembers,fireRatings,roomNumbers,measurements"
+)
+
+# Filters identifying documents that might carry blueprint data
+BLUEPRINT_FILTERS = [
+    "dimensions/any()",  # Has dimensions
+    "materials/any()",   # Has materials
+    "specifications/any()",  # Has specifications
+    "category eq 'drawings'",  # Drawing category
+    "category eq 'blueprints'",  # Blueprint category
+]
+
+# Azure Search caps a single page at 1000 results
+SEARCH_PAGE_SIZE = 1000
+
 # Set up OpenAI client
 if AZURE_OPENAI_ENDPOINT and AZURE_OPENAI_KEY:
     openai.api_type = "azure"
@@ -33,9 +59,10 @@ if AZURE_OPENAI_ENDPOINT and AZURE_OPENAI_KEY:
 else:
     print("WARNING: Azure OpenAI not configured, embeddings will not be generated")
 
-def search_documents(filter_query: str = None, select_fields: str = None, top: int = 1000) -> List[Dict]:
+def search_documents(filter_query: str = None, select_fields: str = None, top: int = 1000,
+                     order_by: str = None) -> List[Dict]:
     """Search for documents in the index."""
-    url = f"{SEARCH_ENDPOINT}/indexes/{SEARCH_INDEX_NAME}/docs/search?api-version=2023-11-01"
+    url = f"{SEARCH_ENDPOINT}/indexes/{search_config.index_name()}/docs/search?api-version=2023-11-01"
     headers = {
         "api-key": SEARCH_API_KEY,
         "Content-Type": "application/json"
@@ -49,14 +76,69 @@ def search_documents(filter_query: str = None, select_fields: str = None, top: i
     
     if filter_query:
         query["filter"] = filter_query
+    if order_by:
+        query["orderby"] = order_by
+    
+    with METRICS.stage("fetch") as span:
+        response = requests.post(url, headers=headers, json=query)
+        span.add_response(response)
+        if response.status_code != 200:
+            # A failed page must not look like the end of the result set
+            raise RuntimeError(f"searching documents: {response.status_code} - {response.text}")
+        docs = response.json().get("value", [])
+        span.set_items(len(docs))
+    
+    return docs
+
+def search_all_documents(filter_query: str = None, select_fields: str = None,
+                         page_size: int = SEARCH_PAGE_SIZE) -> Iterator[Dict]:
+    """Page through every document matching the filter, using the id as a keyset cursor."""
+    last_id = None
+    while True:
+        page_filter = filter_query
+        if last_id is not None:
+            cursor = "id gt '{}'".format(last_id.replace("'", "''"))
+            page_filter = f"({filter_query}) and {cursor}" if filter_query else cursor
+        
+        docs = search_documents(filter_query=page_filter, select_fields=select_fields,
+                                top=page_size, order_by="id asc")
+        yield from docs
+        
+        if len(docs) < page_size:
+            return
+        last_id = docs[-1]["id"]
+
+def harvest_documents(filter_queries: List[str], mode: str = "combined",
+                      select_fields: str = BLUEPRINT_SELECT_FIELDS) -> List[Dict]:
+    """
+    Collect every document matching any of the filters, each exactly once.
+    
+    "combined" ORs the filters together so the service dedups and a single cursor
+    pages through the result. "concurrent" pages each filter on its own thread and
+    drops duplicates as the pages stream in.
+    """
+    if mode == "combined":
+        combined_filter = " or ".join(f"({f})" for f in filter_queries)
+        print(f"   Searching: {combined_filter}")
+        return list(search_all_documents(combined_filter, select_fields))
+    
+    all_documents = []
+    seen_ids = set()
+    lock = threading.Lock()
     
-    response = requests.post(url, headers=headers, json=query)
+    def harvest(filter_query: str) -> None:
+        print(f"   Searching: {filter_query}")
+        for doc in search_all_documents(filter_query, select_fields):
+            with lock:
+                if doc["id"] not in seen_ids:
+                    seen_ids.add(doc["id"])
+                    all_documents.append(doc)
     
-    if response.status_code == 200:
-        return response.json().get("value", [])
-    else:
-        print(f"Error searching documents: {response.status_code}")
-        return []
+    with ThreadPoolExecutor(max_workers=len(filter_queries)) as executor:
+        # list() re-raises any exception from the worker threads
+        list(executor.map(harvest, filter_queries))
+    
+    return all_documents
 
 def create_blueprint_text(doc: Dict) -> str:
     """Create a comprehensive text representation of blueprint data for embedding."""
@@ -128,18 +210,26 @@ def generate_embedding(text: str) -> Optional[List[float]]:
         return None
     
     try:
-        response = openai.Embedding.create(
-            input=text,
-            engine=EMBEDDING_MODEL
-        )
+        with METRICS.stage("embed") as span:
+            response = openai.Embedding.create(
+                input=text,
+                engine=EMBEDDING_MODEL
+            )
+            span.add_bytes(sent=len(text.encode("utf-8")))
+            span.add_tokens(response.get("usage", {}).get("total_tokens", 0))
         return response["data"][0]["embedding"]
     except Exception as e:
         print(f"Error generating embedding: {e}")
         return None
 
-def update_document_embedding(doc_id: str, embedding: List[float], has_blueprint_data: bool) -> bool:
-    """Update a document with blueprint embedding."""
-    url = f"{SEARCH_ENDPOINT}/indexes/{SEARCH_INDEX_NAME}/docs/index?api-version=2023-11-01"
+def update_document_embedding(doc_id: str, embedding: List[float], has_blueprint_data: bool,
+                              client: str = None, text: str = None) -> bool:
+    """
+    Update a document with blueprint embedding, invalidating cached searches for its client.
+    
+    When the blueprint text is given the vector is also kept in the local document vector store.
+    """
+    url = f"{SEARCH_ENDPOINT}/indexes/{search_config.index_name()}/docs/index?api-version=2023-11-01"
     headers = {
         "api-key": SEARCH_API_KEY,
         "Content-Type": "application/json"
@@ -157,9 +247,16 @@ def update_document_embedding(doc_id: str, embedding: List[float], has_blueprint
     if has_blueprint_data:
         doc_update["value"][0]["hasBlueprintData"] = True
     
-    response = requests.post(url, headers=headers, json=doc_update)
+    with METRICS.stage("index_write") as span:
+        response = requests.post(url, headers=headers, json=doc_update)
+        span.add_response(response)
     
-    return response.status_code in [200, 201, 202]
+    if response.status_code in [200, 201, 202]:
+        SEARCH_CACHE.invalidate_scope(client=client)
+        if text is not None:
+            get_vector_store().put(doc_id, "blueprintVector", text, embedding)
+        return True
+    return False
 
 def process_batch(documents: List[Dict], batch_size: int = 10) -> Dict[str, Any]:
     """Process a batch of documents to generate embeddings."""
@@ -196,7 +293,8 @@ def process_batch(documents: List[Dict], batch_size: int = 10) -> Dict[str, Any]
                 continue
             
             # Create blueprint text
-            blueprint_text = create_blueprint_text(doc)
+            with METRICS.stage("text_build"):
+                blueprint_text = create_blueprint_text(doc)
             
             if not blueprint_text or len(blueprint_text) < 10:
                 print(f"  - {doc.get('fileName', doc_id)}: Insufficient text")
@@ -209,7 +307,8 @@ def process_batch(documents: List[Dict], batch_size: int = 10) -> Dict[str, Any]
             
             if embedding:
                 # Update document
-                if update_document_embedding(doc_id, embedding, True):
+                if update_document_embedding(doc_id, embedding, True, client=doc.get("client"),
+                                             text=blueprint_text):
                     print(f"    ✓ Updated successfully")
                     results["updated"] += 1
                 else:
@@ -228,6 +327,16 @@ def process_batch(documents: List[Dict], batch_size: int = 10) -> Dict[str, Any]
 
 def main():
     """Main execution function."""
+    parser = argparse.ArgumentParser(description='Generate blueprint embeddings for documents in Azure Search')
+    parser.add_argument('--harvest', choices=['combined', 'concurrent'], default='combined',
+                        help='combined: one OR\'d filter paged to the end; concurrent: one thread per filter with streaming dedup')
+    parser.add_argument('--metrics-file', type=str, help='Write Prometheus text metrics to this file')
+    parser.add_argument('--trace-file', type=str, help='Append a JSON span per pipeline stage call to this file')
+    args = parser.parse_args()
+    
+    if args.trace_file:
+        METRICS.enable_tracing(args.trace_file)
+    
     print("=" * 60)
     print("BLUEPRINT EMBEDDING GENERATION")
     print("=" * 60)
@@ -244,25 +353,11 @@ def main():
     # Search for documents with blueprint data
     print("\n1. Searching for documents with blueprint data...")
     
-    # First, get documents that might have blueprint data
-    filter_queries = [
-        "dimensions/any()",  # Has dimensions
-        "materials/any()",   # Has materials
-        "specifications/any()",  # Has specifications
-        "category eq 'drawings'",  # Drawing category
-        "category eq 'blueprints'",  # Blueprint category
-    ]
-    
-    all_documents = []
-    seen_ids = set()
-    
-    for filter_query in filter_queries:
-        print(f"   Searching: {filter_query}")
-        docs = search_documents(filter_query=filter_query, top=500)
-        for doc in docs:
-            if doc["id"] not in seen_ids:
-                all_documents.append(doc)
-                seen_ids.add(doc["id"])
+    try:
+        all_documents = harvest_documents(BLUEPRINT_FILTERS, mode=args.harvest)
+    except RuntimeError as e:
+        print(f"ERROR: {e}")
+        sys.exit(1)
     
     print(f"   Found {len(all_documents)} unique documents with potential blueprint data")
     
@@ -288,6 +383,10 @@ def main():
     print(f"  Skipped: {results['skipped']}")
     print(f"  Errors: {results['errors']}")
     print(f"  Time: {elapsed:.1f} seconds")
+    METRICS.print_summary()
+    
+    if args.metrics_file:
+        METRICS.write_prometheus(args.metrics_file)
     
     if results['updated'] > 0:
         print("\n✓ Blueprint embeddings generated successfully!")
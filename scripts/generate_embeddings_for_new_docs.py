@@ -2,27 +2,57 @@
 """
 Generate embeddings for documents in Azure Search that don't have embeddings yet.
 This script can be run periodically or triggered after document uploads.
+To have an upload jump ahead of a running backfill, queue it with embedding_job_queue.py instead.
 """
 
 import os
 import sys
 import json
 import requests
-from typing import List, Dict, Any
+from requests.adapters import HTTPAdapter
+from typing import List, Dict, Any, Iterator, Callable, Optional
 import time
 import argparse
 
+import search_config
+from pipeline_metrics import METRICS
+from search_cache import SEARCH_CACHE
+from document_vector_store import get_vector_store
+
 # Configuration
 AZURE_OPENAI_ENDPOINT = os.environ.get("AZURE_OPENAI_ENDPOINT", "https://saxtechopenai.openai.azure.com/")
 AZURE_OPENAI_KEY = os.environ.get("AZURE_OPENAI_KEY", "")
 EMBEDDING_MODEL = "text-embedding-ada-002"
 SEARCH_ENDPOINT = "https://fcssearchservice.search.windows.net"
 SEARCH_API_KEY = os.environ.get("SEARCH_API_KEY", "")
-SEARCH_INDEX_NAME = "fcs-construction-docs-index-v2"
+SEARCH_INDEX_NAME = search_config.SEARCH_INDEX_NAME
+
+# Listing only needs metadata; content is the full extracted text and is fetched on demand
+METADATA_FIELDS = "id,fileName,client,category"
+CONTENT_BATCH_SIZE = 20
+# Key of the marker fetch_document_content yields for ids whose content request failed
+FETCH_ERROR = "@fetchError"
+
+# Delay between embedding requests for a single process
+REQUEST_DELAY = 0.5
+
+_session = None
+_session_pid = None
 
-def get_documents(client: str = None, limit: int = 100) -> List[Dict[str, Any]]:
-    """Retrieve documents from the search index."""
-    search_url = f"{SEARCH_ENDPOINT}/indexes/{SEARCH_INDEX_NAME}/docs"
+def get_session() -> requests.Session:
+    """Shared HTTP session so repeated calls reuse warm connections (one per process)."""
+    global _session, _session_pid
+    if _session is None or _session_pid != os.getpid():
+        _session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+        _session.mount("https://", adapter)
+        _session.mount("http://", adapter)
+        _session_pid = os.getpid()
+    return _session
+
+def get_documents(client: str = None, limit: int = 100, select: str = METADATA_FIELDS) -> List[Dict[str, Any]]:
+    """Retrieve document metadata from the search index."""
+    search_url = f"{SEARCH_ENDPOINT}/indexes/{search_config.index_name()}/docs"
     
     # Build filter query
     filter_query = None
@@ -31,7 +61,7 @@ def get_documents(client: str = None, limit: int = 100) -> List[Dict[str, Any]]:
     
     params = {
         "api-version": "2021-04-30-Preview",
-        "$select": "id,fileName,client,category,content",
+        "$select": select,
         "$top": limit
     }
     if filter_query:
@@ -43,10 +73,13 @@ def get_documents(client: str = None, limit: int = 100) -> List[Dict[str, Any]]:
     }
     
     try:
-        response = requests.get(search_url, params=params, headers=headers)
+        with METRICS.stage("fetch", operation="list") as span:
+            response = get_session().get(search_url, params=params, headers=headers)
+            span.add_response(response)
+            if response.status_code == 200:
+                documents = response.json().get("value", [])
+                span.set_items(len(documents))
         if response.status_code == 200:
-            data = response.json()
-            documents = data.get("value", [])
             # Note: We can't check contentVector status via API as it's not retrievable
             # So we'll process all documents and update embeddings
             return documents
@@ -57,6 +90,106 @@ def get_documents(client: str = None, limit: int = 100) -> List[Dict[str, Any]]:
         print(f"Error querying search index: {e}")
         return []
 
+def iter_documents(filter_query: str = None, select: str = METADATA_FIELDS,
+                   page_size: int = 1000) -> Iterator[Dict[str, Any]]:
+    """Page through every matching document, using the id as a keyset cursor; raises RuntimeError on HTTP errors."""
+    last_id = None
+    while True:
+        page_filter = filter_query
+        if last_id is not None:
+            cursor = "id gt '{}'".format(last_id.replace("'", "''"))
+            page_filter = f"({filter_query}) and {cursor}" if filter_query else cursor
+        
+        params = {
+            "api-version": "2021-04-30-Preview",
+            "$select": select,
+            "$orderby": "id asc",
+            "$top": page_size
+        }
+        if page_filter:
+            params["$filter"] = page_filter
+        
+        with METRICS.stage("fetch", operation="list") as span:
+            response = get_session().get(f"{SEARCH_ENDPOINT}/indexes/{search_config.index_name()}/docs",
+                                         params=params, headers={"api-key": SEARCH_API_KEY})
+            span.add_response(response)
+            if response.status_code != 200:
+                # A failed page must not look like the end of the result set
+                raise RuntimeError(f"fetching documents: {response.status_code} - {response.text}")
+            # Parsing the page is part of the fetch
+            documents = response.json().get("value", [])
+            span.set_items(len(documents))
+        yield from documents
+        
+        if len(documents) < page_size:
+            return
+        last_id = documents[-1]["id"]
+
+def list_clients() -> List[str]:
+    """List every client in the index using a facet query."""
+    params = {
+        "api-version": "2021-04-30-Preview",
+        "facet": "client,count:10000",
+        "$top": 0
+    }
+    try:
+        response = get_session().get(f"{SEARCH_ENDPOINT}/indexes/{search_config.index_name()}/docs",
+                                     params=params, headers={"api-key": SEARCH_API_KEY})
+        if response.status_code == 200:
+            facets = response.json().get("@search.facets", {}).get("client", [])
+            return [facet["value"] for facet in facets]
+        print(f"Error listing clients: {response.status_code} - {response.text}")
+    except Exception as e:
+        print(f"Error listing clients: {e}")
+    return []
+
+def id_filter(doc_ids: List[str]) -> str:
+    """search.in filter matching these document ids."""
+    return "search.in(id, '{}', ',')".format(",".join(doc_id.replace("'", "''") for doc_id in doc_ids))
+
+def fetch_document_content(doc_ids: List[str], batch_size: int = CONTENT_BATCH_SIZE,
+                           select: str = "id,content") -> Iterator[Dict[str, Any]]:
+    """
+    Fetch the content of the given documents in bulk, one request per batch of ids.
+    
+    When a batch request fails, every id in it is yielded as {"id": ..., FETCH_ERROR: message}
+    so callers can tell a failed fetch from a document without content.
+    """
+    search_url = f"{SEARCH_ENDPOINT}/indexes/{search_config.index_name()}/docs"
+    headers = {
+        "api-key": SEARCH_API_KEY,
+        "Content-Type": "application/json"
+    }
+    
+    for i in range(0, len(doc_ids), batch_size):
+        batch = doc_ids[i:i+batch_size]
+        params = {
+            "api-version": "2021-04-30-Preview",
+            "$select": select,
+            "$filter": id_filter(batch),
+            "$top": len(batch)
+        }
+        
+        error = None
+        try:
+            with METRICS.stage("fetch", operation="content") as span:
+                response = get_session().get(search_url, params=params, headers=headers)
+                span.add_response(response)
+                span.set_items(len(batch))
+                if response.status_code == 200:
+                    documents = response.json().get("value", [])
+            if response.status_code != 200:
+                error = f"{response.status_code} - {response.text}"
+        except Exception as e:
+            error = str(e)
+        
+        if error is None:
+            yield from documents
+        else:
+            print(f"Error fetching content: {error}")
+            for doc_id in batch:
+                yield {"id": doc_id, FETCH_ERROR: error}
+
 def generate_embeddings(text: str) -> List[float]:
     """Generate embeddings using Azure OpenAI."""
     if not text:
@@ -76,9 +209,13 @@ def generate_embeddings(text: str) -> List[float]:
     }
     
     try:
-        response = requests.post(url, headers=headers, json=payload)
+        with METRICS.stage("embed") as span:
+            response = get_session().post(url, headers=headers, json=payload)
+            span.add_response(response)
+            if response.status_code == 200:
+                data = response.json()
+                span.add_tokens(data.get("usage", {}).get("total_tokens", 0))
         if response.status_code == 200:
-            data = response.json()
             return data["data"][0]["embedding"]
         else:
             print(f"OpenAI API error: {response.status_code} - {response.text}")
@@ -87,9 +224,14 @@ def generate_embeddings(text: str) -> List[float]:
         print(f"Error generating embeddings: {e}")
         return None
 
-def update_document_with_embeddings(doc_id: str, embeddings: List[float]) -> bool:
-    """Update a document in the search index with embeddings."""
-    url = f"{SEARCH_ENDPOINT}/indexes/{SEARCH_INDEX_NAME}/docs/index?api-version=2021-04-30-Preview"
+def update_document_with_embeddings(doc_id: str, embeddings: List[float], client: str = None,
+                                    text: str = None) -> bool:
+    """
+    Update a document in the search index with embeddings, invalidating cached searches for its client.
+    
+    When the source text is given the vector is also kept in the local document vector store.
+    """
+    url = f"{SEARCH_ENDPOINT}/indexes/{search_config.index_name()}/docs/index?api-version=2021-04-30-Preview"
     headers = {
         "Content-Type": "application/json",
         "api-key": SEARCH_API_KEY
@@ -104,8 +246,13 @@ def update_document_with_embeddings(doc_id: str, embeddings: List[float]) -> boo
     }
     
     try:
-        response = requests.post(url, headers=headers, json=document)
+        with METRICS.stage("index_write") as span:
+            response = get_session().post(url, headers=headers, json=document)
+            span.add_response(response)
         if response.status_code in [200, 201]:
+            SEARCH_CACHE.invalidate_scope(client=client)
+            if text is not None:
+                get_vector_store().put(doc_id, "contentVector", text, embeddings)
             return True
         else:
             print(f"Failed to update {doc_id}: {response.status_code} - {response.text}")
@@ -114,6 +261,59 @@ def update_document_with_embeddings(doc_id: str, embeddings: List[float]) -> boo
         print(f"Error updating document {doc_id}: {e}")
         return False
 
+def embed_documents(documents: List[Dict[str, Any]], delay: float = REQUEST_DELAY,
+                    progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, int]:
+    """
+    Embed the given documents, pulling content one batch at a time.
+    
+    progress(success_count, error_count) is called after every batch.
+    """
+    success_count = 0
+    error_count = 0
+    
+    for start in range(0, len(documents), CONTENT_BATCH_SIZE):
+        batch = documents[start:start+CONTENT_BATCH_SIZE]
+        fetched = {doc["id"]: doc for doc in fetch_document_content([doc["id"] for doc in batch])}
+        
+        for i, doc in enumerate(batch, start + 1):
+            doc_id = doc.get("id")
+            filename = doc.get("fileName", "Unknown")
+            content = fetched.get(doc_id, {}).get("content", "")
+            
+            print(f"\n[{i}/{len(documents)}] Processing: {filename}")
+            
+            if FETCH_ERROR in fetched.get(doc_id, {}):
+                print(f"  ✗ Failed to fetch content")
+                error_count += 1
+                continue
+            if not content:
+                print(f"  ⚠ No content found, skipping")
+                continue
+            
+            # Generate embeddings
+            print(f"  Generating embeddings for {len(content)} characters...")
+            embeddings = generate_embeddings(content)
+            
+            if embeddings:
+                # Update document
+                if update_document_with_embeddings(doc_id, embeddings, client=doc.get("client"), text=content):
+                    print(f"  ✓ Successfully updated with {len(embeddings)} dimensional embedding")
+                    success_count += 1
+                else:
+                    print(f"  ✗ Failed to update document")
+                    error_count += 1
+            else:
+                print(f"  ✗ Failed to generate embeddings")
+                error_count += 1
+            
+            # Rate limiting
+            time.sleep(delay)  # Small delay between requests
+        
+        if progress:
+            progress(success_count, error_count)
+    
+    return {"success": success_count, "errors": error_count}
+
 def process_documents(client: str = None, dry_run: bool = False, force: bool = False):
     """Main processing function."""
     # Check for API keys
@@ -145,54 +345,43 @@ def process_documents(client: str = None, dry_run: bool = False, force: bool = F
             print(f"  - {doc.get('fileName', 'Unknown')} (Client: {doc.get('client', 'Unknown')})")
         return
     
-    # Process each document
-    success_count = 0
-    error_count = 0
-    
-    for i, doc in enumerate(documents, 1):
-        doc_id = doc.get("id")
-        filename = doc.get("fileName", "Unknown")
-        content = doc.get("content", "")
-        
-        print(f"\n[{i}/{len(documents)}] Processing: {filename}")
-        
-        if not content:
-            print(f"  ⚠ No content found, skipping")
-            continue
-        
-        # Generate embeddings
-        print(f"  Generating embeddings for {len(content)} characters...")
-        embeddings = generate_embeddings(content)
-        
-        if embeddings:
-            # Update document
-            if update_document_with_embeddings(doc_id, embeddings):
-                print(f"  ✓ Successfully updated with {len(embeddings)} dimensional embedding")
-                success_count += 1
-            else:
-                print(f"  ✗ Failed to update document")
-                error_count += 1
-        else:
-            print(f"  ✗ Failed to generate embeddings")
-            error_count += 1
-        
-        # Rate limiting
-        time.sleep(0.5)  # Small delay between requests
+    results = embed_documents(documents)
     
     print(f"\n=== Summary ===")
-    print(f"Successfully processed: {success_count} documents")
-    print(f"Failed: {error_count} documents")
+    print(f"Successfully processed: {results['success']} documents")
+    print(f"Failed: {results['errors']} documents")
     print(f"Total: {len(documents)} documents")
+    METRICS.print_summary()
 
 def main():
     parser = argparse.ArgumentParser(description='Generate embeddings for documents in Azure Search')
     parser.add_argument('--client', type=str, help='Process only documents for a specific client')
     parser.add_argument('--dry-run', action='store_true', help='Show what would be processed without making changes')
     parser.add_argument('--force', action='store_true', help='Force regeneration of embeddings for all documents')
+    parser.add_argument('--daemon', action='store_true',
+                        help='Keep running and embed new uploads as they arrive (see embedding_daemon.py)')
+    parser.add_argument('--poll-interval', type=float, default=30.0,
+                        help='Daemon mode: seconds between index polls for new uploads')
+    parser.add_argument('--listen-port', type=int, default=None,
+                        help='Daemon mode: accept upload notifications on this local port')
+    parser.add_argument('--metrics-file', type=str, help='Write Prometheus text metrics to this file')
+    parser.add_argument('--trace-file', type=str, help='Append a JSON span per pipeline stage call to this file')
     
     args = parser.parse_args()
     
+    if args.trace_file:
+        METRICS.enable_tracing(args.trace_file)
+    
+    if args.daemon:
+        import embedding_daemon
+        embedding_daemon.run_daemon(poll_interval=args.poll_interval, listen_port=args.listen_port,
+                                    metrics_path=args.metrics_file)
+        return
+    
     process_documents(client=args.client, dry_run=args.dry_run, force=args.force)
+    
+    if args.metrics_file:
+        METRICS.write_prometheus(args.metrics_file)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Hybrid retrieval over the construction docs index.
+Runs a keyword query and vector queries against contentVector and blueprintVector concurrently,
+then fuses the ranked lists with reciprocal rank fusion or normalized weighted scores.
+"""
+
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional
+
+from search_cache import cached_search
+from query_embedding_cache import embed_query
+
+SEMANTIC_CONFIGURATION = "construction-semantic-config"
+DEFAULT_SELECT = "id,fileName,client,category"
+
+# Retrievers and the vector field each one searches (None = keyword)
+RETRIEVERS = {
+    "keyword": None,
+    "content": "contentVector",
+    "blueprint": "blueprintVector",
+}
+DEFAULT_WEIGHTS = {"keyword": 1.0, "content": 1.0, "blueprint": 1.0}
+
+# Rank constant from the original RRF paper; damps the advantage of the very top ranks
+RRF_K = 60
+
+def build_subquery(retriever: str, text: str, vector: Optional[List[float]], filter_query: str,
+                   select: str, k: int, semantic: bool = False) -> Dict[str, Any]:
+    """Search body for one retriever; every sub-query shares the filter and select."""
+    body = {"select": select, "top": k}
+    if filter_query:
+        body["filter"] = filter_query
+    field = RETRIEVERS[retriever]
+    if field is None:
+        body["search"] = text
+        if semantic:
+            body["queryType"] = "semantic"
+            body["semanticConfiguration"] = SEMANTIC_CONFIGURATION
+    else:
+        body["vectorQueries"] = [{"kind": "vector", "vector": vector, "fields": field, "k": k}]
+    return body
+
+def fuse_rrf(ranked: Dict[str, List[Dict[str, Any]]], weights: Dict[str, float]) -> Dict[str, float]:
+    """Reciprocal rank fusion: each list adds weight / (RRF_K + rank) for every document in it."""
+    scores = {}
+    for retriever, docs in ranked.items():
+        for rank, doc in enumerate(docs, 1):
+            scores[doc["id"]] = scores.get(doc["id"], 0.0) + weights.get(retriever, 1.0) / (RRF_K + rank)
+    return scores
+
+def fuse_weighted(ranked: Dict[str, List[Dict[str, Any]]], weights: Dict[str, float]) -> Dict[str, float]:
+    """
+    Weighted sum of min-max normalized scores. BM25 and cosine scores live on different
+    scales, so each list is rescaled to [0, 1] before weighting.
+    """
+    scores = {}
+    for retriever, docs in ranked.items():
+        raw = [doc.get("@search.score", 0.0) for doc in docs]
+        if not raw:
+            continue
+        low, high = min(raw), max(raw)
+        for doc, score in zip(docs, raw):
+            normalized = (score - low) / (high - low) if high > low else 1.0
+            scores[doc["id"]] = scores.get(doc["id"], 0.0) + weights.get(retriever, 1.0) * normalized
+    return scores
+
+FUSION_METHODS = {"rrf": fuse_rrf, "weighted": fuse_weighted}
+
+def hybrid_search(text: str, filter_query: str = None, select: str = DEFAULT_SELECT, top: int = 10,
+                  fusion: str = "rrf", weights: Dict[str, float] = None, k: int = 50,
+                  semantic: bool = False, retrievers: List[str] = None, client=None) -> Dict[str, Any]:
+    """
+    Run the sub-queries concurrently and return {"value": fused docs, "timings": ms per step}.
+
+    The keyword query starts while the query text is being embedded (or read from the query
+    embedding cache), so the wall time is max(keyword, embed + slowest vector query) rather
+    than the sum of all of them.
+    Each fused document carries "@hybrid.score" and "@hybrid.ranks" (rank per retriever).
+    """
+    weights = dict(DEFAULT_WEIGHTS, **(weights or {}))
+    retrievers = retrievers or list(RETRIEVERS)
+    timings = {}
+    start = time.perf_counter()
+
+    def run(retriever: str, vector: Optional[List[float]]) -> List[Dict[str, Any]]:
+        body = build_subquery(retriever, text, vector, filter_query, select, k, semantic)
+        sub_start = time.perf_counter()
+        response = cached_search(body, client=client)
+        timings[retriever] = (time.perf_counter() - sub_start) * 1000
+        return response.get("value", []) if response else []
+
+    with ThreadPoolExecutor(max_workers=len(retrievers) + 1) as executor:
+        futures = {}
+        if "keyword" in retrievers:
+            futures["keyword"] = executor.submit(run, "keyword", None)
+
+        vector_retrievers = [r for r in retrievers if RETRIEVERS[r] is not None]
+        if vector_retrievers:
+            embed_start = time.perf_counter()
+            vector = embed_query(text)
+            timings["embed"] = (time.perf_counter() - embed_start) * 1000
+            if vector:
+                for retriever in vector_retrievers:
+                    futures[retriever] = executor.submit(run, retriever, vector)
+            else:
+                print("  Could not embed the query text; using keyword results only")
+
+        ranked = {retriever: future.result() for retriever, future in futures.items()}
+
+    scores = FUSION_METHODS[fusion](ranked, weights)
+    documents = {}
+    for retriever, docs in ranked.items():
+        for rank, doc in enumerate(docs, 1):
+            fused = documents.setdefault(doc["id"], {key: value for key, value in doc.items()
+                                                     if not key.startswith("@search.")})
+            fused.setdefault("@hybrid.ranks", {})[retriever] = rank
+
+    ordered = sorted(documents.values(), key=lambda doc: scores[doc["id"]], reverse=True)[:top]
+    for doc in ordered:
+        doc["@hybrid.score"] = scores[doc["id"]]
+
+    timings["total"] = (time.perf_counter() - start) * 1000
+    return {"value": ordered, "timings": timings}
+
+def parse_weights(value: str) -> Dict[str, float]:
+    """Parse "keyword=1,content=0.5,blueprint=2"."""
+    weights = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in RETRIEVERS:
+            raise argparse.ArgumentTypeError(f"unknown retriever: {name.strip()}")
+        weights[name.strip()] = float(weight)
+    return weights
+
+def main():
+    parser = argparse.ArgumentParser(description='Hybrid keyword + vector search with result fusion')
+    parser.add_argument('query', type=str, help='Query text')
+    parser.add_argument('--filter', type=str, help='OData filter applied to every sub-query')
+    parser.add_argument('--select', type=str, default=DEFAULT_SELECT, help='Fields to return')
+    parser.add_argument('--top', type=int, default=10, help='Fused results to return')
+    parser.add_argument('--k', type=int, default=50, help='Candidates fetched per sub-query')
+    parser.add_argument('--fusion', choices=sorted(FUSION_METHODS), default='rrf')
+    parser.add_argument('--weights', type=parse_weights, help='Per-retriever weights, e.g. keyword=1,blueprint=2')
+    parser.add_argument('--retrievers', type=str, default=','.join(RETRIEVERS),
+                        help='Comma-separated subset of: ' + ', '.join(RETRIEVERS))
+    parser.add_argument('--semantic', action='store_true', help='Use the semantic ranker for the keyword query')
+    parser.add_argument('--json', action='store_true', help='Print the raw result as JSON')
+
+    args = parser.parse_args()
+
+    from search_benchmark import SEARCH_API_KEY
+    if not SEARCH_API_KEY:
+        print("Error: SEARCH_API_KEY environment variable not set")
+        sys.exit(1)
+
+    retrievers = [r.strip() for r in args.retrievers.split(",") if r.strip()]
+    unknown = [r for r in retrievers if r not in RETRIEVERS]
+    if unknown:
+        parser.error(f"unknown retrievers: {', '.join(unknown)}")
+
+    result = hybrid_search(args.query, filter_query=args.filter, select=args.select, top=args.top,
+                           fusion=args.fusion, weights=args.weights, k=args.k, semantic=args.semantic,
+                           retrievers=retrievers)
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+
+    for position, doc in enumerate(result["value"], 1):
+        ranks = ", ".join(f"{r}#{rank}" for r, rank in doc["@hybrid.ranks"].items())
+        print(f"{position:3}. {doc.get('fileName', doc['id'])}  score={doc['@hybrid.score']:.4f}  ({ranks})")
+    print("\nTimings (ms): " + ", ".join(f"{name}={ms:.1f}" for name, ms in result["timings"].items()))
+
+if __name__ == "__main__":
+    main()
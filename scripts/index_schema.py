@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""
+Declarative schema for the search index.
+Describes the fields, semantic configuration, vector search and suggesters the index should have,
+diffs that against the live definition, applies every in-place change in a single PUT and records
+each migration in a local history file.
+Supersedes running add_blueprint_fields.py, add_project_field.py and setup_semantic_configuration.py
+one after another.
+"""
+
+import os
+import sys
+import copy
+import json
+import hashlib
+import argparse
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Optional
+
+import requests
+
+import search_config
+
+# Configuration
+SEARCH_ENDPOINT = os.environ.get("SEARCH_ENDPOINT", "https://fcssearchservice.search.windows.net")
+SEARCH_API_KEY = os.environ.get("SEARCH_API_KEY", "")
+SEARCH_INDEX_NAME = search_config.SEARCH_INDEX_NAME
+API_VERSION = "2023-11-01"
+
+DEFAULT_HISTORY_PATH = "index-schema-history.jsonl"
+
+def _string_field(name: str, collection: bool = False, searchable: bool = True, sortable: bool = None,
+                  facetable: bool = True, analyzer: str = None) -> Dict[str, Any]:
+    field = {
+        "name": name,
+        "type": "Collection(Edm.String)" if collection else "Edm.String",
+        "searchable": searchable,
+        "filterable": True,
+        "sortable": (not collection) if sortable is None else sortable,
+        "facetable": facetable,
+        "retrievable": True,
+    }
+    if analyzer:
+        field["analyzer"] = analyzer
+    return field
+
+# Fields this module manages. Fields on the live index that aren't listed here are left alone;
+# only the attributes given here are compared.
+FIELDS = [
+    # Blueprint extraction (add_blueprint_fields.py)
+    _string_field("dimensions", collection=True, analyzer="standard.lucene"),
+    _string_field("materials", collection=True, analyzer="standard.lucene"),
+    _string_field("specifications", collection=True, analyzer="standard.lucene"),
+    _string_field("roomNumbers", collection=True),
+    _string_field("measurements", collection=True, facetable=False),
+    _string_field("drawingScale"),
+    _string_field("sheetNumber"),
+    _string_field("drawingType"),
+    _string_field("revision", searchable=False),
+    _string_field("standardsCodes", collection=True),
+    _string_field("fireRatings", collection=True),
+    _string_field("structuralMembers", collection=True),
+    {"name": "ocrConfidence", "type": "Edm.Double", "searchable": False, "filterable": True,
+     "sortable": True, "facetable": False, "retrievable": True},
+    {"name": "hasHandwrittenText", "type": "Edm.Boolean", "searchable": False, "filterable": True,
+     "sortable": True, "facetable": True, "retrievable": True},
+    {"name": "hasBlueprintData", "type": "Edm.Boolean", "searchable": False, "filterable": True,
+     "sortable": False, "facetable": True, "retrievable": True},
+    {"name": "blueprintVector", "type": "Collection(Edm.Single)", "searchable": True, "filterable": False,
+     "sortable": False, "facetable": False, "retrievable": False, "dimensions": 1536,
+     "vectorSearchProfile": "construction-vector-profile"},
+    # Project tracking (add_project_field.py)
+    _string_field("projectName", analyzer="standard.lucene"),
+    _string_field("projectId", searchable=False),
+    _string_field("projectPhase"),
+    _string_field("documentStatus", searchable=False),
+    _string_field("version", searchable=False, facetable=False),
+    _string_field("tags", collection=True),
+]
+
+SEMANTIC = {
+    "defaultConfiguration": "construction-semantic-config",
+    "configurations": [
+        {
+            "name": "construction-semantic-config",
+            "prioritizedFields": {
+                "titleField": {"fieldName": "fileName"},
+                "prioritizedContentFields": [{"fieldName": "content"}],
+                "prioritizedKeywordsFields": [
+                    {"fieldName": name} for name in (
+                        "category", "client", "projectName", "dimensions", "materials", "specifications",
+                        "sheetNumber", "drawingType", "standardsCodes", "structuralMembers",
+                    )
+                ],
+            },
+        }
+    ],
+}
+
+VECTOR_SEARCH = {
+    "algorithms": [
+        {
+            "name": "construction-hnsw",
+            "kind": "hnsw",
+            "hnswParameters": {"metric": "cosine", "m": 4, "efConstruction": 400, "efSearch": 150},
+        }
+    ],
+    "profiles": [
+        {"name": "construction-vector-profile", "algorithm": "construction-hnsw"},
+    ],
+}
+
+SUGGESTERS = [
+    {"name": "blueprint-suggester", "searchMode": "analyzingInfixMatching",
+     "sourceFields": ["materials", "specifications", "drawingType", "sheetNumber"]},
+]
+
+# Field attributes the service lets you change on an existing field
+MUTABLE_FIELD_ATTRIBUTES = {"retrievable", "searchAnalyzer", "synonymMaps"}
+
+# HNSW parameters that can change without rebuilding the graph
+MUTABLE_HNSW_PARAMETERS = {"efSearch"}
+
+def desired_schema() -> Dict[str, Any]:
+    return {"fields": FIELDS, "semantic": SEMANTIC, "vectorSearch": VECTOR_SEARCH, "suggesters": SUGGESTERS}
+
+def schema_hash(schema: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(schema, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+def _differences(desired: Dict[str, Any], live: Dict[str, Any]) -> Dict[str, Any]:
+    """Keys of `desired` whose value differs on `live`, as {key: (live, desired)}."""
+    return {key: (live.get(key), value) for key, value in desired.items() if live.get(key) != value}
+
+def diff_schema(live: Dict[str, Any], desired: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Operations that turn the live index into the desired one.
+
+    Each is {"op", "target", "changes", "rebuild"}; rebuild is True when the service can't make
+    the change in place (it then needs a new index and a reindex).
+    """
+    operations = []
+    live_fields = {field["name"]: field for field in live.get("fields", [])}
+    new_fields = set()
+
+    for field in desired.get("fields", []):
+        current = live_fields.get(field["name"])
+        if current is None:
+            operations.append({"op": "add_field", "target": field["name"], "changes": field, "rebuild": False})
+            new_fields.add(field["name"])
+            continue
+        changes = _differences(field, current)
+        if changes:
+            operations.append({"op": "update_field", "target": field["name"], "changes": changes,
+                               "rebuild": bool(set(changes) - MUTABLE_FIELD_ATTRIBUTES)})
+
+    live_semantic = live.get("semantic") or {}
+    live_configs = {c["name"]: c for c in live_semantic.get("configurations", [])}
+    for config in desired.get("semantic", {}).get("configurations", []):
+        if live_configs.get(config["name"]) != config:
+            operations.append({"op": "set_semantic_configuration", "target": config["name"],
+                               "changes": config, "rebuild": False})
+    default = desired.get("semantic", {}).get("defaultConfiguration")
+    if default and live_semantic.get("defaultConfiguration") != default:
+        operations.append({"op": "set_default_semantic_configuration", "target": default,
+                           "changes": default, "rebuild": False})
+
+    live_vector = live.get("vectorSearch") or {}
+    live_algorithms = {a["name"]: a for a in live_vector.get("algorithms", [])}
+    for algorithm in desired.get("vectorSearch", {}).get("algorithms", []):
+        current = live_algorithms.get(algorithm["name"])
+        if current is None:
+            operations.append({"op": "add_vector_algorithm", "target": algorithm["name"],
+                               "changes": algorithm, "rebuild": False})
+            continue
+        changes = _differences(algorithm.get("hnswParameters", {}), current.get("hnswParameters") or {})
+        if changes or current.get("kind") != algorithm["kind"]:
+            operations.append({"op": "update_vector_algorithm", "target": algorithm["name"], "changes": changes,
+                               "rebuild": current.get("kind") != algorithm["kind"]
+                               or bool(set(changes) - MUTABLE_HNSW_PARAMETERS)})
+
+    live_profiles = {p["name"]: p for p in live_vector.get("profiles", [])}
+    for profile in desired.get("vectorSearch", {}).get("profiles", []):
+        current = live_profiles.get(profile["name"])
+        if current is None:
+            operations.append({"op": "add_vector_profile", "target": profile["name"],
+                               "changes": profile, "rebuild": False})
+        elif _differences(profile, current):
+            operations.append({"op": "update_vector_profile", "target": profile["name"],
+                               "changes": _differences(profile, current), "rebuild": True})
+
+    live_suggesters = {s["name"]: s for s in live.get("suggesters") or []}
+    for suggester in desired.get("suggesters", []):
+        current = live_suggesters.get(suggester["name"])
+        if current is not None and current.get("searchMode") == suggester["searchMode"] \
+                and set(current.get("sourceFields", [])) == set(suggester["sourceFields"]):
+            continue
+        # A suggester can only be created or extended over fields added in the same update
+        existing_sources = set(suggester["sourceFields"]) - set(current.get("sourceFields", []) if current else [])
+        operations.append({"op": "add_suggester" if current is None else "update_suggester",
+                           "target": suggester["name"], "changes": suggester,
+                           "rebuild": current is not None or bool(existing_sources - new_fields)})
+
+    return operations
+
+def apply_operations(index_def: Dict[str, Any], operations: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Return a copy of the index definition with the given operations applied."""
+    updated = copy.deepcopy(index_def)
+    fields = {field["name"]: field for field in updated.setdefault("fields", [])}
+    semantic = updated.get("semantic") or {}
+    updated["semantic"] = semantic
+    vector = updated.get("vectorSearch") or {}
+    updated["vectorSearch"] = vector
+    suggesters = updated.get("suggesters") or []
+    updated["suggesters"] = suggesters
+
+    def replace_named(items: List[Dict[str, Any]], item: Dict[str, Any]) -> None:
+        for i, existing in enumerate(items):
+            if existing["name"] == item["name"]:
+                items[i] = copy.deepcopy(item)
+                return
+        items.append(copy.deepcopy(item))
+
+    for op in operations:
+        kind, target, changes = op["op"], op["target"], op["changes"]
+        if kind == "add_field":
+            updated["fields"].append(copy.deepcopy(changes))
+        elif kind == "update_field":
+            fields[target].update({key: new for key, (_, new) in changes.items()})
+        elif kind == "set_semantic_configuration":
+            replace_named(semantic.setdefault("configurations", []), changes)
+        elif kind == "set_default_semantic_configuration":
+            semantic["defaultConfiguration"] = changes
+        elif kind == "add_vector_algorithm":
+            replace_named(vector.setdefault("algorithms", []), changes)
+        elif kind == "update_vector_algorithm":
+            algorithm = next(a for a in vector["algorithms"] if a["name"] == target)
+            algorithm.setdefault("hnswParameters", {}).update({key: new for key, (_, new) in changes.items()})
+        elif kind in ("add_vector_profile", "update_vector_profile"):
+            replace_named(vector.setdefault("profiles", []), changes if kind == "add_vector_profile"
+                          else dict(next(p for p in vector["profiles"] if p["name"] == target),
+                                    **{key: new for key, (_, new) in changes.items()}))
+        elif kind in ("add_suggester", "update_suggester"):
+            replace_named(suggesters, changes)
+    return updated
+
+def get_index(index_name: str = SEARCH_INDEX_NAME) -> Optional[Dict[str, Any]]:
+    """Get the live index definition."""
+    url = f"{SEARCH_ENDPOINT}/indexes/{search_config.resolve_index_name(index_name)}?api-version={API_VERSION}"
+    response = requests.get(url, headers={"api-key": SEARCH_API_KEY})
+    if response.status_code == 200:
+        return response.json()
+    print(f"Error fetching index: {response.status_code} - {response.text}")
+    return None
+
+def put_index(index_def: Dict[str, Any], index_name: str = SEARCH_INDEX_NAME) -> bool:
+    """PUT the definition, failing if the index changed since it was read (ETag match)."""
+    url = (f"{SEARCH_ENDPOINT}/indexes/{search_config.resolve_index_name(index_name)}"
+           f"?api-version={API_VERSION}&allowIndexDowntime=false")
+    headers = {
+        "api-key": SEARCH_API_KEY,
+        "Content-Type": "application/json",
+        "Prefer": "return=minimal"
+    }
+    if index_def.get("@odata.etag"):
+        headers["If-Match"] = index_def["@odata.etag"]
+    response = requests.put(url, headers=headers, json=index_def)
+    if response.status_code in [200, 201, 204]:
+        return True
+    print(f"Error updating index: {response.status_code} - {response.text}")
+    return False
+
+def load_history(path: str = DEFAULT_HISTORY_PATH) -> List[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def record_migration(operations: List[Dict[str, Any]], index_name: str,
+                     path: str = DEFAULT_HISTORY_PATH) -> Dict[str, Any]:
+    history = load_history(path)
+    entry = {
+        "version": (history[-1]["version"] + 1) if history else 1,
+        "appliedAt": datetime.now(timezone.utc).isoformat(),
+        "index": index_name,
+        "schemaHash": schema_hash(desired_schema()),
+        "operations": [{"op": op["op"], "target": op["target"]} for op in operations],
+    }
+    with open(path, "a") as f:
+        f.write(json.dumps(entry) + "\n")
+    return entry
+
+def describe(op: Dict[str, Any]) -> str:
+    note = "  (needs rebuild)" if op["rebuild"] else ""
+    if op["op"] in ("update_field", "update_vector_algorithm", "update_vector_profile"):
+        detail = ", ".join(f"{key}: {old!r} -> {new!r}" for key, (old, new) in op["changes"].items())
+        return f"{op['op']:<36} {op['target']}  [{detail}]{note}"
+    return f"{op['op']:<36} {op['target']}{note}"
+
+def migrate(index_name: str = SEARCH_INDEX_NAME, dry_run: bool = False,
+            history_path: str = DEFAULT_HISTORY_PATH) -> bool:
+    """Bring the live index up to the desired schema; returns False on failure."""
+    live = get_index(index_name)
+    if live is None:
+        return False
+
+    operations = diff_schema(live, desired_schema())
+    if not operations:
+        print(f"✓ {index_name} already matches the desired schema ({schema_hash(desired_schema())})")
+        return True
+
+    in_place = [op for op in operations if not op["rebuild"]]
+    blocked = [op for op in operations if op["rebuild"]]
+    print(f"{len(operations)} changes for {index_name}:")
+    for op in operations:
+        print(f"  {describe(op)}")
+
+    if blocked:
+        print(f"\n⚠ {len(blocked)} changes can't be made in place and are skipped; they need a new index")
+    if dry_run or not in_place:
+        return not blocked
+
+    print(f"\nApplying {len(in_place)} changes in one update...")
+    if not put_index(apply_operations(live, in_place), index_name):
+        return False
+    entry = record_migration(in_place, index_name, history_path)
+    print(f"✓ Recorded migration v{entry['version']} in {history_path}")
+    return not blocked
+
+def main():
+    parser = argparse.ArgumentParser(description='Diff and migrate the search index schema')
+    parser.add_argument('--index', default=SEARCH_INDEX_NAME, help='Index to migrate')
+    parser.add_argument('--dry-run', action='store_true', help='Show the diff without applying it')
+    parser.add_argument('--history', default=DEFAULT_HISTORY_PATH, help='Migration history file (JSON lines)')
+    parser.add_argument('--show-history', action='store_true', help='List past migrations and exit')
+    parser.add_argument('--print-schema', action='store_true', help='Print the desired schema as JSON and exit')
+
+    args = parser.parse_args()
+
+    if args.print_schema:
+        print(json.dumps(desired_schema(), indent=2))
+        return
+
+    if args.show_history:
+        for entry in load_history(args.history):
+            print(f"v{entry['version']}  {entry['appliedAt']}  {entry['index']}  schema {entry['schemaHash']}  "
+                  f"{len(entry['operations'])} changes")
+        return
+
+    if not SEARCH_API_KEY:
+        print("Error: SEARCH_API_KEY environment variable not set")
+        sys.exit(1)
+
+    if not migrate(args.index, dry_run=args.dry_run, history_path=args.history):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
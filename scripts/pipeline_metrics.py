@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Metrics and tracing for the embedding pipelines.
+Records per-stage latency histograms, item/byte/token counters, retries and cache hit rates,
+and writes them as Prometheus text; each stage call can also be written as a span to a JSONL file.
+"""
+
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, Tuple
+
+# Latency histogram bucket bounds, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Pipeline stages, in order
+STAGES = ("fetch", "text_build", "embed", "index_write")
+
+class Span:
+    """A single timed stage call; attributes are free-form, bytes/tokens feed the counters."""
+
+    def __init__(self, stage: str, attributes: Dict[str, Any]):
+        self.stage = stage
+        self.attributes = dict(attributes)
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.tokens = 0
+        self.items = 1
+        self.error = None
+
+    def add_bytes(self, sent: int = 0, received: int = 0) -> None:
+        self.bytes_sent += sent
+        self.bytes_received += received
+
+    def add_tokens(self, tokens: int) -> None:
+        self.tokens += tokens
+
+    def set_items(self, items: int) -> None:
+        self.items = items
+
+    def add_response(self, response) -> None:
+        """Count the bytes of a requests response and of the request that produced it."""
+        body = response.request.body if getattr(response, "request", None) is not None else None
+        self.add_bytes(sent=len(body) if body else 0, received=len(response.content))
+        if response.status_code >= 400:
+            self.fail(f"HTTP {response.status_code}")
+
+    def fail(self, error: str) -> None:
+        """Mark the call as failed without raising."""
+        self.error = error
+
+class PipelineMetrics:
+    """Thread-safe registry of pipeline metrics."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.trace_id = os.urandom(16).hex()
+        self._trace_file = None
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.histograms: Dict[str, list] = {}
+            self.durations: Dict[str, float] = {}
+            self.calls: Dict[str, int] = {}
+            self.errors: Dict[str, int] = {}
+            self.items: Dict[str, int] = {}
+            self.bytes: Dict[Tuple[str, str], int] = {}
+            self.tokens = 0
+            self.retries: Dict[str, int] = {}
+            self.cache: Dict[Tuple[str, str], int] = {}
+            self.started = time.time()
+
+    def enable_tracing(self, path: str) -> None:
+        """Append one JSON span per stage call to the given file."""
+        self._trace_file = open(path, "a", buffering=1)
+
+    @contextmanager
+    def stage(self, stage: str, **attributes):
+        """Time a stage call; errors are recorded and re-raised."""
+        span = Span(stage, attributes)
+        start_wall = time.time()
+        start = time.perf_counter()
+        try:
+            yield span
+        except Exception as e:
+            span.error = str(e)
+            raise
+        finally:
+            self._record(span, time.perf_counter() - start, start_wall)
+
+    def _record(self, span: Span, elapsed: float, start_wall: float) -> None:
+        stage = span.stage
+        with self._lock:
+            buckets = self.histograms.setdefault(stage, [0] * (len(LATENCY_BUCKETS) + 1))
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if elapsed <= bound:
+                    buckets[i] += 1
+                    break
+            else:
+                buckets[-1] += 1
+            self.durations[stage] = self.durations.get(stage, 0.0) + elapsed
+            self.calls[stage] = self.calls.get(stage, 0) + 1
+            self.items[stage] = self.items.get(stage, 0) + span.items
+            if span.error:
+                self.errors[stage] = self.errors.get(stage, 0) + 1
+            for direction, count in (("sent", span.bytes_sent), ("received", span.bytes_received)):
+                if count:
+                    self.bytes[(stage, direction)] = self.bytes.get((stage, direction), 0) + count
+            self.tokens += span.tokens
+
+        if self._trace_file:
+            record = {
+                "traceId": self.trace_id,
+                "spanId": os.urandom(8).hex(),
+                "name": stage,
+                "startTimeUnixNano": int(start_wall * 1e9),
+                "endTimeUnixNano": int((start_wall + elapsed) * 1e9),
+                "attributes": dict(span.attributes, items=span.items, bytesSent=span.bytes_sent,
+                                   bytesReceived=span.bytes_received, tokens=span.tokens),
+                "status": {"code": "ERROR", "message": span.error} if span.error else {"code": "OK"},
+            }
+            self._trace_file.write(json.dumps(record) + "\n")
+
+    def count_retry(self, stage: str) -> None:
+        with self._lock:
+            self.retries[stage] = self.retries.get(stage, 0) + 1
+
+    def count_cache(self, cache: str, hit: bool) -> None:
+        key = (cache, "hit" if hit else "miss")
+        with self._lock:
+            self.cache[key] = self.cache.get(key, 0) + 1
+
+    def _bucket_counts(self, stage: str) -> list:
+        """Cumulative histogram counts, Prometheus-style."""
+        counts, total = [], 0
+        for count in self.histograms[stage]:
+            total += count
+            counts.append(total)
+        return counts
+
+    def percentile(self, stage: str, q: float) -> Optional[float]:
+        """Approximate a latency percentile from the histogram (upper bucket bound)."""
+        if stage not in self.histograms:
+            return None
+        counts = self._bucket_counts(stage)
+        target = q * counts[-1]
+        for bound, count in zip(LATENCY_BUCKETS + (float("inf"),), counts):
+            if count >= target:
+                return bound
+        return None
+
+    def to_prometheus(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            lines.append("# HELP pipeline_stage_duration_seconds Latency of each pipeline stage call")
+            lines.append("# TYPE pipeline_stage_duration_seconds histogram")
+            for stage in sorted(self.histograms):
+                counts = self._bucket_counts(stage)
+                for bound, count in zip(LATENCY_BUCKETS + (float("inf"),), counts):
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'pipeline_stage_duration_seconds_bucket{{stage="{stage}",le="{le}"}} {count}')
+                lines.append(f'pipeline_stage_duration_seconds_sum{{stage="{stage}"}} {self.durations[stage]:.6f}')
+                lines.append(f'pipeline_stage_duration_seconds_count{{stage="{stage}"}} {self.calls[stage]}')
+
+            lines.append("# HELP pipeline_items_total Items handled by each stage")
+            lines.append("# TYPE pipeline_items_total counter")
+            for stage, count in sorted(self.items.items()):
+                lines.append(f'pipeline_items_total{{stage="{stage}"}} {count}')
+
+            lines.append("# HELP pipeline_errors_total Failed stage calls")
+            lines.append("# TYPE pipeline_errors_total counter")
+            for stage, count in sorted(self.errors.items()):
+                lines.append(f'pipeline_errors_total{{stage="{stage}"}} {count}')
+
+            lines.append("# HELP pipeline_bytes_total Bytes transferred by each stage")
+            lines.append("# TYPE pipeline_bytes_total counter")
+            for (stage, direction), count in sorted(self.bytes.items()):
+                lines.append(f'pipeline_bytes_total{{stage="{stage}",direction="{direction}"}} {count}')
+
+            lines.append("# HELP pipeline_tokens_total Embedding tokens consumed")
+            lines.append("# TYPE pipeline_tokens_total counter")
+            lines.append(f"pipeline_tokens_total {self.tokens}")
+
+            lines.append("# HELP pipeline_retries_total Retried operations")
+            lines.append("# TYPE pipeline_retries_total counter")
+            for stage, count in sorted(self.retries.items()):
+                lines.append(f'pipeline_retries_total{{stage="{stage}"}} {count}')
+
+            lines.append("# HELP pipeline_cache_requests_total Cache lookups by result")
+            lines.append("# TYPE pipeline_cache_requests_total counter")
+            for (cache, result), count in sorted(self.cache.items()):
+                lines.append(f'pipeline_cache_requests_total{{cache="{cache}",result="{result}"}} {count}')
+
+            lines.append("# HELP pipeline_run_duration_seconds Wall time since the metrics were reset")
+            lines.append("# TYPE pipeline_run_duration_seconds gauge")
+            lines.append(f"pipeline_run_duration_seconds {time.time() - self.started:.3f}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str) -> None:
+        """Write the metrics atomically, e.g. for node_exporter's textfile collector."""
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp_path, path)
+
+    def print_summary(self) -> None:
+        """Print a per-stage breakdown of where the time went."""
+        wall = time.time() - self.started
+        print("\nPipeline stages:")
+        print(f"  {'stage':<12} {'calls':>7} {'items':>7} {'total s':>9} {'p50':>7} {'p95':>7} {'p99':>7} "
+              f"{'items/s':>8} {'MB':>8} {'errors':>6}")
+        ordered = [s for s in STAGES if s in self.calls] + sorted(set(self.calls) - set(STAGES))
+        for stage in ordered:
+            transferred = sum(count for (s, _), count in self.bytes.items() if s == stage) / 1e6
+            print(f"  {stage:<12} {self.calls[stage]:>7} {self.items[stage]:>7} {self.durations[stage]:>9.2f} "
+                  f"{self.percentile(stage, 0.5):>7} {self.percentile(stage, 0.95):>7} "
+                  f"{self.percentile(stage, 0.99):>7} {self.items[stage] / wall if wall else 0:>8.2f} "
+                  f"{transferred:>8.2f} {self.errors.get(stage, 0):>6}")
+        if self.tokens:
+            print(f"  Tokens consumed: {self.tokens}")
+        if self.retries:
+            print(f"  Retries: " + ", ".join(f"{s}={n}" for s, n in sorted(self.retries.items())))
+        caches = sorted({cache for cache, _ in self.cache})
+        for cache in caches:
+            hits = self.cache.get((cache, "hit"), 0)
+            misses = self.cache.get((cache, "miss"), 0)
+            print(f"  Cache {cache}: {hits}/{hits + misses} hits ({hits / (hits + misses):.0%})")
+
+# Process-wide registry used by the pipeline scripts
+METRICS = PipelineMetrics()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Fill the blueprint fields (dimensions, materials, standardsCodes, fireRatings, structuralMembers,
+roomNumbers, drawingScale) from document content with the local blueprint extractor.
+Content is pulled in batches, extracted in-process and merged back with bulk index requests.
+"""
+
+import os
+import sys
+import json
+import argparse
+from typing import List, Dict, Any
+
+import search_config
+import generate_embeddings_for_new_docs as embeddings
+from pipeline_metrics import METRICS
+from search_cache import SEARCH_CACHE
+from facet_cache import FacetCache, PROJECT_FIELD, refresh_documents
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Backup Azure-functions"))
+from blueprint_extractor import BlueprintExtractor
+
+LIST_FIELDS = f"{embeddings.METADATA_FIELDS},{PROJECT_FIELD}"
+
+# Documents per merge request (the service allows up to 1000)
+WRITE_BATCH_SIZE = 500
+
+def merge_documents(updates: List[Dict[str, Any]]) -> List[str]:
+    """Merge extracted fields into the index in one request; returns the ids that were written."""
+    url = f"{embeddings.SEARCH_ENDPOINT}/indexes/{search_config.index_name()}/docs/index?api-version=2023-11-01"
+    body = {"value": [dict(update, **{"@search.action": "merge"}) for update in updates]}
+    with METRICS.stage("index_write", operation="blueprint_fields") as span:
+        response = embeddings.get_session().post(url, headers={"api-key": embeddings.SEARCH_API_KEY}, json=body)
+        span.add_response(response)
+        span.set_items(len(updates))
+    if response.status_code == 200:
+        return [update["id"] for update in updates]
+    if response.status_code == 207:
+        results = response.json().get("value", [])
+        for result in results:
+            if not result.get("status"):
+                print(f"  ✗ {result['key']}: {result.get('errorMessage')}")
+        return [result["key"] for result in results if result.get("status")]
+    print(f"  ✗ Merge failed: {response.status_code} - {response.text[:300]}")
+    return []
+
+def populate(filter_query: str = None, dry_run: bool = False, facet_db: str = None,
+             write_batch: int = WRITE_BATCH_SIZE) -> Dict[str, int]:
+    extractor = BlueprintExtractor()
+    facets = FacetCache(facet_db) if facet_db else None
+    documents = list(embeddings.iter_documents(filter_query, select=LIST_FIELDS))
+    print(f"Extracting blueprint fields from {len(documents)} documents...")
+
+    results = {"documents": len(documents), "with_data": 0, "written": 0, "fetch_errors": 0}
+    pending = []
+
+    def flush() -> None:
+        if not pending:
+            return
+        written = merge_documents([update for update, _ in pending])
+        results["written"] += len(written)
+        written_ids = set(written)
+        for client in {doc.get("client") for update, doc in pending if update["id"] in written_ids}:
+            SEARCH_CACHE.invalidate_scope(client=client)
+        if facets and written:
+            # Re-read what was written, so facets the extractor doesn't produce are kept
+            refresh_documents(facets, written)
+        print(f"  {results['written']} documents updated")
+        pending.clear()
+
+    for start in range(0, len(documents), embeddings.CONTENT_BATCH_SIZE):
+        batch = documents[start:start + embeddings.CONTENT_BATCH_SIZE]
+        fetched = list(embeddings.fetch_document_content([doc["id"] for doc in batch]))
+        # Content that couldn't be fetched isn't "no blueprint data"; leave those documents alone
+        failed = {item["id"] for item in fetched if embeddings.FETCH_ERROR in item}
+        results["fetch_errors"] += len(failed)
+        contents = {item["id"]: item.get("content") or "" for item in fetched if item["id"] not in failed}
+        batch = [doc for doc in batch if doc["id"] not in failed]
+        with METRICS.stage("extract") as span:
+            span.set_items(len(batch))
+            extracted = [(doc, extractor.extract(contents.get(doc["id"], ""))) for doc in batch]
+
+        for doc, fields in extracted:
+            if not extractor.has_blueprint_data(fields):
+                continue
+            results["with_data"] += 1
+            # A merge overwrites every field it names, so empty results would erase existing values
+            found = {name: values for name, values in fields.items() if values not in (None, [], "")}
+            update = dict(found, id=doc["id"], hasBlueprintData=True)
+            if dry_run:
+                print(f"  {doc.get('fileName', doc['id'])}: {json.dumps(found)[:200]}")
+                continue
+            pending.append((update, doc))
+            if len(pending) >= write_batch:
+                flush()
+
+    if not dry_run:
+        flush()
+    if facets:
+        facets.close()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='Populate blueprint fields from document content')
+    parser.add_argument('--client', type=str, help='Only documents for this client')
+    parser.add_argument('--filter', type=str, help='OData filter selecting the documents')
+    parser.add_argument('--dry-run', action='store_true', help='Print what would be written')
+    parser.add_argument('--facet-db', type=str, help='Also update this facet_cache.py database')
+    parser.add_argument('--write-batch', type=int, default=WRITE_BATCH_SIZE, help='Documents per merge request')
+    parser.add_argument('--metrics-file', type=str, help='Write Prometheus text metrics to this file')
+
+    args = parser.parse_args()
+
+    if not embeddings.SEARCH_API_KEY:
+        print("Error: SEARCH_API_KEY environment variable not set")
+        sys.exit(1)
+
+    filters = []
+    if args.client:
+        filters.append("client eq '{}'".format(args.client.replace("'", "''")))
+    if args.filter:
+        filters.append(f"({args.filter})")
+
+    results = populate(" and ".join(filters) or None, dry_run=args.dry_run, facet_db=args.facet_db,
+                       write_batch=args.write_batch)
+
+    print(f"\n=== Summary ===")
+    print(f"Documents scanned: {results['documents']}")
+    print(f"With blueprint data: {results['with_data']}")
+    print(f"Updated: {results['written']}")
+    if results["fetch_errors"]:
+        print(f"⚠ Content could not be fetched for {results['fetch_errors']} documents; re-run to retry them")
+    METRICS.print_summary()
+    if args.metrics_file:
+        METRICS.write_prometheus(args.metrics_file)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Cache of query-text embeddings.
+Vector searches embed the query text first; this keeps those vectors in an in-memory LRU backed
+by a local SQLite store, keyed on normalized text, and can be pre-warmed from query logs and the
+blueprint vocabulary so common questions never wait on the embeddings endpoint.
+"""
+
+import re
+import sys
+import json
+import time
+import array
+import sqlite3
+import hashlib
+import argparse
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Iterable
+
+import search_config
+import generate_embeddings_for_new_docs as embeddings
+from pipeline_metrics import METRICS
+
+DEFAULT_DB_PATH = "query-embeddings.db"
+DEFAULT_MEMORY_ENTRIES = 4096
+
+# Facetable index fields whose values make up the blueprint vocabulary
+VOCABULARY_FIELDS = ["materials", "standardsCodes", "structuralMembers", "fireRatings"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS query_embeddings (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    text TEXT NOT NULL,
+    vector BLOB NOT NULL,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+_TRAILING_PUNCTUATION = re.compile(r"[\s?!.,;:]+$")
+
+def normalize_query(text: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation ("Steel beams?" == "steel beams")."""
+    return _TRAILING_PUNCTUATION.sub("", " ".join(text.lower().split()))
+
+class QueryEmbeddingCache:
+    """Two-tier (memory LRU, then SQLite) cache of query embeddings."""
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, memory_entries: int = DEFAULT_MEMORY_ENTRIES,
+                 model: str = embeddings.EMBEDDING_MODEL):
+        self.model = model
+        self.memory_entries = memory_entries
+        self._memory: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def key(self, text: str) -> str:
+        # The model is part of the key so switching deployments never serves stale vectors
+        return hashlib.sha256(f"{self.model}\0{normalize_query(text)}".encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, vector: List[float]) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, text: str) -> Optional[List[float]]:
+        """Cached vector for this query text, from memory or disk, or None."""
+        key = self.key(text)
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                METRICS.count_cache("query_embedding_memory", hit=True)
+                return vector
+            METRICS.count_cache("query_embedding_memory", hit=False)
+
+            row = self.conn.execute("SELECT vector FROM query_embeddings WHERE key = ?", (key,)).fetchone()
+            METRICS.count_cache("query_embedding_disk", hit=row is not None)
+            if row is None:
+                return None
+            vector = array.array("f", row[0]).tolist()
+            self.conn.execute("UPDATE query_embeddings SET last_used = ?, hits = hits + 1 WHERE key = ?",
+                              (time.time(), key))
+            self._remember(key, vector)
+            return vector
+
+    def put(self, text: str, vector: List[float]) -> None:
+        key = self.key(text)
+        now = time.time()
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO query_embeddings (key, model, text, vector, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, self.model, normalize_query(text), array.array("f", vector).tobytes(), now, now))
+            self._remember(key, vector)
+
+    def contains(self, text: str) -> bool:
+        key = self.key(text)
+        with self._lock:
+            if key in self._memory:
+                return True
+            return self.conn.execute("SELECT 1 FROM query_embeddings WHERE key = ?", (key,)).fetchone() is not None
+
+    def embed(self, text: str) -> Optional[List[float]]:
+        """Vector for the query text, calling the embeddings endpoint only on a miss."""
+        vector = self.get(text)
+        if vector is None:
+            # Embed the normalized form so every spelling that maps to this key gets the same vector
+            vector = embeddings.generate_embeddings(normalize_query(text))
+            if vector:
+                self.put(text, vector)
+        return vector
+
+    def prewarm(self, texts: Iterable[str], delay: float = embeddings.REQUEST_DELAY) -> Dict[str, int]:
+        """Embed every text that isn't cached yet."""
+        results = {"cached": 0, "embedded": 0, "failed": 0}
+        seen = set()
+        for text in texts:
+            normalized = normalize_query(text)
+            if not normalized or normalized in seen:
+                continue
+            seen.add(normalized)
+            if self.contains(text):
+                results["cached"] += 1
+                continue
+            if self.embed(text):
+                results["embedded"] += 1
+            else:
+                results["failed"] += 1
+            time.sleep(delay)
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            row = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(hits), 0) FROM query_embeddings").fetchone()
+            return {"memory_entries": len(self._memory), "disk_entries": row[0], "disk_hits": row[1]}
+
+_default_cache = None
+
+def embed_query(text: str) -> Optional[List[float]]:
+    """Embed query text through the default cache (opened on first use)."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = QueryEmbeddingCache()
+    return _default_cache.embed(text)
+
+def load_query_log(path: str, limit: int = None) -> List[str]:
+    """
+    Query texts from a log, most frequent first. Lines are either plain text or JSON objects
+    with a "query" or "search" key.
+    """
+    counts = {}
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                entry = json.loads(line)
+                line = entry.get("query") or entry.get("search") or ""
+            if line and line != "*":
+                counts[line] = counts.get(line, 0) + 1
+    ordered = sorted(counts, key=counts.get, reverse=True)
+    return ordered[:limit] if limit else ordered
+
+def blueprint_vocabulary(fields: List[str] = VOCABULARY_FIELDS, per_field: int = 200) -> List[str]:
+    """The most common values of the blueprint fields, from facet queries."""
+    params = {
+        "api-version": "2021-04-30-Preview",
+        "facet": [f"{field},count:{per_field}" for field in fields],
+        "$top": 0
+    }
+    response = embeddings.get_session().get(
+        f"{embeddings.SEARCH_ENDPOINT}/indexes/{search_config.index_name()}/docs",
+        params=params, headers={"api-key": embeddings.SEARCH_API_KEY})
+    if response.status_code != 200:
+        print(f"Error fetching vocabulary: {response.status_code} - {response.text}")
+        return []
+    facets = response.json().get("@search.facets", {})
+    return [facet["value"] for field in fields for facet in facets.get(field, [])]
+
+def main():
+    parser = argparse.ArgumentParser(description='Manage the query embedding cache')
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help='SQLite file for the persistent tier')
+    parser.add_argument('--prewarm-log', type=str, help='Embed the queries in this log (plain text or JSON lines)')
+    parser.add_argument('--log-limit', type=int, default=None, help='Only the N most frequent logged queries')
+    parser.add_argument('--prewarm-vocabulary', action='store_true',
+                        help='Embed the most common ' + ', '.join(VOCABULARY_FIELDS) + ' values')
+    parser.add_argument('--per-field', type=int, default=200, help='Vocabulary values per field')
+    parser.add_argument('--delay', type=float, default=embeddings.REQUEST_DELAY, help='Seconds between embedding calls')
+    parser.add_argument('--stats', action='store_true', help='Show cache size and exit')
+
+    args = parser.parse_args()
+
+    cache = QueryEmbeddingCache(args.db)
+    if args.stats:
+        print(json.dumps(cache.stats(), indent=2))
+        return
+
+    if not args.prewarm_log and not args.prewarm_vocabulary:
+        parser.error("nothing to do: pass --prewarm-log, --prewarm-vocabulary or --stats")
+    if not embeddings.AZURE_OPENAI_KEY or (args.prewarm_vocabulary and not embeddings.SEARCH_API_KEY):
+        print("Error: AZURE_OPENAI_KEY (and SEARCH_API_KEY for --prewarm-vocabulary) must be set")
+        sys.exit(1)
+
+    texts = []
+    if args.prewarm_log:
+        texts += load_query_log(args.prewarm_log, args.log_limit)
+    if args.prewarm_vocabulary:
+        texts += blueprint_vocabulary(per_field=args.per_field)
+
+    print(f"Pre-warming {len(texts)} query texts...")
+    results = cache.prewarm(texts, delay=args.delay)
+    print(f"Already cached: {results['cached']}, embedded: {results['embedded']}, failed: {results['failed']}")
+    print(json.dumps(cache.stats(), indent=2))
+    cache.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+"""
+Blue/green rebuild of the search index.
+Creates the next index version from the desired schema, copies every document into it with
+parallel partitioned readers and bulk writers, restores vectors from the local document vector
+store, and then points the search alias at the new index so consumers switch over in one step.
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import queue
+import random
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional
+
+import requests
+
+import index_schema
+import search_config
+from pipeline_metrics import METRICS
+from document_vector_store import get_vector_store
+
+# Configuration
+SEARCH_ENDPOINT = os.environ.get("SEARCH_ENDPOINT", "https://fcssearchservice.search.windows.net")
+SEARCH_API_KEY = os.environ.get("SEARCH_API_KEY", "")
+SEARCH_INDEX_NAME = search_config.SEARCH_INDEX_NAME
+# Consumers that query the alias follow a rebuild without any change on their side
+SEARCH_ALIAS_NAME = search_config.SEARCH_ALIAS_NAME
+API_VERSION = "2023-11-01"
+ALIAS_API_VERSION = "2024-03-01-Preview"
+
+# The service accepts at most 1000 documents and 16 MB per indexing request
+MAX_BATCH_DOCS = 1000
+MAX_BATCH_BYTES = 14 * 1024 * 1024
+
+# Per-item status codes worth retrying (throttling / transient)
+RETRYABLE_STATUS = {409, 422, 429, 503}
+MAX_WRITE_ATTEMPTS = 8
+
+VECTOR_TYPE = "Collection(Edm.Single)"
+# The catch-up pass re-copies uploads from this long before the copy started (clock skew)
+CATCH_UP_MARGIN = 300
+
+_local = threading.local()
+
+def _session() -> requests.Session:
+    session = getattr(_local, "session", None)
+    if session is None:
+        session = _local.session = requests.Session()
+    return session
+
+def _headers() -> Dict[str, str]:
+    return {"api-key": SEARCH_API_KEY, "Content-Type": "application/json"}
+
+def next_index_name(current: str) -> str:
+    """fcs-construction-docs-index-v2 -> fcs-construction-docs-index-v3."""
+    match = re.match(r"^(.*-v)(\d+)$", current)
+    if match:
+        return f"{match.group(1)}{int(match.group(2)) + 1}"
+    return f"{current}-v2"
+
+def resolve_alias(alias: str) -> Optional[str]:
+    """The index an alias points to, or None if the alias doesn't exist."""
+    response = _session().get(f"{SEARCH_ENDPOINT}/aliases/{alias}?api-version={ALIAS_API_VERSION}",
+                              headers=_headers())
+    if response.status_code == 200:
+        return response.json()["indexes"][0]
+    return None
+
+def point_alias(alias: str, index_name: str) -> bool:
+    """Create or move the alias; the switch is atomic for readers."""
+    response = _session().put(f"{SEARCH_ENDPOINT}/aliases/{alias}?api-version={ALIAS_API_VERSION}",
+                              headers=_headers(), json={"name": alias, "indexes": [index_name]})
+    if response.status_code in [200, 201, 204]:
+        return True
+    print(f"Error updating alias {alias}: {response.status_code} - {response.text}")
+    return False
+
+def build_target_definition(source_def: Dict[str, Any], target: str) -> Dict[str, Any]:
+    """The source definition with every desired-schema change applied, including ones that need a rebuild."""
+    definition = {key: value for key, value in source_def.items() if not key.startswith("@odata.")}
+    definition = index_schema.apply_operations(
+        definition, index_schema.diff_schema(definition, index_schema.desired_schema()))
+    definition["name"] = target
+    return definition
+
+def create_index(definition: Dict[str, Any]) -> bool:
+    url = f"{SEARCH_ENDPOINT}/indexes/{definition['name']}?api-version={API_VERSION}"
+    response = _session().put(url, headers=_headers(), json=definition)
+    if response.status_code in [200, 201, 204]:
+        return True
+    print(f"Error creating index {definition['name']}: {response.status_code} - {response.text}")
+    return False
+
+def document_count(index_name: str) -> Optional[int]:
+    response = _session().get(f"{SEARCH_ENDPOINT}/indexes/{index_name}/docs/$count?api-version={API_VERSION}",
+                              headers=_headers())
+    if response.status_code == 200:
+        return int(response.content.decode("utf-8-sig"))
+    return None
+
+def plan_partitions(index_name: str) -> List[str]:
+    """One filter per client (largest first) plus documents with no client."""
+    params = {"api-version": API_VERSION, "facet": "client,count:10000", "$top": 0}
+    response = _session().get(f"{SEARCH_ENDPOINT}/indexes/{index_name}/docs", params=params, headers=_headers())
+    if response.status_code != 200:
+        print(f"Error listing clients: {response.status_code} - {response.text}")
+        return []
+    facets = response.json().get("@search.facets", {}).get("client", [])
+    partitions = ["client eq '{}'".format(facet["value"].replace("'", "''")) for facet in facets]
+    return partitions + ["client eq null"]
+
+def read_partition(index_name: str, partition: str, select: str, page_size: int = 1000):
+    """Yield pages of documents in one partition, using the id as a keyset cursor."""
+    last_id = None
+    while True:
+        page_filter = partition
+        if last_id is not None:
+            page_filter = "({}) and id gt '{}'".format(partition, last_id.replace("'", "''"))
+        body = {"search": "*", "filter": page_filter, "select": select, "orderby": "id asc", "top": page_size}
+        with METRICS.stage("fetch", operation="rebuild_read") as span:
+            response = _session().post(
+                f"{SEARCH_ENDPOINT}/indexes/{index_name}/docs/search?api-version={API_VERSION}",
+                headers=_headers(), json=body)
+            span.add_response(response)
+            if response.status_code != 200:
+                raise RuntimeError(f"reading {partition}: {response.status_code} - {response.text}")
+            documents = response.json().get("value", [])
+            span.set_items(len(documents))
+        if documents:
+            yield documents
+        if len(documents) < page_size:
+            return
+        last_id = documents[-1]["id"]
+
+class VectorRestorer:
+    """Fills vector fields from the document vector store, optionally embedding what's missing."""
+
+    def __init__(self, vector_fields: List[str], embed_missing: bool = False):
+        self.vector_fields = vector_fields
+        self.embed_missing = embed_missing
+        self.store = get_vector_store()
+        self.restored = {field: 0 for field in vector_fields}
+        self.embedded = {field: 0 for field in vector_fields}
+        self.missing = {field: 0 for field in vector_fields}
+        self._lock = threading.Lock()
+        self._blueprint_text = None
+
+    def source_text(self, field: str, doc: Dict[str, Any]) -> Optional[str]:
+        if field == "contentVector":
+            return doc.get("content") or None
+        if field == "blueprintVector":
+            if self._blueprint_text is None:
+                from generate_blueprint_embeddings import create_blueprint_text
+                self._blueprint_text = create_blueprint_text
+            text = self._blueprint_text(doc)
+            return text if len(text) >= 10 else None
+        return None
+
+    def restore(self, doc: Dict[str, Any]) -> None:
+        for field in self.vector_fields:
+            text = self.source_text(field, doc)
+            vector = self.store.get(doc["id"], field, text) if text else None
+            outcome = "restored"
+            if vector is None and text and self.embed_missing:
+                from generate_embeddings_for_new_docs import generate_embeddings
+                vector = generate_embeddings(text)
+                if vector:
+                    self.store.put(doc["id"], field, text, vector)
+                    outcome = "embedded"
+            if vector is None:
+                outcome = "missing"
+            else:
+                doc[field] = vector
+            with self._lock:
+                getattr(self, outcome)[field] += 1
+
+def write_batch(index_name: str, documents: List[Dict[str, Any]]) -> int:
+    """
+    Upload a batch, retrying throttled requests and items with backoff.
+    Returns the number of documents that could not be written.
+    """
+    pending = documents
+    # Items the service rejected for good; they stay failed while the rest are retried
+    permanent = 0
+    for attempt in range(MAX_WRITE_ATTEMPTS):
+        body = {"value": [dict(doc, **{"@search.action": "upload"}) for doc in pending]}
+        with METRICS.stage("index_write", operation="rebuild") as span:
+            response = _session().post(
+                f"{SEARCH_ENDPOINT}/indexes/{index_name}/docs/index?api-version={API_VERSION}",
+                headers=_headers(), json=body)
+            span.add_response(response)
+            span.set_items(len(pending))
+
+        if response.status_code == 200:
+            return permanent
+        if response.status_code == 207:
+            by_id = {doc["id"]: doc for doc in pending}
+            results = response.json().get("value", [])
+            failed = [r for r in results if not r.get("status")]
+            retryable = [r for r in failed if r.get("statusCode") in RETRYABLE_STATUS]
+            for result in failed:
+                if result.get("statusCode") not in RETRYABLE_STATUS:
+                    print(f"  ✗ {result['key']}: {result.get('statusCode')} {result.get('errorMessage')}")
+            permanent += len(failed) - len(retryable)
+            if not retryable:
+                return permanent
+            pending = [by_id[r["key"]] for r in retryable if r["key"] in by_id]
+        elif response.status_code not in (429, 503):
+            print(f"  ✗ batch of {len(pending)} rejected: {response.status_code} - {response.text[:300]}")
+            return permanent + len(pending)
+
+        # Throttled: the service is at its ingest limit, so back off before trying again
+        METRICS.count_retry("index_write")
+        time.sleep(min(60.0, (2 ** attempt) * (0.5 + random.random())))
+
+    print(f"  ✗ gave up on {len(pending)} documents after {MAX_WRITE_ATTEMPTS} attempts")
+    return permanent + len(pending)
+
+def batch_size_bytes(doc: Dict[str, Any]) -> int:
+    return len(json.dumps(doc))
+
+def copy_documents(source: str, target: str, select: str, restorer: VectorRestorer, readers: int = 4,
+                   writers: int = 8, queue_batches: int = 16, partitions: List[str] = None) -> Dict[str, int]:
+    """Stream every document (or only those in partitions) to target; returns read/written/failed counts."""
+    partitions = partitions or plan_partitions(source)
+    if not partitions:
+        raise RuntimeError("could not plan partitions")
+    print(f"Copying {len(partitions)} partitions with {readers} readers and {writers} writers...")
+
+    batches: "queue.Queue" = queue.Queue(maxsize=queue_batches)
+    counts = {"read": 0, "written": 0, "failed": 0}
+    lock = threading.Lock()
+    done_reading = threading.Event()
+
+    def reader(partition: str) -> None:
+        batch, size = [], 0
+        for page in read_partition(source, partition, select):
+            with lock:
+                counts["read"] += len(page)
+            for doc in page:
+                restorer.restore(doc)
+                doc_bytes = batch_size_bytes(doc)
+                if batch and (len(batch) >= MAX_BATCH_DOCS or size + doc_bytes > MAX_BATCH_BYTES):
+                    batches.put(batch)
+                    batch, size = [], 0
+                batch.append(doc)
+                size += doc_bytes
+        if batch:
+            batches.put(batch)
+
+    def writer() -> None:
+        while True:
+            try:
+                batch = batches.get(timeout=0.5)
+            except queue.Empty:
+                if done_reading.is_set():
+                    return
+                continue
+            try:
+                failed = write_batch(target, batch)
+            except Exception as e:
+                # A dead writer would leave the readers blocked on a full queue
+                print(f"  ✗ batch of {len(batch)} failed: {e}")
+                failed = len(batch)
+            with lock:
+                counts["written"] += len(batch) - failed
+                counts["failed"] += failed
+
+    start = time.time()
+    writer_threads = [threading.Thread(target=writer, daemon=True) for _ in range(writers)]
+    for thread in writer_threads:
+        thread.start()
+
+    try:
+        with ThreadPoolExecutor(max_workers=readers) as executor:
+            futures = [executor.submit(reader, partition) for partition in partitions]
+            while not all(future.done() for future in futures):
+                time.sleep(5)
+                elapsed = time.time() - start
+                print(f"  read {counts['read']}, written {counts['written']}, failed {counts['failed']} "
+                      f"({counts['written'] / elapsed:.0f} docs/s)")
+            for future in futures:
+                # Re-raise reader errors
+                future.result()
+    finally:
+        # Let the writers drain what was read even if a reader failed
+        done_reading.set()
+        for thread in writer_threads:
+            thread.join()
+    return counts
+
+def wait_for_count(index_name: str, expected: int, timeout: float = 120.0) -> Optional[int]:
+    """Document counts lag indexing by a few seconds; poll until they settle."""
+    deadline = time.time() + timeout
+    count = document_count(index_name)
+    while count is not None and count < expected and time.time() < deadline:
+        time.sleep(5)
+        count = document_count(index_name)
+    return count
+
+def rebuild(source: str = None, target: str = None, alias: str = SEARCH_ALIAS_NAME, readers: int = 4,
+            writers: int = 8, embed_missing: bool = False, swap: bool = True, resume: bool = False) -> bool:
+    source = source or resolve_alias(alias) or search_config.INITIAL_INDEX_NAME
+    target = target or next_index_name(source)
+    print(f"Rebuilding {source} -> {target}")
+
+    source_def = index_schema.get_index(source)
+    if source_def is None:
+        return False
+
+    definition = build_target_definition(source_def, target)
+    if resume and index_schema.get_index(target) is not None:
+        print(f"Resuming into existing {target}")
+    elif not create_index(definition):
+        return False
+
+    fields = definition["fields"]
+    vector_fields = [field["name"] for field in fields if field["type"] == VECTOR_TYPE]
+    source_fields = {field["name"]: field for field in source_def["fields"]}
+    select = ",".join(name for name, field in source_fields.items()
+                      if field["type"] != VECTOR_TYPE and field.get("retrievable", True))
+    lost = [name for name, field in source_fields.items()
+            if field["type"] != VECTOR_TYPE and not field.get("retrievable", True)]
+    if lost:
+        print(f"⚠ Not retrievable, will be empty in {target}: {', '.join(lost)}")
+
+    restorer = VectorRestorer(vector_fields, embed_missing=embed_missing)
+    expected = document_count(source)
+    copy_start = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(time.time() - CATCH_UP_MARGIN))
+    counts = copy_documents(source, target, select, restorer, readers=readers, writers=writers)
+    if not counts["failed"]:
+        # Uploads that landed in a partition after its reader passed them
+        print(f"\nCatching up on documents uploaded since {copy_start}...")
+        caught_up = copy_documents(source, target, select, restorer, readers=1, writers=writers,
+                                   partitions=[f"uploadedAt ge {copy_start}"])
+        counts["written"] += caught_up["written"]
+        counts["failed"] += caught_up["failed"]
+
+    print(f"\nRead {counts['read']}, written {counts['written']}, failed {counts['failed']}")
+    for field in vector_fields:
+        print(f"  {field}: {restorer.restored[field]} reused, {restorer.embedded[field]} embedded, "
+              f"{restorer.missing[field]} without a vector")
+    METRICS.print_summary()
+
+    if counts["failed"] or counts["read"] < (expected or 0):
+        print(f"✗ Copy incomplete (source has {expected}); alias left on {source}. Re-run with --resume.")
+        return False
+
+    actual = wait_for_count(target, counts["read"])
+    print(f"{target} reports {actual} documents (source {expected})")
+    if actual is None or actual < counts["read"]:
+        print(f"✗ Target count doesn't match; alias left on {source}")
+        return False
+
+    if not swap:
+        print(f"Not swapping; point the alias with --point-alias {target} when ready")
+        return True
+    if not point_alias(alias, target):
+        return False
+    print(f"✓ {alias} now serves {target}. {source} is kept for rollback: --point-alias {source}")
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description='Rebuild the search index into a new version and swap the alias')
+    parser.add_argument('--source', type=str, help='Index to copy from (default: current alias target)')
+    parser.add_argument('--target', type=str, help='Index to create (default: next -vN)')
+    parser.add_argument('--alias', default=SEARCH_ALIAS_NAME, help='Alias consumers query')
+    parser.add_argument('--readers', type=int, default=4, help='Parallel partition readers')
+    parser.add_argument('--writers', type=int, default=8, help='Parallel bulk writers')
+    parser.add_argument('--embed-missing', action='store_true',
+                        help='Embed documents whose vectors are not in the local store (slower)')
+    parser.add_argument('--no-swap', action='store_true', help='Copy and verify, but leave the alias alone')
+    parser.add_argument('--resume', action='store_true', help='Reuse an existing target index (uploads are idempotent)')
+    parser.add_argument('--point-alias', type=str, metavar='INDEX', help='Only move the alias to INDEX (e.g. roll back)')
+    parser.add_argument('--metrics-file', type=str, help='Write Prometheus text metrics to this file')
+
+    args = parser.parse_args()
+
+    if not SEARCH_API_KEY:
+        print("Error: SEARCH_API_KEY environment variable not set")
+        sys.exit(1)
+
+    if args.point_alias:
+        if not point_alias(args.alias, args.point_alias):
+            sys.exit(1)
+        print(f"✓ {args.alias} now serves {args.point_alias}")
+        return
+
+    ok = rebuild(source=args.source, target=args.target, alias=args.alias, readers=args.readers,
+                 writers=args.writers, embed_missing=args.embed_missing, swap=not args.no_swap,
+                 resume=args.resume)
+    if args.metrics_file:
+        METRICS.write_prometheus(args.metrics_file)
+    if not ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Query latency benchmark for the search index.
+Runs a workload of keyword, filter, semantic and vector queries with warm-up, concurrency and
+repetitions, reports p50/p95/p99, throughput and error rate as JSON, and diffs against a baseline.
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Optional
+
+import requests
+
+import search_config
+from add_blueprint_fields import BLUEPRINT_TEST_QUERIES
+from add_project_field import PERFORMANCE_TEST_QUERIES
+
+# Configuration
+SEARCH_ENDPOINT = os.environ.get("SEARCH_ENDPOINT", "https://fcssearchservice.search.windows.net")
+SEARCH_API_KEY = os.environ.get("SEARCH_API_KEY", "")
+SEARCH_INDEX_NAME = search_config.SEARCH_INDEX_NAME
+API_VERSION = "2023-11-01"
+
+# Vector probes: the text is embedded once before the run, outside the timed section
+VECTOR_TEST_QUERIES = [
+    {"name": "vector: steel beam connection", "text": "steel beam connection details", "fields": "contentVector"},
+    {"name": "blueprint vector: W12x26 ASTM A615", "text": "W12x26 ASTM A615 rebar", "fields": "blueprintVector"},
+]
+
+# Metrics compared against a baseline; True means higher is better
+COMPARED_METRICS = {
+    "p50_ms": False,
+    "p95_ms": False,
+    "p99_ms": False,
+    "throughput_rps": True,
+    "error_rate": False,
+}
+
+def classify_query(body: Dict[str, Any]) -> str:
+    """Name the kind of query a request body represents."""
+    if body.get("vectorQueries"):
+        return "vector"
+    if body.get("queryType") == "semantic":
+        return "semantic"
+    if body.get("filter") and body.get("search", "*") == "*":
+        return "filter"
+    return "keyword"
+
+def default_workload() -> List[Dict[str, Any]]:
+    """The queries the index setup scripts probe with, plus vector probes."""
+    workload = []
+    for body in PERFORMANCE_TEST_QUERIES + BLUEPRINT_TEST_QUERIES:
+        label = body.get("search") if body.get("search", "*") != "*" else body.get("filter")
+        workload.append({"name": f"{classify_query(body)}: {label}", "body": body})
+    for probe in VECTOR_TEST_QUERIES:
+        workload.append({
+            "name": probe["name"],
+            "vectorText": probe["text"],
+            "body": {
+                "select": "id,fileName",
+                "top": 5,
+                "vectorQueries": [{"kind": "vector", "fields": probe["fields"], "k": 5}]
+            }
+        })
+    return workload
+
+def load_workload(path: str) -> List[Dict[str, Any]]:
+    """Load a workload file: a JSON list (or {"queries": [...]}) of {name, body, vectorText?}."""
+    with open(path) as f:
+        data = json.load(f)
+    return data["queries"] if isinstance(data, dict) else data
+
+def resolve_vectors(workload: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Embed vectorText entries once so embedding latency stays out of the search numbers."""
+    from generate_embeddings_for_new_docs import generate_embeddings
+
+    resolved = []
+    for query in workload:
+        if query.get("vectorText"):
+            vector = generate_embeddings(query["vectorText"])
+            if not vector:
+                print(f"  Skipping {query['name']}: could not embed query text")
+                continue
+            body = json.loads(json.dumps(query["body"]))
+            for vector_query in body.get("vectorQueries", []):
+                vector_query.setdefault("vector", vector)
+            query = dict(query, body=body)
+        resolved.append(query)
+    return resolved
+
+def percentile(sorted_values: List[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(q * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+def summarize_latencies(latencies: List[float], errors: int, wall_seconds: float) -> Dict[str, Any]:
+    values = sorted(latencies)
+    total = len(values) + errors
+    return {
+        "requests": total,
+        "errors": errors,
+        "error_rate": errors / total if total else 0.0,
+        "p50_ms": percentile(values, 0.50),
+        "p95_ms": percentile(values, 0.95),
+        "p99_ms": percentile(values, 0.99),
+        "mean_ms": sum(values) / len(values) if values else None,
+        "max_ms": values[-1] if values else None,
+        "throughput_rps": total / wall_seconds if wall_seconds else 0.0,
+    }
+
+class SearchClient:
+    """Posts search bodies using one pooled session per thread."""
+
+    def __init__(self, endpoint: str = SEARCH_ENDPOINT, index_name: Optional[str] = None,
+                 api_key: str = SEARCH_API_KEY, timeout: float = 30.0):
+        index_name = index_name or search_config.index_name()
+        self.url = f"{endpoint.rstrip('/')}/indexes/{index_name}/docs/search?api-version={API_VERSION}"
+        self.headers = {"api-key": api_key, "Content-Type": "application/json"}
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def search(self, body: Dict[str, Any]) -> requests.Response:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session.post(self.url, headers=self.headers, json=body, timeout=self.timeout)
+
+    def timed_search(self, body: Dict[str, Any]) -> tuple:
+        """Return (latency in ms, ok)."""
+        start = time.perf_counter()
+        try:
+            ok = self.search(body).status_code == 200
+        except requests.RequestException:
+            ok = False
+        return (time.perf_counter() - start) * 1000, ok
+
+def run_benchmark(workload: List[Dict[str, Any]], client: SearchClient, concurrency: int = 4,
+                  repetitions: int = 10, warmup: int = 2) -> Dict[str, Any]:
+    """Run every query `repetitions` times with `concurrency` requests in flight."""
+    for query in workload:
+        for _ in range(warmup):
+            client.timed_search(query["body"])
+
+    # Interleave queries so no single query owns a stretch of the run
+    schedule = [query for _ in range(repetitions) for query in workload]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        outcomes = list(executor.map(lambda query: client.timed_search(query["body"]), schedule))
+    wall_seconds = time.perf_counter() - start
+
+    per_query = {}
+    for query, (latency, ok) in zip(schedule, outcomes):
+        entry = per_query.setdefault(query["name"], {"latencies": [], "errors": 0, "kind": classify_query(query["body"])})
+        if ok:
+            entry["latencies"].append(latency)
+        else:
+            entry["errors"] += 1
+
+    # Per-query throughput is its share of the shared wall clock
+    queries = {
+        name: dict(summarize_latencies(entry["latencies"], entry["errors"], wall_seconds), kind=entry["kind"])
+        for name, entry in per_query.items()
+    }
+    all_latencies = [latency for latency, ok in outcomes if ok]
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "index": search_config.index_name(),
+        "config": {"concurrency": concurrency, "repetitions": repetitions, "warmup": warmup},
+        "overall": summarize_latencies(all_latencies, len(outcomes) - len(all_latencies), wall_seconds),
+        "queries": queries,
+    }
+
+def compare_to_baseline(results: Dict[str, Any], baseline: Dict[str, Any],
+                        threshold: float = 0.10) -> List[Dict[str, Any]]:
+    """Relative change of each compared metric; regressions are changes worse than the threshold."""
+    rows = []
+    pairs = [("overall", results["overall"], baseline.get("overall", {}))]
+    pairs += [(name, stats, baseline.get("queries", {}).get(name, {}))
+              for name, stats in results["queries"].items()]
+    for name, current, previous in pairs:
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            new, old = current.get(metric), previous.get(metric)
+            if new is None or old is None:
+                continue
+            if old:
+                change = (new - old) / old
+            else:
+                change = 0.0 if new == old else float("inf")
+            worse = -change if higher_is_better else change
+            rows.append({"query": name, "metric": metric, "baseline": old, "current": new,
+                         "change": change, "regression": worse > threshold})
+    return rows
+
+def print_report(results: Dict[str, Any]) -> None:
+    print(f"\n{'query':<48} {'kind':<9} {'p50':>8} {'p95':>8} {'p99':>8} {'rps':>7} {'err%':>6}")
+    rows = list(results["queries"].items()) + [("OVERALL", dict(results["overall"], kind=""))]
+    for name, stats in rows:
+        fmt = lambda v: f"{v:8.1f}" if v is not None else "       -"
+        print(f"{name[:48]:<48} {stats['kind']:<9} {fmt(stats['p50_ms'])} {fmt(stats['p95_ms'])} "
+              f"{fmt(stats['p99_ms'])} {stats['throughput_rps']:7.1f} {stats['error_rate'] * 100:6.1f}")
+
+def print_comparison(rows: List[Dict[str, Any]]) -> None:
+    print("\nChange vs baseline:")
+    for row in rows:
+        if row["metric"] in ("p50_ms", "p95_ms") or row["regression"]:
+            flag = "  REGRESSION" if row["regression"] else ""
+            print(f"  {row['query'][:48]:<48} {row['metric']:<15} {row['baseline']:>10.2f} -> "
+                  f"{row['current']:>10.2f} ({row['change']:+.1%}){flag}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark search query latency')
+    parser.add_argument('--workload', type=str, help='Workload JSON file (default: built-in representative queries)')
+    parser.add_argument('--write-workload', type=str, help='Write the built-in workload to this file and exit')
+    parser.add_argument('--endpoint', type=str, default=SEARCH_ENDPOINT, help='Search endpoint (e.g. a local stand-in)')
+    parser.add_argument('--concurrency', type=int, default=4, help='Requests in flight')
+    parser.add_argument('--repetitions', type=int, default=10, help='Timed runs of each query')
+    parser.add_argument('--warmup', type=int, default=2, help='Untimed runs of each query first')
+    parser.add_argument('--output', type=str, help='Write the JSON results to this file')
+    parser.add_argument('--baseline', type=str, help='Compare against a previous results file')
+    parser.add_argument('--save-baseline', type=str, help='Also write the results as the new baseline')
+    parser.add_argument('--regression-threshold', type=float, default=0.10,
+                        help='Relative change counted as a regression (default 10%%)')
+
+    args = parser.parse_args()
+
+    if args.write_workload:
+        with open(args.write_workload, "w") as f:
+            json.dump({"queries": default_workload()}, f, indent=2)
+        print(f"Wrote workload to {args.write_workload}")
+        return
+
+    if not SEARCH_API_KEY and args.endpoint == SEARCH_ENDPOINT:
+        print("Error: SEARCH_API_KEY environment variable not set")
+        sys.exit(1)
+
+    workload = load_workload(args.workload) if args.workload else default_workload()
+    if any(query.get("vectorText") for query in workload):
+        print("Embedding vector query text...")
+        workload = resolve_vectors(workload)
+
+    print(f"Running {len(workload)} queries x {args.repetitions} "
+          f"(warm-up {args.warmup}, concurrency {args.concurrency})...")
+    results = run_benchmark(workload, SearchClient(endpoint=args.endpoint), concurrency=args.concurrency,
+                            repetitions=args.repetitions, warmup=args.warmup)
+    print_report(results)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            rows = compare_to_baseline(results, json.load(f), threshold=args.regression_threshold)
+        results["comparison"] = rows
+        print_comparison(rows)
+        regressions = [row for row in rows if row["regression"]]
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump(results, f, indent=2)
+            print(f"\nResults written to {path}")
+
+    if not args.output:
+        print(json.dumps(results["overall"], indent=2))
+
+    if regressions:
+        print(f"\n✗ {len(regressions)} metrics regressed by more than {args.regression_threshold:.0%}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+In-process cache for search results.
+Entries are keyed on the normalized query body, expire after a TTL, are evicted least recently
+used first, and are dropped when the pipeline writes to the client/project they were scoped to.
+Writes are also counted per client/project in a small SQLite file (SEARCH_CACHE_DB), which every
+lookup checks, so a write made by another process invalidates entries too; processes only see
+each other's writes when they share that file.
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import argparse
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
+
+from pipeline_metrics import METRICS
+
+DEFAULT_TTL_SECONDS = 300.0
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_GENERATIONS_DB = os.environ.get("SEARCH_CACHE_DB", "search-cache.db")
+
+GENERATIONS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS scope_generations (
+    client TEXT NOT NULL,
+    project TEXT NOT NULL,
+    generation INTEGER NOT NULL,
+    PRIMARY KEY (client, project)
+);
+"""
+
+# Scope value of a write that wasn't limited to one client or project
+ANY = "*"
+
+# Equality filters that pin a query to one client or project
+_SCOPE_PATTERNS = {
+    "client": re.compile(r"client\s+eq\s+'((?:[^']|'')*)'"),
+    "project": re.compile(r"project(?:Name|Id)\s+eq\s+'((?:[^']|'')*)'"),
+}
+_AND = re.compile(r"\s+and\s+")
+_OR = re.compile(r"\s+or\s+")
+
+def _normalize_list(value: str) -> str:
+    """Comma-separated field lists are order-insensitive."""
+    return ",".join(sorted(part.strip() for part in value.split(",") if part.strip()))
+
+def cache_key(body: Dict[str, Any]) -> str:
+    """Stable key for a search request body."""
+    normalized = {}
+    for name, value in body.items():
+        if value is None:
+            continue
+        if name == "search" and isinstance(value, str):
+            # Search text is analyzed case-insensitively; filters are not, so they are kept as-is
+            value = " ".join(value.lower().split()) or "*"
+        elif name in ("select", "searchFields") and isinstance(value, str):
+            value = _normalize_list(value)
+        elif name == "filter" and isinstance(value, str):
+            value = " ".join(value.split())
+        elif name == "vectorQueries":
+            # Hash the vectors rather than keeping 1536 floats in every key
+            value = hashlib.sha256(json.dumps(value, sort_keys=True).encode("utf-8")).hexdigest()
+        normalized[name] = value
+    return json.dumps(normalized, sort_keys=True, separators=(",", ":"))
+
+def _unwrap(expression: str) -> str:
+    """Strip parentheses that enclose the whole expression."""
+    expression = expression.strip()
+    while expression.startswith("(") and _closing_paren(expression, 0) == len(expression) - 1:
+        expression = expression[1:-1].strip()
+    return expression
+
+def _closing_paren(expression: str, start: int) -> int:
+    depth = 0
+    in_string = False
+    for i in range(start, len(expression)):
+        char = expression[i]
+        if char == "'":
+            # A doubled quote inside a string toggles twice and stays in the string
+            in_string = not in_string
+        elif not in_string and char == "(":
+            depth += 1
+        elif not in_string and char == ")":
+            depth -= 1
+            if depth == 0:
+                return i
+    return -1
+
+def _split_top_level(expression: str, keyword: re.Pattern) -> List[str]:
+    """Split on a logical keyword outside string literals and parentheses."""
+    parts, depth, in_string, start = [], 0, False, 0
+    i = 0
+    while i < len(expression):
+        char = expression[i]
+        if char == "'":
+            in_string = not in_string
+        elif not in_string and char == "(":
+            depth += 1
+        elif not in_string and char == ")":
+            depth -= 1
+        elif not in_string and depth == 0 and i > start:
+            match = keyword.match(expression, i)
+            if match:
+                parts.append(expression[start:i])
+                start = i = match.end()
+                continue
+        i += 1
+    parts.append(expression[start:])
+    return parts
+
+def top_level_conjuncts(filter_text: str) -> List[str]:
+    """The parts of a filter joined by top-level 'and's (a filter without one is its only part)."""
+    expression = _unwrap(filter_text)
+    # 'and' binds tighter than 'or', so a top-level 'or' makes the whole filter one disjunction
+    if len(_split_top_level(expression, _OR)) > 1:
+        return [expression]
+    parts = _split_top_level(expression, _AND)
+    if len(parts) == 1:
+        return [expression]
+    return [conjunct for part in parts for conjunct in top_level_conjuncts(part)]
+
+def query_scope(body: Dict[str, Any]) -> Tuple[Optional[str], Optional[str]]:
+    """
+    The (client, project) a query is restricted to by an equality filter, if any.
+
+    Only an equality that is the whole filter or one of its top-level 'and' conjuncts counts;
+    one under 'or' or 'not' does not restrict the results, so such a query is unscoped.
+    """
+    conjuncts = top_level_conjuncts(body.get("filter") or "")
+    scope = []
+    for name in ("client", "project"):
+        matches = [_SCOPE_PATTERNS[name].fullmatch(conjunct) for conjunct in conjuncts]
+        values = {match.group(1).replace("''", "'") for match in matches if match}
+        # Conflicting equalities match nothing; treat that as unscoped rather than guess
+        scope.append(values.pop() if len(values) == 1 else None)
+    return tuple(scope)
+
+class ScopeGenerations:
+    """Write counters per client/project, shared by every process that opens the same database."""
+
+    def __init__(self, db_path: str = DEFAULT_GENERATIONS_DB):
+        self.db_path = db_path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        # Opened on first use so importing the cache doesn't create the file
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(GENERATIONS_SCHEMA)
+        return self._conn
+
+    def bump(self, client: str = None, project: str = None) -> None:
+        with self._lock:
+            self._connection().execute(
+                "INSERT INTO scope_generations (client, project, generation) VALUES (?, ?, 1) "
+                "ON CONFLICT (client, project) DO UPDATE SET generation = generation + 1",
+                (client if client is not None else ANY, project if project is not None else ANY))
+
+    def current(self, scope: Tuple[Optional[str], Optional[str]]) -> int:
+        """
+        Sum of the counters of every write that could affect an entry with this scope.
+
+        Counters only grow, so the sum changes exactly when such a write happened.
+        """
+        client, project = scope
+        with self._lock:
+            return self._connection().execute(
+                "SELECT COALESCE(SUM(generation), 0) FROM scope_generations "
+                "WHERE (client = ? OR ? IS NULL OR client = ?) AND (project = ? OR ? IS NULL OR project = ?)",
+                (ANY, client, client, ANY, project, project)).fetchone()[0]
+
+class SearchResultCache:
+    """Thread-safe TTL + LRU cache of parsed search responses."""
+
+    def __init__(self, ttl: float = DEFAULT_TTL_SECONDS, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 name: str = "search", generations: ScopeGenerations = None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.name = name
+        # Without generations only invalidations made in this process are seen
+        self.generations = generations
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, body: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Return the cached response for this query body, or None.
+
+        The response object is shared between callers and must not be modified.
+        """
+        key = cache_key(body)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic() and self._unchanged(entry):
+                self._entries.move_to_end(key)
+                METRICS.count_cache(self.name, hit=True)
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+        METRICS.count_cache(self.name, hit=False)
+        return None
+
+    def _unchanged(self, entry: tuple) -> bool:
+        """No write to the entry's scope since it was stored, by this or any other process."""
+        return self.generations is None or self.generations.current(entry[2]) == entry[3]
+
+    def generation(self, body: Dict[str, Any]) -> Optional[int]:
+        """Write generation of this query's scope; read it before searching and pass it to put()."""
+        return self.generations.current(query_scope(body)) if self.generations else None
+
+    def put(self, body: Dict[str, Any], response: Dict[str, Any], generation: int = None) -> None:
+        key = cache_key(body)
+        scope = query_scope(body)
+        if generation is None and self.generations:
+            generation = self.generations.current(scope)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, response, scope, generation)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate_scope(self, client: str = None, project: str = None) -> int:
+        """
+        Drop every entry a write to this client/project could affect; returns how many were
+        held by this process. Other processes sharing the generations database drop theirs on lookup.
+
+        An entry survives only if its filter pins it to a different client or project.
+        With neither given the write could be anywhere, so everything goes.
+        """
+        with self._lock:
+            stale = [
+                key for key, (_, _, (entry_client, entry_project), _) in self._entries.items()
+                if (client is None or entry_client is None or entry_client == client)
+                and (project is None or entry_project is None or entry_project == project)
+            ]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+        if self.generations:
+            self.generations.bump(client, project)
+        return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "evictions": self.evictions,
+                    "invalidations": self.invalidations}
+
+# Process-wide cache; index writes in any process using the same SEARCH_CACHE_DB invalidate it
+SEARCH_CACHE = SearchResultCache(generations=ScopeGenerations())
+
+_default_client = None
+
+def cached_search(body: Dict[str, Any], client=None, cache: SearchResultCache = None) -> Optional[Dict[str, Any]]:
+    """
+    Run a search through the cache. client is a search_benchmark.SearchClient (a default one
+    is created on first use). Failed searches return None and are not cached.
+    """
+    global _default_client
+    cache = cache or SEARCH_CACHE
+    response = cache.get(body)
+    if response is not None:
+        return response
+
+    if client is None:
+        if _default_client is None:
+            from search_benchmark import SearchClient
+            _default_client = SearchClient()
+        client = _default_client
+
+    # Read before searching, so a write landing during the request marks the entry stale
+    generation = cache.generation(body)
+    http_response = client.search(body)
+    if http_response.status_code != 200:
+        print(f"Error searching: {http_response.status_code} - {http_response.text}")
+        return None
+    response = http_response.json()
+    cache.put(body, response, generation)
+    return response
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a query through the search result cache')
+    parser.add_argument('--search', type=str, default='W12x26 steel beam', help='Search text')
+    parser.add_argument('--filter', type=str, help='OData filter')
+    parser.add_argument('--select', type=str, default='id,fileName', help='Fields to return')
+    parser.add_argument('--top', type=int, default=5)
+    parser.add_argument('--repeat', type=int, default=1000, help='Cached lookups to time after the first search')
+
+    args = parser.parse_args()
+
+    from search_benchmark import SEARCH_API_KEY
+    if not SEARCH_API_KEY:
+        print("Error: SEARCH_API_KEY environment variable not set")
+        sys.exit(1)
+
+    body = {"search": args.search, "select": args.select, "top": args.top}
+    if args.filter:
+        body["filter"] = args.filter
+
+    start = time.perf_counter()
+    response = cached_search(body)
+    print(f"First search: {(time.perf_counter() - start) * 1000:.1f} ms")
+    if response is None:
+        sys.exit(1)
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        cached_search(body)
+    print(f"Cached lookup: {(time.perf_counter() - start) / args.repeat * 1e6:.1f} µs "
+          f"({len(response.get('value', []))} results)")
+
+if __name__ == "__main__":
+    main()
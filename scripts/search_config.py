@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Which search index the scripts use.
+Everything follows the alias that rebuild_index.py moves, so a blue/green rebuild switches every
+script, the site (api/config) and test-server.py over in one step. The GA API versions the scripts
+call don't accept alias names, so index_name() looks up the index behind the alias and re-checks
+it every minute. Setting SEARCH_INDEX_NAME pins the scripts to one index instead.
+Create the alias once with: python rebuild_index.py --point-alias fcs-construction-docs-index-v2
+"""
+
+import os
+import sys
+import time
+
+import requests
+
+SEARCH_ENDPOINT = os.environ.get("SEARCH_ENDPOINT", "https://fcssearchservice.search.windows.net")
+SEARCH_ALIAS_NAME = os.environ.get("SEARCH_ALIAS_NAME", "fcs-construction-docs")
+SEARCH_INDEX_NAME = os.environ.get("SEARCH_INDEX_NAME", SEARCH_ALIAS_NAME)
+# The index in service before the alias existed
+INITIAL_INDEX_NAME = "fcs-construction-docs-index-v2"
+ALIAS_API_VERSION = "2024-03-01-Preview"
+ALIAS_TTL = 60
+
+_resolved = {"name": None, "expires": 0.0}
+
+def resolve_index_name(name: str = SEARCH_INDEX_NAME) -> str:
+    """The index an alias points to; names that aren't aliases are returned unchanged."""
+    response = requests.get(f"{SEARCH_ENDPOINT}/aliases/{name}?api-version={ALIAS_API_VERSION}",
+                            headers={"api-key": os.environ.get("SEARCH_API_KEY", "")})
+    if response.status_code == 200:
+        return response.json()["indexes"][0]
+    if name == SEARCH_ALIAS_NAME:
+        # The alias hasn't been created yet
+        return INITIAL_INDEX_NAME
+    return name
+
+def index_name() -> str:
+    """The index documents are read from and written to, following the alias."""
+    if _resolved["name"] is None or time.time() >= _resolved["expires"]:
+        _resolved["name"] = resolve_index_name(SEARCH_INDEX_NAME)
+        _resolved["expires"] = time.time() + ALIAS_TTL
+    return _resolved["name"]
+
+def main():
+    print(f"{SEARCH_INDEX_NAME} -> {index_name()}")
+
+if __name__ == "__main__":
+    sys.exit(main())
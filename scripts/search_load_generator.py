@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Open-loop load generator for the search path.
+Requests are issued on an arrival schedule (Poisson, bursty, or a recorded trace) regardless of
+how fast earlier ones complete, and latency is measured from the scheduled send time, so a
+stalled server shows up in the numbers instead of silently slowing the generator down
+(coordinated omission). A local stand-in server is included for repeatable runs.
+"""
+
+import os
+import sys
+import json
+import random
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional
+
+from search_benchmark import SearchClient, SEARCH_ENDPOINT, percentile
+from add_blueprint_fields import BLUEPRINT_TEST_QUERIES
+
+# Default latency objective used to find the saturation point
+DEFAULT_P99_SLO_MS = 1000.0
+
+def poisson_arrivals(rate: float, duration: float, seed: int = None) -> List[float]:
+    """Arrival offsets (seconds) of a Poisson process at `rate` requests/second."""
+    rng = random.Random(seed)
+    offsets, t = [], 0.0
+    while True:
+        t += rng.expovariate(rate)
+        if t >= duration:
+            return offsets
+        offsets.append(t)
+
+def burst_arrivals(rate: float, duration: float, burst_factor: float = 5.0, burst_every: float = 10.0,
+                   burst_length: float = 1.0, seed: int = None) -> List[float]:
+    """
+    Poisson arrivals whose rate jumps to rate * burst_factor for burst_length seconds every
+    burst_every seconds, the way chat fan-out hits search. The mean rate is kept at `rate`.
+    """
+    rng = random.Random(seed)
+    burst_share = burst_length / burst_every
+    base_rate = rate / (1 + burst_share * (burst_factor - 1))
+    offsets, t = [], 0.0
+    while True:
+        in_burst = (t % burst_every) < burst_length
+        t += rng.expovariate(base_rate * (burst_factor if in_burst else 1.0))
+        if t >= duration:
+            return offsets
+        offsets.append(t)
+
+def load_trace(path: str) -> List[Dict[str, Any]]:
+    """Load a recorded trace: JSON lines of {"offset": seconds, "body": {...}}, sorted by offset."""
+    with open(path) as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    return sorted(entries, key=lambda entry: entry["offset"])
+
+def synthetic_schedule(offsets: List[float], queries: List[Dict[str, Any]], seed: int = None) -> List[Dict[str, Any]]:
+    """Pair each arrival with a query drawn from the query shapes."""
+    rng = random.Random(seed)
+    return [{"offset": offset, "body": rng.choice(queries)} for offset in offsets]
+
+async def run_open_loop(schedule: List[Dict[str, Any]], client: SearchClient,
+                        max_in_flight: int = 512) -> Dict[str, Any]:
+    """
+    Fire each request at its scheduled offset and record latency from that intended time.
+
+    max_in_flight only bounds the worker threads; requests beyond it queue, and that queueing
+    is charged to latency because the clock starts at the scheduled time.
+    """
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=max_in_flight)
+    start = loop.time()
+    results = []
+
+    async def fire(entry: Dict[str, Any]) -> None:
+        intended = start + entry["offset"]
+        delay = intended - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        send_lag = loop.time() - intended
+        try:
+            response = await loop.run_in_executor(executor, client.search, entry["body"])
+            ok = response.status_code == 200
+        except Exception:
+            ok = False
+        finished = loop.time()
+        results.append({
+            "corrected_ms": (finished - intended) * 1000,
+            "service_ms": (finished - intended - send_lag) * 1000,
+            "ok": ok,
+        })
+
+    await asyncio.gather(*(fire(entry) for entry in schedule))
+    elapsed = loop.time() - start
+    executor.shutdown(wait=False)
+    return summarize_run(results, schedule, elapsed)
+
+def summarize_run(results: List[Dict[str, Any]], schedule: List[Dict[str, Any]], elapsed: float) -> Dict[str, Any]:
+    ok = [r for r in results if r["ok"]]
+    corrected = sorted(r["corrected_ms"] for r in ok)
+    uncorrected = sorted(r["service_ms"] for r in ok)
+    offered_seconds = schedule[-1]["offset"] if schedule else 0.0
+    return {
+        "requests": len(results),
+        "errors": len(results) - len(ok),
+        "error_rate": (len(results) - len(ok)) / len(results) if results else 0.0,
+        "offered_rps": len(schedule) / offered_seconds if offered_seconds else 0.0,
+        "achieved_rps": len(ok) / elapsed if elapsed else 0.0,
+        "latency_ms": {f"p{q * 100:g}": percentile(corrected, q) for q in (0.5, 0.9, 0.99, 0.999)},
+        "uncorrected_latency_ms": {f"p{q * 100:g}": percentile(uncorrected, q) for q in (0.5, 0.9, 0.99, 0.999)},
+    }
+
+async def find_saturation(client: SearchClient, queries: List[Dict[str, Any]], start_rate: float,
+                          max_rate: float, step_factor: float, step_duration: float,
+                          p99_slo_ms: float, max_error_rate: float, seed: int = None) -> Dict[str, Any]:
+    """Raise the offered rate step by step until p99 or the error rate breaks the objective."""
+    steps = []
+    sustained = None
+    rate = start_rate
+    while rate <= max_rate:
+        schedule = synthetic_schedule(poisson_arrivals(rate, step_duration, seed), queries, seed)
+        result = await run_open_loop(schedule, client)
+        p99 = result["latency_ms"]["p99"]
+        healthy = p99 is not None and p99 <= p99_slo_ms and result["error_rate"] <= max_error_rate
+        steps.append(dict(result, rate=rate, healthy=healthy))
+        print(f"  {rate:8.1f} req/s offered -> {result['achieved_rps']:8.1f} achieved, "
+              f"p99 {p99 if p99 is not None else float('nan'):8.1f} ms, errors {result['error_rate']:.1%}"
+              f"{'' if healthy else '  <- over objective'}")
+        if not healthy:
+            break
+        sustained = result["achieved_rps"]
+        rate *= step_factor
+    return {"saturation_rps": sustained, "p99_slo_ms": p99_slo_ms, "steps": steps}
+
+class StandInServer:
+    """
+    Minimal local search stand-in: every POST waits for one of `concurrency` service slots,
+    then takes ~service_ms to answer, so it saturates at about concurrency / service_ms.
+    """
+
+    def __init__(self, port: int, service_ms: float, concurrency: int, jitter: float = 0.5):
+        self.port = port
+        self.service_ms = service_ms
+        self.concurrency = concurrency
+        self.jitter = jitter
+        self.body = json.dumps({"value": []}).encode("utf-8")
+        self.server = None
+        self.connections = {}
+
+    async def start(self) -> None:
+        self.slots = asyncio.Semaphore(self.concurrency)
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", self.port)
+
+    async def stop(self) -> None:
+        self.server.close()
+        # Closing the keep-alive connections lets each handler see EOF and return
+        for writer in self.connections.values():
+            writer.close()
+        await asyncio.gather(*self.connections, return_exceptions=True)
+        await self.server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        task = asyncio.current_task()
+        self.connections[task] = writer
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                length = 0
+                while True:
+                    header = await reader.readline()
+                    if header in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = header.decode("latin-1").partition(":")
+                    if name.strip().lower() == "content-length":
+                        length = int(value.strip())
+                if length:
+                    await reader.readexactly(length)
+                async with self.slots:
+                    await asyncio.sleep(self.service_ms / 1000 * random.uniform(1 - self.jitter, 1 + self.jitter))
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                             b"Content-Length: " + str(len(self.body)).encode() + b"\r\n\r\n" + self.body)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.connections.pop(task, None)
+            writer.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Open-loop load generator for search')
+    parser.add_argument('--endpoint', type=str, default=SEARCH_ENDPOINT, help='Search endpoint to load')
+    parser.add_argument('--stand-in', action='store_true',
+                        help='Start a local stand-in server and load it instead of the real endpoint')
+    parser.add_argument('--stand-in-port', type=int, default=8790)
+    parser.add_argument('--stand-in-service-ms', type=float, default=40.0, help='Stand-in mean service time')
+    parser.add_argument('--stand-in-concurrency', type=int, default=8, help='Stand-in parallel service slots')
+    parser.add_argument('--arrivals', choices=['poisson', 'burst', 'trace'], default='poisson')
+    parser.add_argument('--trace', type=str, help='Recorded trace (JSON lines of {"offset", "body"}) for --arrivals trace')
+    parser.add_argument('--rate', type=float, default=20.0, help='Mean offered requests/second')
+    parser.add_argument('--duration', type=float, default=30.0, help='Seconds of arrivals to generate')
+    parser.add_argument('--burst-factor', type=float, default=5.0)
+    parser.add_argument('--burst-every', type=float, default=10.0)
+    parser.add_argument('--saturation', action='store_true', help='Step the rate up to find saturation throughput')
+    parser.add_argument('--max-rate', type=float, default=2000.0)
+    parser.add_argument('--step-factor', type=float, default=1.5)
+    parser.add_argument('--step-duration', type=float, default=10.0)
+    parser.add_argument('--p99-slo-ms', type=float, default=DEFAULT_P99_SLO_MS)
+    parser.add_argument('--max-error-rate', type=float, default=0.01)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--output', type=str, help='Write the JSON results to this file')
+
+    args = parser.parse_args()
+
+    endpoint = f"http://127.0.0.1:{args.stand_in_port}" if args.stand_in else args.endpoint
+    if not args.stand_in and not os.environ.get("SEARCH_API_KEY"):
+        print("Error: SEARCH_API_KEY environment variable not set (or use --stand-in)")
+        sys.exit(1)
+
+    async def run() -> Dict[str, Any]:
+        stand_in = None
+        if args.stand_in:
+            stand_in = StandInServer(args.stand_in_port, args.stand_in_service_ms, args.stand_in_concurrency)
+            await stand_in.start()
+            print(f"Stand-in listening on {endpoint} (~{args.stand_in_concurrency * 1000 / args.stand_in_service_ms:.0f} req/s capacity)")
+
+        client = SearchClient(endpoint=endpoint)
+        try:
+            if args.saturation:
+                print(f"Searching for saturation from {args.rate} req/s...")
+                return await find_saturation(client, BLUEPRINT_TEST_QUERIES, args.rate, args.max_rate,
+                                             args.step_factor, args.step_duration, args.p99_slo_ms,
+                                             args.max_error_rate, args.seed)
+
+            if args.arrivals == 'trace':
+                if not args.trace:
+                    parser.error("--arrivals trace needs --trace")
+                schedule = load_trace(args.trace)
+            elif args.arrivals == 'burst':
+                schedule = synthetic_schedule(
+                    burst_arrivals(args.rate, args.duration, args.burst_factor, args.burst_every, seed=args.seed),
+                    BLUEPRINT_TEST_QUERIES, args.seed)
+            else:
+                schedule = synthetic_schedule(poisson_arrivals(args.rate, args.duration, args.seed),
+                                              BLUEPRINT_TEST_QUERIES, args.seed)
+
+            print(f"Replaying {len(schedule)} requests ({args.arrivals} arrivals)...")
+            return await run_open_loop(schedule, client)
+        finally:
+            if stand_in:
+                await stand_in.stop()
+
+    results = asyncio.run(run())
+    print(json.dumps(results if not args.saturation else {k: v for k, v in results.items() if k != "steps"}, indent=2))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,7 @@
 """
 Set up semantic configuration for Azure Cognitive Search index.
 This enables semantic ranking, captions, and answers.
+index_schema.py applies this together with the other schema scripts in one update.
 """
 
 import os
@@ -9,14 +10,16 @@ import sys
 import json
 import requests
 
+import search_config
+
 # Configuration
 SEARCH_ENDPOINT = "https://fcssearchservice.search.windows.net"
 SEARCH_API_KEY = os.environ.get("SEARCH_API_KEY", "")
-SEARCH_INDEX_NAME = "fcs-construction-docs-index-v2"
+SEARCH_INDEX_NAME = search_config.SEARCH_INDEX_NAME
 
 def get_current_index():
     """Get the current index definition."""
-    url = f"{SEARCH_ENDPOINT}/indexes/{SEARCH_INDEX_NAME}?api-version=2023-11-01"
+    url = f"{SEARCH_ENDPOINT}/indexes/{search_config.index_name()}?api-version=2023-11-01"
     headers = {
         "api-key": SEARCH_API_KEY,
         "Content-Type": "application/json"
@@ -85,7 +88,8 @@ def update_semantic_configuration(index_def):
 
 def apply_index_update(index_def):
     """Apply the updated index definition."""
-    url = f"{SEARCH_ENDPOINT}/indexes/{SEARCH_INDEX_NAME}?api-version=2023-11-01&allowIndexDowntime=false"
+    url = (f"{SEARCH_ENDPOINT}/indexes/{search_config.index_name()}"
+           "?api-version=2023-11-01&allowIndexDowntime=false")
     headers = {
         "api-key": SEARCH_API_KEY,
         "Content-Type": "application/json",
@@ -104,7 +108,7 @@ def apply_index_update(index_def):
 
 def test_semantic_search():
     """Test the semantic search configuration."""
-    url = f"{SEARCH_ENDPOINT}/indexes/{SEARCH_INDEX_NAME}/docs/search?api-version=2023-11-01"
+    url = f"{SEARCH_ENDPOINT}/indexes/{search_config.index_name()}/docs/search?api-version=2023-11-01"
     headers = {
         "api-key": SEARCH_API_KEY,
         "Content-Type": "application/json"
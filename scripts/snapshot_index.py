@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Export the search index to local columnar files.
+Every retrievable field is read with parallel per-client readers and written as Parquet or Arrow
+part files (JSON lines when pyarrow isn't installed); vectors are filled in from the local document
+vector store. Each partition's cursor is saved after every part file, so an interrupted export resumes.
+"""
+
+import os
+import re
+import sys
+import gzip
+import json
+import hashlib
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import List, Dict, Any
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    import pyarrow.feather as feather
+except ImportError:
+    pa = None
+
+import index_schema
+import search_config
+from rebuild_index import (SEARCH_API_KEY, SEARCH_INDEX_NAME, VECTOR_TYPE, VectorRestorer,
+                           batch_size_bytes, plan_partitions, read_partition)
+
+STATE_FILE = "_state.json"
+MANIFEST_FILE = "_manifest.json"
+NO_CLIENT = "__none__"
+FORMATS = {"parquet": ".parquet", "arrow": ".arrow", "jsonl": ".jsonl.gz"}
+
+# A part file is written (and the cursor saved) at whichever limit comes first. Rows are buffered
+# in memory until then, and with vectors filled in each one is tens of KB.
+ROWS_PER_FILE = 5000
+BYTES_PER_FILE = 64 * 1024 * 1024
+
+def arrow_type(edm_type: str):
+    """Arrow type for an index field type; complex and geo values are kept as JSON text."""
+    if edm_type.startswith("Collection("):
+        return pa.list_(arrow_type(edm_type[len("Collection("):-1]))
+    return {
+        "Edm.String": pa.string(),
+        "Edm.Int32": pa.int32(),
+        "Edm.Int64": pa.int64(),
+        "Edm.Double": pa.float64(),
+        "Edm.Single": pa.float32(),
+        "Edm.Boolean": pa.bool_(),
+        "Edm.DateTimeOffset": pa.timestamp("us", tz="UTC"),
+    }.get(edm_type, pa.string())
+
+def arrow_schema(fields: List[Dict[str, Any]]):
+    return pa.schema([pa.field(field["name"], arrow_type(field["type"])) for field in fields])
+
+def _convert(value: Any, edm_type: str) -> Any:
+    if value is None:
+        return None
+    if edm_type.startswith("Collection("):
+        return [_convert(item, edm_type[len("Collection("):-1]) for item in value]
+    if edm_type == "Edm.DateTimeOffset":
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return value
+
+def partition_label(partition: str) -> str:
+    """
+    Directory name for a partition filter: client eq 'Milo' -> client=Milo.
+    Names that had to be rewritten get a hash of the original, so "A B" and "A/B" stay apart.
+    """
+    match = re.match(r"^client eq '(.*)'$", partition)
+    if not match:
+        return f"client={NO_CLIENT}"
+    value = match.group(1).replace("''", "'")
+    safe = re.sub(r"[^\w.-]+", "_", value)
+    if safe != value or safe == NO_CLIENT:
+        safe += "-" + hashlib.sha1(value.encode("utf-8")).hexdigest()[:8]
+    return "client=" + safe
+
+class SnapshotWriter:
+    """Writes part files for one export and keeps the per-partition cursors."""
+
+    def __init__(self, output_dir: str, fields: List[Dict[str, Any]], fmt: str):
+        self.output_dir = output_dir
+        self.fields = fields
+        self.fmt = fmt
+        self.schema = arrow_schema(fields) if pa is not None else None
+        self._lock = threading.Lock()
+        self.state_path = os.path.join(output_dir, STATE_FILE)
+        self.state = {}
+        if os.path.exists(self.state_path):
+            with open(self.state_path) as f:
+                self.state = json.load(f)
+
+    def partition_state(self, partition: str) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.state.setdefault(partition, {"lastId": None, "parts": 0, "rows": 0, "done": False}))
+
+    def write_part(self, partition: str, rows: List[Dict[str, Any]], done: bool) -> None:
+        """Write one part file atomically, then advance the partition's cursor past it."""
+        current = self.partition_state(partition)
+        if rows:
+            directory = os.path.join(self.output_dir, partition_label(partition))
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f"part-{current['parts']:05d}{FORMATS[self.fmt]}")
+            tmp_path = path + ".tmp"
+            self._write_file(tmp_path, rows)
+            os.replace(tmp_path, path)
+
+        with self._lock:
+            state = self.state[partition]
+            if rows:
+                state["lastId"] = rows[-1]["id"]
+                state["parts"] += 1
+                state["rows"] += len(rows)
+            state["done"] = done
+            tmp_path = self.state_path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self.state, f, indent=2)
+            os.replace(tmp_path, self.state_path)
+
+    def _write_file(self, path: str, rows: List[Dict[str, Any]]) -> None:
+        if self.fmt == "jsonl":
+            with gzip.open(path, "wt", encoding="utf-8") as f:
+                for row in rows:
+                    f.write(json.dumps(row) + "\n")
+            return
+        columns = {
+            field["name"]: [_convert(row.get(field["name"]), field["type"]) for row in rows]
+            for field in self.fields
+        }
+        table = pa.Table.from_pydict(columns, schema=self.schema)
+        if self.fmt == "parquet":
+            pq.write_table(table, path, compression="zstd")
+        else:
+            feather.write_feather(table, path, compression="zstd")
+
+def export_partition(source: str, partition: str, select: str, writer: SnapshotWriter, restorer: VectorRestorer,
+                     rows_per_file: int = ROWS_PER_FILE, bytes_per_file: int = BYTES_PER_FILE) -> int:
+    """Export one partition from its saved cursor; returns rows written in this run."""
+    state = writer.partition_state(partition)
+    if state["done"]:
+        return 0
+    cursor_filter = partition
+    if state["lastId"] is not None:
+        # Resume strictly after the last id already written to a part file
+        cursor_filter = "({}) and id gt '{}'".format(partition, state["lastId"].replace("'", "''"))
+
+    written = 0
+    buffer, size = [], 0
+    for page in read_partition(source, cursor_filter, select):
+        for doc in page:
+            restorer.restore(doc)
+            buffer.append(doc)
+            size += batch_size_bytes(doc)
+            if len(buffer) >= rows_per_file or size >= bytes_per_file:
+                writer.write_part(partition, buffer, done=False)
+                written += len(buffer)
+                buffer, size = [], 0
+    writer.write_part(partition, buffer, done=True)
+    return written + len(buffer)
+
+def snapshot(output_dir: str, source: str = SEARCH_INDEX_NAME, fmt: str = "parquet", readers: int = 4,
+             rows_per_file: int = ROWS_PER_FILE, bytes_per_file: int = BYTES_PER_FILE) -> bool:
+    # Read one concrete index even if the alias moves mid-export
+    source = search_config.resolve_index_name(source)
+    source_def = index_schema.get_index(source)
+    if source_def is None:
+        return False
+
+    retrievable = [field for field in source_def["fields"]
+                   if field["type"] != VECTOR_TYPE and field.get("retrievable", True)]
+    vector_fields = [field for field in source_def["fields"] if field["type"] == VECTOR_TYPE]
+    fields = retrievable + vector_fields
+    select = ",".join(field["name"] for field in retrievable)
+
+    os.makedirs(output_dir, exist_ok=True)
+    writer = SnapshotWriter(output_dir, fields, fmt)
+    restorer = VectorRestorer([field["name"] for field in vector_fields])
+    partitions = plan_partitions(source)
+    if not partitions:
+        return False
+
+    remaining = [p for p in partitions if not writer.partition_state(p)["done"]]
+    print(f"Exporting {source} to {output_dir} ({fmt}): {len(remaining)} of {len(partitions)} partitions "
+          f"left, {readers} readers")
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=readers) as executor:
+        futures = {executor.submit(export_partition, source, p, select, writer, restorer,
+                                   rows_per_file, bytes_per_file): p
+                   for p in remaining}
+        for future, partition in futures.items():
+            rows = future.result()
+            print(f"  ✓ {partition_label(partition)}: {rows} rows")
+
+    total_rows = sum(writer.partition_state(p)["rows"] for p in partitions)
+    manifest = {
+        "index": source,
+        "format": fmt,
+        "completedAt": datetime.now(timezone.utc).isoformat(),
+        "rows": total_rows,
+        "fields": [{"name": field["name"], "type": field["type"]} for field in fields],
+        "partitions": {partition_label(p): writer.partition_state(p) for p in partitions},
+        "vectors": {name: {"fromStore": restorer.restored[name], "missing": restorer.missing[name]}
+                    for name in restorer.vector_fields},
+    }
+    with open(os.path.join(output_dir, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    elapsed = time.time() - start
+    print(f"\n✓ {total_rows} rows in {elapsed:.1f}s")
+    for name, counts in manifest["vectors"].items():
+        print(f"  {name}: {counts['fromStore']} from the local store, {counts['missing']} missing")
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description='Export the search index to Parquet/Arrow files')
+    parser.add_argument('--output', type=str, help='Snapshot directory (default: snapshot-<index>-<date>)')
+    parser.add_argument('--index', default=SEARCH_INDEX_NAME, help='Index to export')
+    parser.add_argument('--format', choices=sorted(FORMATS), default='parquet' if pa is not None else 'jsonl',
+                        help='parquet/arrow need pyarrow; jsonl (gzipped) works without it')
+    parser.add_argument('--readers', type=int, default=4, help='Partitions read in parallel')
+    parser.add_argument('--rows-per-file', type=int, default=ROWS_PER_FILE,
+                        help='Most rows per part file (cursor checkpoint)')
+    parser.add_argument('--mb-per-file', type=int, default=BYTES_PER_FILE // (1024 * 1024),
+                        help='Most MB of documents (as JSON) buffered per part file')
+
+    args = parser.parse_args()
+
+    if args.format != "jsonl" and pa is None:
+        print("Error: pyarrow is not installed (pip install pyarrow), or use --format jsonl")
+        sys.exit(1)
+    if not SEARCH_API_KEY:
+        print("Error: SEARCH_API_KEY environment variable not set")
+        sys.exit(1)
+
+    output = args.output or f"snapshot-{args.index}-{datetime.now(timezone.utc).strftime('%Y%m%d')}"
+    if not snapshot(output, source=args.index, fmt=args.format, readers=args.readers,
+                    rows_per_file=args.rows_per_file, bytes_per_file=args.mb_per_file * 1024 * 1024):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -24,11 +24,14 @@ fi
 
 echo -e "${GREEN}✓ API keys retrieved${NC}"
 
+# Index behind the search alias (see search_config.py)
+SEARCH_INDEX_NAME=$(cd "$(dirname "$0")" && python3 -c "import search_config; print(search_config.index_name())")
+
 # Function to check document count in search index
 check_document_count() {
     local client=$1
     local count=$(curl -s -X GET \
-        "https://fcssearchservice.search.windows.net/indexes/fcs-construction-docs-index-v2/docs/\$count?api-version=2021-04-30-Preview" \
+        "https://fcssearchservice.search.windows.net/indexes/$SEARCH_INDEX_NAME/docs/\$count?api-version=2021-04-30-Preview" \
         -H "api-key: $SEARCH_API_KEY" \
         -H "Content-Type: application/json")
     
@@ -36,7 +39,7 @@ check_document_count() {
         echo "Total documents in index: $count"
     else
         local client_count=$(curl -s -X POST \
-            "https://fcssearchservice.search.windows.net/indexes/fcs-construction-docs-index-v2/docs/search?api-version=2021-04-30-Preview" \
+            "https://fcssearchservice.search.windows.net/indexes/$SEARCH_INDEX_NAME/docs/search?api-version=2021-04-30-Preview" \
             -H "api-key: $SEARCH_API_KEY" \
             -H "Content-Type: application/json" \
             -d "{\"search\": \"*\", \"filter\": \"client eq '$client'\", \"count\": true}" | \
@@ -99,7 +102,7 @@ SEARCH_QUERY="construction materials"
 echo "Searching for: '$SEARCH_QUERY'"
 
 SEARCH_RESULT=$(curl -s -X POST \
-    "https://fcssearchservice.search.windows.net/indexes/fcs-construction-docs-index-v2/docs/search?api-version=2021-04-30-Preview" \
+    "https://fcssearchservice.search.windows.net/indexes/$SEARCH_INDEX_NAME/docs/search?api-version=2021-04-30-Preview" \
     -H "api-key: $SEARCH_API_KEY" \
     -H "Content-Type: application/json" \
     -d "{
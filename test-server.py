@@ -1,67 +1,547 @@
 #!/usr/bin/env python3
 """
 Simple HTTP server for testing the ASK Foreman site locally
+Threaded HTTP/1.1 with keep-alive, precompressed gzip/brotli variants, ETag/Last-Modified
+revalidation and byte ranges, so local page loads behave like the deployed site.
+A small API gateway serves /api/config and proxies, records or replays the webhook and
+search routes, with optional injected latency, so the front end can be profiled against
+a repeatable backend
 """
 
 import http.server
-import socketserver
 import os
+import io
+import re
 import sys
-from urllib.parse import urlparse
+import gzip
+import json
+import time
+import base64
+import random
+import hashlib
+import mimetypes
+import argparse
+import threading
+import urllib.error
+import urllib.request
+from email.utils import formatdate, parsedate_to_datetime
+from urllib.parse import urlparse, urlsplit, parse_qs
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
 PORT = 8080
 
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml',
+                      'application/xml')
+# Files smaller than this aren't worth compressing
+MIN_COMPRESS_SIZE = 1024
+SKIP_DIRS = {'.git', 'node_modules', '__pycache__'}
+
+# Local path prefix -> upstream it stands for (the webhook rewrites in staticwebapp.config.json)
+UPSTREAMS = [
+    ('/api/webhook/', 'https://workflows.saxtechnology.com/webhook/'),
+    ('/api/search/', os.environ.get('SEARCH_ENDPOINT', 'https://fcssearchservice.search.windows.net') + '/'),
+]
+RECORDINGS_DIR = 'api-recordings'
+# Bundles from scripts/build_assets.py carry a content hash and never change
+FINGERPRINTED = re.compile(r'\.[0-9a-f]{10}\.\w+$')
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+# JSON body fields that change on every call and must not affect which recording is replayed
+VOLATILE_FIELDS = {'timestamp', 'sessionId', 'requestId', 'messageId'}
+FORWARDED_HEADERS = ('Content-Type', 'Accept', 'Authorization', 'api-key')
+
+
+class CompressedVariants:
+    """gzip/brotli bodies per file, recomputed when the file's mtime or size changes"""
+
+    def __init__(self):
+        self._variants = {}
+        self._lock = threading.Lock()
+
+    def get(self, path, stat, encoding, transform=None):
+        key = (path, encoding, transform is not None)
+        version = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._variants.get(key)
+        if cached and cached[0] == version:
+            return cached[1]
+        with open(path, 'rb') as f:
+            raw = f.read()
+        if transform:
+            raw = transform(raw)
+        if encoding == 'br':
+            body = brotli.compress(raw, quality=11)
+        elif encoding == 'gzip':
+            body = gzip.compress(raw, compresslevel=9, mtime=0)
+        else:
+            body = raw
+        with self._lock:
+            self._variants[key] = (version, body)
+        return body
+
+    def precompute(self, root):
+        """Compress every compressible file under root ahead of the first request"""
+        count = 0
+        for directory, dirs, files in os.walk(root):
+            dirs[:] = [d for d in dirs if d not in SKIP_DIRS and not d.startswith('.')]
+            for name in files:
+                path = os.path.join(directory, name)
+                stat = os.stat(path)
+                if stat.st_size < MIN_COMPRESS_SIZE or not content_type(path).startswith(COMPRESSIBLE_TYPES):
+                    continue
+                for encoding in available_encodings():
+                    self.get(path, stat, encoding)
+                count += 1
+        return count
+
+
+def content_type(path):
+    guess, _ = mimetypes.guess_type(path)
+    return guess or 'application/octet-stream'
+
+
+def parse_accept(header):
+    """{value: quality} from an Accept or Accept-Encoding header"""
+    accepted = {}
+    for item in header.split(','):
+        name, _, params = item.strip().partition(';')
+        quality = 1.0
+        if params.strip().startswith('q='):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    return accepted
+
+
+def available_encodings():
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+VARIANTS = CompressedVariants()
+
+
+SEARCH_ENDPOINT = 'https://fcssearchservice.search.windows.net'
+SEARCH_ALIAS_NAME = os.environ.get('AZURE_SEARCH_ALIAS_NAME', 'fcs-construction-docs')
+INITIAL_INDEX_NAME = 'fcs-construction-docs-index-v2'
+ALIAS_TTL = 60
+_resolved_index = {'name': None, 'expires': 0.0}
+
+
+def search_index_name():
+    """Index behind the search alias, resolved like api/config/index.js"""
+    if os.environ.get('AZURE_SEARCH_INDEX_NAME'):
+        return os.environ['AZURE_SEARCH_INDEX_NAME']
+    if _resolved_index['name'] and time.time() < _resolved_index['expires']:
+        return _resolved_index['name']
+    name = _resolved_index['name'] or INITIAL_INDEX_NAME
+    request = urllib.request.Request(
+        f'{SEARCH_ENDPOINT}/aliases/{SEARCH_ALIAS_NAME}?api-version=2024-03-01-Preview',
+        headers={'api-key': os.environ.get('AZURE_SEARCH_API_KEY', '')})
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            name = json.loads(response.read())['indexes'][0]
+    except urllib.error.HTTPError as e:
+        if e.code == 404:
+            name = INITIAL_INDEX_NAME
+    except (urllib.error.URLError, OSError, ValueError):
+        pass
+    _resolved_index.update(name=name, expires=time.time() + ALIAS_TTL)
+    return name
+
+
+def local_config():
+    """Same payload as api/config/index.js"""
+    function_key = os.environ.get('AZURE_FUNCTION_KEY', '')
+    return {
+        'functionBaseUrl': 'https://askforeman-functions.azurewebsites.net/api',
+        'docProcessorUrl': 'https://saxtech-docprocessor.azurewebsites.net/api',
+        'functionKey': function_key,
+        'docProcessorKey': os.environ.get('DOC_PROCESSOR_KEY') or function_key,
+        'searchApiKey': os.environ.get('AZURE_SEARCH_API_KEY', ''),
+        'searchEndpoint': SEARCH_ENDPOINT,
+        'searchIndexName': search_index_name(),
+        'endpoints': {
+            'analyzeImage': '/analyze-image',
+            'pdfChunker': '/pdf-chunker',
+            'knowledgeGraph': '/knowledge-graph',
+            'enhancedSearch': '/enhanced-search',
+            'blueprintTakeoff': '/BlueprintTakeoffUnified',
+            'convertDocument': '/ConvertDocumentJson',
+            'processLargePdf': '/ProcessLargePDF'
+        }
+    }
+
+
+def recording_key(method, path, body):
+    """Stable key for a request; JSON bodies are compared without their volatile fields"""
+    try:
+        payload = json.loads(body) if body else None
+        if isinstance(payload, dict):
+            payload = {k: v for k, v in payload.items() if k not in VOLATILE_FIELDS}
+        canonical = json.dumps(payload, sort_keys=True).encode('utf-8')
+    except ValueError:
+        canonical = body
+    digest = hashlib.sha256(method.encode('utf-8') + b' ' + path.encode('utf-8') + b'\n' + canonical)
+    return digest.hexdigest()[:32]
+
+
+class ApiGateway:
+    """Serves the /api routes locally: config directly, everything else proxied, recorded or replayed"""
+
+    def __init__(self, mode='proxy', recordings_dir=RECORDINGS_DIR, latency_ms=0, jitter_ms=0,
+                 intercept=False):
+        self.mode = mode
+        self.recordings_dir = recordings_dir
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.intercept = intercept
+
+    def handles(self, path):
+        route = urlsplit(path).path
+        return route == '/api/config' or any(route.startswith(prefix) for prefix, _ in UPSTREAMS)
+
+    def handle(self, method, path, headers, body):
+        """Returns (status, content type, body) for a gateway request"""
+        delay = self.latency_ms + random.uniform(0, self.jitter_ms)
+        if delay:
+            time.sleep(delay / 1000)
+
+        route = urlsplit(path).path
+        if route == '/api/config':
+            return 200, 'application/json', json.dumps(local_config()).encode('utf-8')
+
+        key = recording_key(method, path, body)
+        recording_path = os.path.join(self.recordings_dir, key + '.json')
+        if self.mode == 'replay':
+            if not os.path.exists(recording_path):
+                message = {'error': f'No recording for {method} {path}', 'recording': key}
+                return 502, 'application/json', json.dumps(message).encode('utf-8')
+            with open(recording_path) as f:
+                recorded = json.load(f)
+            return recorded['status'], recorded['contentType'], base64.b64decode(recorded['body'])
+
+        prefix, upstream = next((p, u) for p, u in UPSTREAMS if route.startswith(p))
+        status, content_type, response_body = self.forward(method, upstream + path[len(prefix):], headers, body)
+        if self.mode == 'record' and status < 500:
+            os.makedirs(self.recordings_dir, exist_ok=True)
+            with open(recording_path, 'w') as f:
+                json.dump({'method': method, 'path': path, 'status': status, 'contentType': content_type,
+                           'body': base64.b64encode(response_body).decode('ascii')}, f, indent=2)
+        return status, content_type, response_body
+
+    def forward(self, method, url, headers, body):
+        forwarded = {name: headers[name] for name in FORWARDED_HEADERS if headers.get(name)}
+        if url.startswith(UPSTREAMS[1][1]) and 'api-key' not in forwarded and os.environ.get('AZURE_SEARCH_API_KEY'):
+            forwarded['api-key'] = os.environ['AZURE_SEARCH_API_KEY']
+        request = urllib.request.Request(url, data=body if method != 'GET' else None, headers=forwarded,
+                                         method=method)
+        try:
+            with urllib.request.urlopen(request, timeout=300) as response:
+                return response.status, response.headers.get('Content-Type', 'application/octet-stream'), response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.headers.get('Content-Type', 'text/plain'), e.read()
+        except (urllib.error.URLError, OSError) as e:
+            return 502, 'application/json', json.dumps({'error': f'Upstream unreachable: {e}'}).encode('utf-8')
+
+    def fetch_shim(self):
+        """Script that sends the pages' absolute webhook/search URLs through the local routes"""
+        mapping = json.dumps([[upstream, prefix] for prefix, upstream in UPSTREAMS])
+        return ('<script>/* test-server.py --intercept */(function(){var m=' + mapping + ';'
+                'function r(u){for(var i=0;i<m.length;i++){if(u.indexOf(m[i][0])===0)'
+                'return m[i][1]+u.slice(m[i][0].length);}return u;}'
+                'var f=window.fetch;window.fetch=function(i,o){if(typeof i==="string"){i=r(i);}'
+                'else if(i&&i.url&&r(i.url)!==i.url){i=new Request(r(i.url),i);}return f.call(this,i,o);};'
+                'var x=XMLHttpRequest.prototype.open;XMLHttpRequest.prototype.open=function(){'
+                'arguments[1]=r(String(arguments[1]));return x.apply(this,arguments);};})();</script>')
+
+    def inject_shim(self, html):
+        shim = self.fetch_shim().encode('utf-8')
+        match = re.search(rb'<head[^>]*>', html, re.IGNORECASE)
+        position = match.end() if match else 0
+        return html[:position] + shim + html[position:]
+
+
 class CustomHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    gateway = ApiGateway()
+    # Directory of built pages (scripts/build_assets.py) served in place of the originals
+    dist_dir = None
+    # Image path -> variants from scripts/build_images.py, chosen per request by Accept and width
+    image_variants = {}
+
     def end_headers(self):
         # Add CORS headers for local testing
         self.send_header('Access-Control-Allow-Origin', '*')
         self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
         self.send_header('Access-Control-Allow-Headers', 'Content-Type')
         super().end_headers()
-    
+
     def do_OPTIONS(self):
         self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_GET(self):
+        if self.gateway.handles(self.path):
+            self.handle_api('GET')
+        else:
+            super().do_GET()
+
+    def do_POST(self):
+        if self.gateway.handles(self.path):
+            self.handle_api('POST')
+        else:
+            self.send_error(405)
+
+    def handle_api(self, method):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        status, content_type, response_body = self.gateway.handle(method, self.path, self.headers, body)
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(response_body)))
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        self.wfile.write(response_body)
+
+    def transform(self, path):
+        """Rewrite applied to a file's body, or None to serve it as stored"""
+        if self.gateway.intercept and path.endswith('.html'):
+            return self.gateway.inject_shim
+        return None
+
+    def guess_type(self, path):
+        return content_type(path)
+
+    def translate_path(self, path):
+        translated = super().translate_path(path)
+        if self.dist_dir and translated.endswith('.html'):
+            built = os.path.join(self.dist_dir, os.path.relpath(translated, self.directory))
+            if os.path.isfile(built):
+                return built
+        return translated
+
+    def cache_control(self, path):
+        if FINGERPRINTED.search(path):
+            return IMMUTABLE_CACHE
+        # Revalidate everything else; unchanged files come back as 304s
+        return 'no-cache'
+
+    def choose_encoding(self):
+        accepted = parse_accept(self.headers.get('Accept-Encoding', ''))
+        for encoding in available_encodings():
+            if accepted.get(encoding, accepted.get('*', 0)) > 0:
+                return encoding
+        return None
+
+    def not_modified(self, etag, mtime):
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match is not None:
+            return etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*'
+        if_modified_since = self.headers.get('If-Modified-Since')
+        if if_modified_since:
+            try:
+                return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def parse_range(self, size, etag):
+        """(start, end) for a single satisfiable byte range, None for the whole file, or 'invalid'"""
+        header = self.headers.get('Range')
+        if not header or not header.startswith('bytes=') or ',' in header:
+            return None
+        if_range = self.headers.get('If-Range')
+        if if_range and if_range.strip() != etag:
+            return None
+        start, _, end = header[len('bytes='):].strip().partition('-')
+        try:
+            if start == '':
+                length = int(end)
+                if length == 0:
+                    return 'invalid'
+                return max(size - length, 0), size - 1
+            start = int(start)
+            end = min(int(end), size - 1) if end else size - 1
+        except ValueError:
+            return None
+        if start >= size or start > end:
+            return 'invalid'
+        return start, end
+
+    def negotiate_image(self):
+        """File of the best variant of a requested image, or None when it has no variants"""
+        url = urlsplit(self.path)
+        variants = self.image_variants.get(url.path.lstrip('/'))
+        if not variants:
+            return None
+        accepted = parse_accept(self.headers.get('Accept', ''))
+        types = [variant['type'] for variant in variants]
+        chosen = next((t for t in ('image/avif', 'image/webp') if t in types and accepted.get(t, 0) > 0), types[-1])
+        candidates = sorted((v for v in variants if v['type'] == chosen), key=lambda v: v['width'])
+
+        hint = parse_qs(url.query).get('w', [None])[0] or self.headers.get('Sec-CH-Width') or self.headers.get('Width')
+        try:
+            width = int(float(hint)) if hint else None
+        except ValueError:
+            width = None
+        variant = next((v for v in candidates if width and v['width'] >= width), candidates[-1])
+        return os.path.join(self.directory, variant['path'])
+
+    def send_head(self):
+        variant = self.negotiate_image()
+        path = variant or self.translate_path(self.path)
+        if os.path.isdir(path) or not os.path.isfile(path):
+            # Directories (index.html, listings, redirects) and 404s keep the stock behaviour
+            return super().send_head()
+
+        stat = os.stat(path)
+        ctype = self.guess_type(path)
+        encoding = None
+        if stat.st_size >= MIN_COMPRESS_SIZE and ctype.startswith(COMPRESSIBLE_TYPES):
+            encoding = self.choose_encoding()
+        transform = self.transform(path)
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}{"-local" if transform else ""}' \
+               f'{"-" + encoding if encoding else ""}"'
+
+        common = [
+            ('Content-Type', ctype),
+            ('ETag', etag),
+            ('Last-Modified', formatdate(stat.st_mtime, usegmt=True)),
+            # A negotiated image's URL stays the same while the variant behind it changes
+            ('Cache-Control', 'no-cache' if variant else self.cache_control(path)),
+            ('Vary', 'Accept, Accept-Encoding' if variant else 'Accept-Encoding'),
+        ]
+        if self.not_modified(etag, stat.st_mtime):
+            self.send_response(304)
+            for name, value in common:
+                self.send_header(name, value)
+            self.end_headers()
+            return None
+
+        if encoding or transform:
+            body = VARIANTS.get(path, stat, encoding, transform)
+            self.send_response(200)
+            for name, value in common:
+                self.send_header(name, value)
+            if encoding:
+                self.send_header('Content-Encoding', encoding)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            return io.BytesIO(body)
+
+        byte_range = self.parse_range(stat.st_size, etag)
+        if byte_range == 'invalid':
+            self.send_response(416)
+            self.send_header('Content-Range', f'bytes */{stat.st_size}')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return None
+
+        f = open(path, 'rb')
+        if byte_range is None:
+            self.send_response(200)
+            length = stat.st_size
+        else:
+            start, end = byte_range
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{end}/{stat.st_size}')
+            f.seek(start)
+            length = end - start + 1
+            with f:
+                f = io.BytesIO(f.read(length))
+        for name, value in common:
+            self.send_header(name, value)
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Content-Length', str(length))
         self.end_headers()
-    
+        return f
+
     def log_message(self, format, *args):
         # Custom logging with colors
         message = format % args
         if "404" in message:
             print(f"\033[91m{message}\033[0m")
-        elif "200" in message:
+        elif "200" in message or "206" in message or "304" in message:
             print(f"\033[92m{message}\033[0m")
         else:
             print(message)
 
+
+class LocalServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='ASK Foreman local test server')
+    parser.add_argument('--port', type=int, default=PORT, help='Port to listen on')
+    parser.add_argument('--no-precompress', action='store_true', help="Compress files on first request instead")
+    parser.add_argument('--backend', choices=['proxy', 'record', 'replay'], default='proxy',
+                        help='How /api/webhook/* and /api/search/* are answered')
+    parser.add_argument('--recordings', default=RECORDINGS_DIR, help='Directory for recorded API responses')
+    parser.add_argument('--latency', type=float, default=0, help='Milliseconds added to every /api response')
+    parser.add_argument('--jitter', type=float, default=0, help='Up to this many extra random milliseconds')
+    parser.add_argument('--dist', action='store_true',
+                        help='Serve the bundled pages built by scripts/build_assets.py from dist/')
+    parser.add_argument('--intercept', action='store_true',
+                        help="Rewrite the pages' absolute webhook/search URLs to the local /api routes")
+    args = parser.parse_args()
+
     # Change to the script directory
     os.chdir(os.path.dirname(os.path.abspath(__file__)))
-    
+
     Handler = CustomHTTPRequestHandler
-    
+    Handler.gateway = ApiGateway(args.backend, args.recordings, args.latency, args.jitter, args.intercept)
+    if args.dist:
+        if not os.path.isdir('dist'):
+            print("\033[91m❌ No dist/ directory; run python3 scripts/build_assets.py first\033[0m")
+            sys.exit(1)
+        Handler.dist_dir = os.path.abspath('dist')
+        if os.path.exists(os.path.join('dist', 'image-manifest.json')):
+            with open(os.path.join('dist', 'image-manifest.json')) as f:
+                images = json.load(f)['images']
+            Handler.image_variants = {source: entry['variants'] for source, entry in images.items()}
+
     print(f"\033[96m╔══════════════════════════════════════════╗\033[0m")
     print(f"\033[96m║     ASK Foreman Local Test Server        ║\033[0m")
     print(f"\033[96m╚══════════════════════════════════════════╝\033[0m")
-    print(f"\n\033[93m🚀 Starting server on http://localhost:{PORT}\033[0m")
+    print(f"\n\033[93m🚀 Starting server on http://localhost:{args.port}\033[0m")
     print(f"\033[92m✓ Server directory: {os.getcwd()}\033[0m")
+    print(f"\033[92m✓ Compression: {', '.join(available_encodings())}\033[0m")
+    print(f"\033[92m✓ API: /api/config local, webhook/search {args.backend}"
+          f"{f' from {args.recordings}' if args.backend != 'proxy' else ''}"
+          f"{f', +{args.latency:g}ms latency' if args.latency else ''}"
+          f"{', page URLs intercepted' if args.intercept else ''}\033[0m")
+    if args.dist:
+        print(f"\033[92m✓ Pages from dist/ with immutable script bundles, "
+              f"{len(Handler.image_variants)} images negotiated by Accept\033[0m")
     print("\n\033[94mAvailable pages:\033[0m")
-    print("  • http://localhost:8080/estimator.html - Main Estimator (with fixes)")
-    print("  • http://localhost:8080/view-takeoffs.html - View-only Takeoff Tool")
-    print("  • http://localhost:8080/projects.html - Projects Page")
-    print("  • http://localhost:8080/admin.html - Admin Dashboard")
+    print(f"  • http://localhost:{args.port}/estimator.html - Main Estimator (with fixes)")
+    print(f"  • http://localhost:{args.port}/view-takeoffs.html - View-only Takeoff Tool")
+    print(f"  • http://localhost:{args.port}/projects.html - Projects Page")
+    print(f"  • http://localhost:{args.port}/admin.html - Admin Dashboard")
     print("\n\033[93mPress Ctrl+C to stop the server\033[0m")
     print("\033[90m" + "─" * 45 + "\033[0m\n")
-    
+
+    if not args.no_precompress:
+        threading.Thread(target=VARIANTS.precompute, args=(os.getcwd(),), daemon=True).start()
+
     try:
-        with socketserver.TCPServer(("", PORT), Handler) as httpd:
+        with LocalServer(("", args.port), Handler) as httpd:
             httpd.serve_forever()
     except KeyboardInterrupt:
         print("\n\n\033[91m✋ Server stopped\033[0m")
         sys.exit(0)
     except OSError as e:
         if e.errno == 48:  # Address already in use
-            print(f"\n\033[91m❌ Port {PORT} is already in use!\033[0m")
-            print(f"\033[93mTry: lsof -i :{PORT} to see what's using it\033[0m")
+            print(f"\n\033[91m❌ Port {args.port} is already in use!\033[0m")
+            print(f"\033[93mTry: lsof -i :{args.port} to see what's using it\033[0m")
         else:
             print(f"\n\033[91m❌ Error: {e}\033[0m")
         sys.exit(1)